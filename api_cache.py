@@ -0,0 +1,147 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+
+from divans_db import SCRAPE_FINISHED_CHANNEL, get_db_config
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Кеш ответов API в памяти процесса: не больше maxsize записей, вытесняются
+    давно не читанные (LRU), запись старше ttl секунд считается устаревшей.
+
+    clear() сбрасывает весь кеш и увеличивает generation. Ответ, посчитанный
+    по данным до сброса, не должен попасть в кеш после него, поэтому put
+    принимает поколение, прочитанное до запроса к базе, и молча пропускает
+    запись, если с тех пор кеш сбрасывался.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv('API_CACHE_SIZE', 1024))
+        self.ttl = ttl if ttl is not None else float(os.getenv('API_CACHE_TTL', 300))
+        self.lock = threading.Lock()
+        self.generation = 0
+        self._entries = OrderedDict()
+
+        # Счётчики
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Значение из кеша или None (нет записи или она устарела)"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if self.ttl > 0 and now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        """Сохранение значения, если кеш не сбрасывался после generation"""
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def clear(self):
+        """Сброс всех записей; возвращает их число"""
+        with self.lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+            return dropped
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'invalidations': self.invalidations
+            }
+
+    def format_stats(self):
+        """Строка со статистикой кеша для вывода в лог"""
+        stats = self.stats()
+        return (f"Кеш API: записей {stats['size']} из {stats['maxsize']}, попаданий {stats['hits']}, "
+                f"промахов {stats['misses']}, устарело {stats['expired']}, "
+                f"вытеснено {stats['evicted']}, сбросов {stats['invalidations']}")
+
+class ScrapeListener(threading.Thread):
+    """
+    Фоновый поток, который слушает LISTEN divans_scraped и сбрасывает кеш,
+    когда парсер сообщает о завершённом запуске (divans_db.notify_scrape_finished).
+
+    LISTEN держит сессию всё время работы, поэтому у потока своё подключение,
+    а не подключение из пула. После обрыва кеш сбрасывается (уведомления за
+    время обрыва потеряны) и подключение открывается заново через retry_delay.
+    """
+
+    def __init__(self, cache, db_config=None, poll_timeout=5.0, retry_delay=5.0):
+        super().__init__(name='scrape-listener', daemon=True)
+        self.cache = cache
+        self.db_config = db_config or get_db_config()
+        self.poll_timeout = poll_timeout
+        self.retry_delay = retry_delay
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                dropped = self.cache.clear()
+                logger.warning("⚠️ Подписка на %s оборвалась (%s), кеш сброшен (%s записей)",
+                               SCRAPE_FINISHED_CHANNEL, e, dropped)
+                self._stop_event.wait(self.retry_delay)
+
+    def _listen(self):
+        conn = psycopg2.connect(**self.db_config)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {SCRAPE_FINISHED_CHANNEL}")
+            logger.info("👂 Кеш API сбрасывается по NOTIFY %s", SCRAPE_FINISHED_CHANNEL)
+            while not self._stop_event.is_set():
+                if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                conn.poll()
+                if not conn.notifies:
+                    continue
+                payloads = [notify.payload for notify in conn.notifies]
+                conn.notifies.clear()
+                dropped = self.cache.clear()
+                logger.info("🔄 Завершён запуск парсера (записано: %s), кеш API сброшен (%s записей)",
+                            ', '.join(payloads), dropped)
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
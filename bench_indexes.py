@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Проверка планов горячих запросов к divans: для каждого запроса EXPLAIN
+(FORMAT JSON) должен содержать один из ожидаемых индексов, а время
+сравнивается с тем же запросом при запрещённых индексных сканах.
+
+Запросы курсорных выгрузок проверяются через EXPLAIN DECLARE ... CURSOR:
+планировщик выбирает для курсора план с быстрым первым ответом
+(cursor_tuple_fraction), поэтому и время меряется до первой пачки строк.
+
+    python bench_indexes.py --repeat 5
+
+Код возврата 1, если какой-то запрос не использует ожидаемый индекс.
+Планировщик честно выбирает полный просмотр маленькой таблицы, поэтому
+проверку имеет смысл запускать на базе с реальным объёмом данных.
+"""
+
+import argparse
+import json
+import time
+
+from db_pool import get_pool
+from divans_db import (
+    DEFAULT_ITERSIZE, PRICES_PRICE_ID_INDEX_NAME, PRICES_PRICE_INDEX_NAME,
+    PRICES_SCRAPED_AT_INDEX_NAME, PRODUCTS_SIZE_INDEX_NAME, PRODUCTS_SLEEPING_SIZE_INDEX_NAME, PRODUCTS_URL_INDEX_NAME,
+    get_db_config
+)
+
+class HotQuery:
+    def __init__(self, title, sql, expected, params=None, cursor=False):
+        self.title = title
+        self.sql = sql
+        self.expected = expected
+        self.params = params
+        self.cursor = cursor
+
+def hot_queries(cursor):
+    """Запросы из view_divans, выгрузок, статистики, upsert и фильтров по размерам с параметрами из данных"""
+    cursor.execute("SELECT url FROM divans WHERE url IS NOT NULL LIMIT 1")
+    row = cursor.fetchone()
+    sample_url = row[0] if row else ''
+    # Отметка инкрементальной выгрузки чуть позади конца таблицы
+    cursor.execute("SELECT scraped_at, id FROM divans ORDER BY scraped_at DESC, id DESC OFFSET 100 LIMIT 1")
+    watermark = cursor.fetchone() or (None, 0)
+    cursor.execute("SELECT MAX(scraped_at) - interval '1 day' FROM divans")
+    since = cursor.fetchone()[0]
+    # Ключ страницы API примерно из середины выдачи по цене
+    cursor.execute("SELECT price, id FROM divans WHERE price IS NOT NULL ORDER BY price, id "
+                   "OFFSET (SELECT COUNT(*) / 2 FROM divans) LIMIT 1")
+    price_key = cursor.fetchone() or (0, 0)
+
+    return [
+        HotQuery("view_divans: последние 10", """
+            SELECT name, price, old_price, discount_percent, dimensions, sleeping_dimensions, scraped_at
+            FROM divans ORDER BY scraped_at DESC LIMIT 10
+        """, [PRICES_SCRAPED_AT_INDEX_NAME]),
+        HotQuery("полная выгрузка в CSV", """
+            SELECT * FROM divans ORDER BY scraped_at DESC, id DESC
+        """, [PRICES_SCRAPED_AT_INDEX_NAME], cursor=True),
+        HotQuery("инкрементальная выгрузка", """
+            SELECT * FROM divans WHERE (scraped_at, id) > (%s, %s) ORDER BY scraped_at, id
+        """, [PRICES_SCRAPED_AT_INDEX_NAME], watermark, cursor=True),
+        HotQuery("топ-5 самых дорогих", """
+            SELECT name, price, discount_percent, page_number FROM divans
+            WHERE price IS NOT NULL ORDER BY price DESC NULLS LAST LIMIT 5
+        """, [PRICES_PRICE_INDEX_NAME]),
+        HotQuery("upsert: товар по url", """
+            SELECT id FROM divans WHERE url = %s
+        """, [PRODUCTS_URL_INDEX_NAME], (sample_url,)),
+        HotQuery("изменения цен за сутки", """
+            SELECT COUNT(*), AVG(price) FROM divans WHERE scraped_at >= %s
+        """, [PRICES_SCRAPED_AT_INDEX_NAME], (since,)),
+        HotQuery("спальное место от 160", """
+            SELECT name, price, sleeping_width, sleeping_length, url FROM divans
+            WHERE sleeping_width >= 160 AND sleeping_length >= 0
+            ORDER BY sleeping_width, sleeping_length LIMIT 50
+        """, [PRODUCTS_SLEEPING_SIZE_INDEX_NAME]),
+        HotQuery("API: страница по цене", """
+            SELECT * FROM divans WHERE price IS NOT NULL AND (price, id) > (%s, %s)
+            ORDER BY price, id LIMIT 51
+        """, [PRICES_PRICE_ID_INDEX_NAME], price_key),
+        HotQuery("габариты до 180 x 90", """
+            SELECT COUNT(*) FROM divans WHERE width <= 90 AND length <= 180
+        """, [PRODUCTS_SIZE_INDEX_NAME]),
+    ]
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+def explain(cursor, query):
+    """Узлы плана: список (тип узла, имя индекса или None)"""
+    sql = f"DECLARE bench_explain CURSOR FOR {query.sql}" if query.cursor else query.sql
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", query.params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return [(node['Node Type'], node.get('Index Name')) for node in plan_nodes(plan[0]['Plan'])]
+
+def timed(conn, query, repeat):
+    """Лучшее время выполнения (для курсора - до первой пачки строк), мс"""
+    best = None
+    for i in range(repeat):
+        started = time.perf_counter()
+        if query.cursor:
+            with conn.cursor(name=f'bench_timed_{i}') as cursor:
+                cursor.execute(query.sql, query.params)
+                cursor.fetchmany(DEFAULT_ITERSIZE)
+        else:
+            with conn.cursor() as cursor:
+                cursor.execute(query.sql, query.params)
+                cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def set_index_scans(cursor, enabled):
+    value = 'on' if enabled else 'off'
+    for setting in ('enable_indexscan', 'enable_indexonlyscan', 'enable_bitmapscan'):
+        cursor.execute(f"SET LOCAL {setting} = {value}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Планы и время горячих запросов к divans")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов замера, берётся лучший")
+    parser.add_argument('--no-analyze', action='store_true', help="не обновлять статистику таблицы")
+    args = parser.parse_args()
+
+    pool = get_pool(get_db_config())
+    conn = pool.getconn()
+    failed = 0
+    try:
+        with conn.cursor() as cursor:
+            if not args.no_analyze:
+                cursor.execute("ANALYZE products, product_prices")
+            cursor.execute("SELECT COUNT(*) FROM divans")
+            rows = cursor.fetchone()[0]
+            queries = hot_queries(cursor)
+        conn.commit()
+        print(f"Строк в divans: {rows:,}")
+        print(f"{'Запрос':<28} {'Индекс в плане':<26} {'С индексом, мс':>15} {'Без, мс':>10}  Проверка")
+        print("-" * 100)
+
+        for query in queries:
+            with conn.cursor() as cursor:
+                nodes = explain(cursor, query)
+            conn.rollback()
+            used = [name for _, name in nodes if name]
+            ok = any(name in query.expected for name in used)
+            failed += not ok
+
+            with_index = timed(conn, query, args.repeat)
+            conn.rollback()
+            with conn.cursor() as cursor:
+                set_index_scans(cursor, False)
+            without_index = timed(conn, query, args.repeat)
+            conn.rollback()
+
+            shown = ', '.join(used) if used else nodes[0][0]
+            print(f"{query.title:<28} {shown[:26]:<26} {with_index:>15.2f} {without_index:>10.2f}  "
+                  f"{'✅' if ok else '❌ ожидался ' + ' / '.join(query.expected)}")
+    finally:
+        pool.putconn(conn)
+        pool.close()
+
+    if failed:
+        print(f"\n❌ Запросов без ожидаемого индекса: {failed}")
+        raise SystemExit(1)
+    print("\n✅ Все горячие запросы используют индексы")
+
+if __name__ == "__main__":
+    main()
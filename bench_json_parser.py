@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора структурированных ответов MCP: прежний обход словаря
+(json.loads, перебор ключей products/items/data/... и полей каждого товара)
+против JsonParser со схемой источника (orjson, если установлен).
+
+Формы ответа:
+  mcp   - плоские товары (title, current_price "41 150 руб.", href, ...);
+  state - тяжёлые товары состояния страницы debug_page.html (варианты,
+          параметры, изображения): время уходит в основном на декодирование.
+Товары получают уникальные ссылки. Запуск:
+
+    python bench_json_parser.py --products 10000 --responses 20 --shape mcp
+"""
+
+import argparse
+import copy
+import json
+import time
+
+from divan_engine.parsers import JsonParser, PRODUCT_LIST_KEYS, orjson
+
+def load_sample_products(path='debug_page.html'):
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+    data = JsonParser().load(html)
+    products = []
+    for query in data['queries']:
+        query_data = (query.get('state') or {}).get('data')
+        if isinstance(query_data, dict):
+            for page in query_data.get('pages') or []:
+                products.extend(page.get('products') or [])
+    return products
+
+def make_mcp_item(sample, i):
+    """Плоский товар в ключах, которые перебирал прежний разбор"""
+    return {
+        'title': sample['name'],
+        'current_price': f"{sample['price']['actual']:,} руб.".replace(',', ' '),
+        'original_price': f"{sample['price']['expired']:,} руб.".replace(',', ' '),
+        'href': f"{sample['link']}-{i}",
+        'img': sample['images'][0]['src'] if sample.get('images') else None,
+        'size': '198 x 120 x 36 см',
+        'rating': sample.get('rating'),
+    }
+
+def make_response(samples, count, shape='mcp'):
+    """JSON-ответ MCP с count товарами"""
+    items = []
+    for i in range(count):
+        sample = samples[i % len(samples)]
+        if shape == 'mcp':
+            items.append(make_mcp_item(sample, i))
+        else:
+            item = copy.deepcopy(sample)
+            item['link'] = f"{item['link']}-{i}"
+            items.append(item)
+    key = 'result' if shape == 'mcp' else 'products'
+    return json.dumps({'status': 'ok', key: items}, ensure_ascii=False)
+
+def parse_legacy(parser, response):
+    """Прежний DivanScraperMCP.parse_products_from_mcp без отладочной печати"""
+    data = json.loads(response)
+    product_data = None
+    for key in PRODUCT_LIST_KEYS:
+        if key in data:
+            product_data = data[key]
+            break
+    products = []
+    for item in product_data:
+        if isinstance(item, dict):
+            product = parser.parse_item(item)
+            if product:
+                products.append(product)
+    return products
+
+def parse_schema(parser, response):
+    return list(parser.parse(response, source='bench'))
+
+def run(parse, responses):
+    parser = JsonParser()
+    started = time.perf_counter()
+    total = sum(len(parse(parser, response)) for response in responses)
+    return total, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора JSON-ответов MCP")
+    parser.add_argument('--products', type=int, default=10000, help="товаров в ответе")
+    parser.add_argument('--responses', type=int, default=20)
+    parser.add_argument('--shape', choices=['mcp', 'state'], default='mcp')
+    args = parser.parse_args()
+
+    samples = load_sample_products()
+    responses = [make_response(samples, args.products, args.shape) for _ in range(args.responses)]
+    size_mb = sum(len(response) for response in responses) / 1024 / 1024
+    print(f"Ответов: {args.responses} по {args.products} товаров, {size_mb:.1f} МБ JSON; "
+          f"декодер: {'orjson' if orjson is not None else 'json'}")
+
+    print(f"{'Режим':<10} {'Товаров':>9} {'Время, с':>9} {'Товаров/с':>12}")
+    for mode, parse in (('прежний', parse_legacy), ('схема', parse_schema)):
+        total, elapsed = run(parse, responses)
+        print(f"{mode:<10} {total:>9} {elapsed:>9.3f} {total / elapsed:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пропускной способности разбора MCP с логированием и без него.
+
+Режимы:
+  прежний  - INFO на каждый товар через f-строку, синхронные FileHandler и
+             StreamHandler (как logging.basicConfig в парсере раньше);
+  очередь  - log_setup: QueueHandler/QueueListener, товары на DEBUG с
+             ленивыми %-аргументами, на INFO одна сводка по странице;
+  выключено - разбор без вызовов логирования (нижняя граница).
+
+Вывод в stderr направляется в /dev/null, файлы логов пишутся во временный
+каталог. Запуск:
+
+    python bench_logging.py --products 20000 --pages 10
+"""
+
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+from bench_mcp_parser import make_page
+from log_setup import LOG_FORMAT
+from mcp_parser import iter_mcp_products
+
+logger = logging.getLogger('bench_logging')
+
+def parse_without_logging(text, page_number):
+    return list(iter_mcp_products(text, page_number))
+
+def parse_legacy_logging(text, page_number):
+    """Разбор с прежним логированием каждого товара"""
+    products = []
+    for product in iter_mcp_products(text, page_number):
+        products.append(product)
+        logger.info(f"✅ Найден диван: {product['name'][:50]}... - {product['price']:.0f}₽ (стр. {page_number})")
+    return products
+
+def parse_summary_logging(text, page_number):
+    """Разбор как в DivanScraperMCPFinal.iter_page_products"""
+    products = []
+    debug = logger.isEnabledFor(logging.DEBUG)
+    min_price = max_price = None
+    for product in iter_mcp_products(text, page_number):
+        products.append(product)
+        price = product['price']
+        if min_price is None or price < min_price:
+            min_price = price
+        if max_price is None or price > max_price:
+            max_price = price
+        if debug:
+            logger.debug("Найден диван: %s - %.0f₽ (стр. %s)", product['name'][:50], price, page_number)
+    if products:
+        logger.info("📄 Страница %s: разобрано %s диванов, цены %.0f-%.0f₽",
+                    page_number, len(products), min_price, max_price)
+    return products
+
+def make_handlers(log_dir, devnull):
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, 'bench.log'), maxBytes=10 * 1024 * 1024, backupCount=2, encoding='utf-8'
+    )
+    stream_handler = logging.StreamHandler(devnull)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, stream_handler]
+
+def run_mode(mode, pages, log_dir, devnull):
+    """Время разбора всех страниц; для очереди - включая дописывание лога"""
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    listener = None
+    handlers = make_handlers(log_dir, devnull)
+
+    if mode == 'прежний':
+        parse = parse_legacy_logging
+        for handler in handlers:
+            logger.addHandler(handler)
+    elif mode == 'очередь':
+        parse = parse_summary_logging
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, *handlers)
+        listener.start()
+    else:
+        parse = parse_without_logging
+
+    started = time.perf_counter()
+    total = 0
+    for page_number, text in enumerate(pages, 1):
+        total += len(parse(text, page_number))
+    hot_path = time.perf_counter() - started
+    if listener is not None:
+        listener.stop()
+    elapsed = time.perf_counter() - started
+
+    for handler in handlers:
+        handler.close()
+    return total, hot_path, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк логирования разбора MCP")
+    parser.add_argument('--products', type=int, default=20000, help="товаров на странице")
+    parser.add_argument('--pages', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = [make_page(args.products) for _ in range(args.pages)]
+    print(f"{'Режим':<10} {'Товаров':>9} {'Разбор, с':>10} {'Товаров/с':>12} {'С записью лога, с':>18}")
+    with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+        for mode in ('прежний', 'очередь', 'выключено'):
+            total, hot_path, elapsed = run_mode(mode, pages, log_dir, devnull)
+            print(f"{mode:<10} {total:>9} {hot_path:>10.3f} {total / hot_path:>12,.0f} {elapsed:>18.3f}")
+
+if __name__ == "__main__":
+    main()
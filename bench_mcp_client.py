@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк и проверка MCP клиента на локальной заглушке mcp_stub_server.py.
+
+Одна постоянная stdio-сессия: сначала N последовательных tools/call, затем
+те же N вызовов одновременно с мультиплексированием по id запроса. Каждый
+ответ сверяется с данными mcp_real_data.py.
+
+    python bench_mcp_client.py --calls 200 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import time
+
+from mcp_client import STUB_SERVER_COMMAND, McpStdioClient
+from mcp_real_data import get_mcp_data_by_page
+
+BASE_URL = "https://www.divan.ru/blagoveshchensk/category/divany"
+
+def page_url(page):
+    return BASE_URL if page == 1 else f"{BASE_URL}/page-{page}"
+
+async def call_page(client, page):
+    text = await client.call_tool_text('webscraping_ai_text', {'url': page_url(page)})
+    assert text == get_mcp_data_by_page(page), f"ответ для страницы {page} не совпадает с фикстурой"
+
+async def run(calls, latency):
+    command = STUB_SERVER_COMMAND + ['--latency', str(latency)]
+    async with McpStdioClient(command) as client:
+        tools = [tool['name'] for tool in await client.list_tools()]
+        print(f"🔌 Сервер: {client.server_info}, инструменты: {tools}")
+
+        pages = [n % 5 + 1 for n in range(calls)]
+
+        started = time.perf_counter()
+        for page in pages:
+            await call_page(client, page)
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await asyncio.gather(*(call_page(client, page) for page in pages))
+        concurrent = time.perf_counter() - started
+
+        print(f"📊 {calls} вызовов tools/call, задержка сервера {latency * 1000:.0f} мс")
+        print(f"   последовательно: {sequential:.2f} с ({calls / sequential:,.0f} вызовов/с)")
+        print(f"   одновременно:    {concurrent:.2f} с ({calls / concurrent:,.0f} вызовов/с), "
+              f"максимум в полёте: {client.max_in_flight}")
+        print("✅ Все ответы совпадают с mcp_real_data.py")
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк MCP клиента")
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.latency))
+
+if __name__ == "__main__":
+    main()
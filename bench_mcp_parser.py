@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора текста MCP webscraping: однопроходный парсер mcp_parser
+против прежнего построчного разбора с окном ±5 строк.
+
+Синтетические страницы собираются из блоков товаров mcp_real_data.py
+с уникальными ссылками. Запуск:
+
+    python bench_mcp_parser.py --sizes 10000 100000
+"""
+
+import argparse
+import re
+import time
+
+from mcp_parser import parse_mcp_text
+from mcp_real_data import MCP_PAGE_1_DATA, MCP_PAGE_2_DATA, MCP_PAGE_3_DATA
+
+# Прежние паттерны размеров (компилировались заново на каждом вызове re.search)
+LEGACY_DIMENSIONS_PATTERNS = [
+    r'Размеры \(ДхШхВ\)\s*:\s*([\d\sx]+)см',
+    r'Размеры \(ДхШхВ\)\s*([\d\sx]+)см',
+    r'Размеры:\s*([\d\sx]+)см'
+]
+
+LEGACY_SLEEPING_PATTERNS = [
+    r'Спальное место \(ДхШхВ\)\s*:\s*([\d\sx]+)см',
+    r'Спальное место \(ДхШхВ\)\s*([\d\sx]+)см',
+    r'Спальное место:\s*([\d\sx]+)см'
+]
+
+def legacy_find_dimensions(lines, current_index, patterns):
+    """Прежний поиск размеров в окне ±5 строк"""
+    for j in range(max(0, current_index-5), min(len(lines), current_index+5)):
+        for pattern in patterns:
+            match = re.search(pattern, lines[j])
+            if match:
+                return match.group(1).strip()
+    return None
+
+def legacy_parse(text_content, page_number=1):
+    """Прежний разбор DivanScraperMCPFinal.parse_mcp_text_data (без логирования)"""
+    products = []
+
+    response_lower = text_content.lower()
+    if not all(element in response_lower for element in ['диван', 'руб.']):
+        return products
+
+    lines = text_content.split('\n')
+    divan_lines = [line for line in lines if 'диван' in line.lower()]  # noqa: F841
+
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith('[Диван') and '](/product/' in line:
+            name_match = re.search(r'\[([^\]]+)\]\((/product/[^)\s]+)\)', line)
+            if not name_match or i + 1 >= len(lines):
+                continue
+
+            price_match = re.search(r'([\d\s]+)руб\.([\d\s]+)руб\.', lines[i + 1].strip())
+            if not price_match:
+                continue
+
+            discount = None
+            if i + 2 < len(lines) and lines[i + 2].strip().isdigit():
+                discount = lines[i + 2].strip()
+
+            price = re.sub(r'[^\d]', '', price_match.group(1))
+            old_price = re.sub(r'[^\d]', '', price_match.group(2))
+
+            products.append({
+                'name': name_match.group(1).strip(),
+                'price': float(price) if price else None,
+                'old_price': float(old_price) if old_price else None,
+                'discount_percent': int(discount) if discount else None,
+                'dimensions': legacy_find_dimensions(lines, i, LEGACY_DIMENSIONS_PATTERNS),
+                'sleeping_dimensions': legacy_find_dimensions(lines, i, LEGACY_SLEEPING_PATTERNS),
+                'url': f"https://www.divan.ru{name_match.group(2)}",
+                'image_url': None,
+                'page_number': page_number
+            })
+
+    return products
+
+def product_blocks():
+    """Блоки товаров из реальных данных MCP (начиная со строки-ссылки)"""
+    blocks = []
+    for page in (MCP_PAGE_1_DATA, MCP_PAGE_2_DATA, MCP_PAGE_3_DATA):
+        parts = re.split(r'\n(?=\[)', page.strip())
+        blocks.extend(part for part in parts if part.startswith('['))
+    return blocks
+
+def make_page(product_count):
+    """Синтетическая страница из product_count товаров с уникальными ссылками"""
+    blocks = product_blocks()
+    chunks = ["# Диваны в Благовещенске\n", f"Найдено {product_count}\n"]
+    for n in range(product_count):
+        block = blocks[n % len(blocks)]
+        chunks.append(re.sub(r'\((/product/[^)]+)\)', lambda m: f"({m.group(1)}-{n})", block, count=1))
+        chunks.append("\n")
+    return "\n".join(chunks)
+
+def measure(func, text, repeat):
+    """Лучшее время из repeat запусков и результат последнего"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк парсера MCP")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'Товаров':>10} {'Прежний, с':>12} {'Новый, с':>10} {'Ускорение':>10} {'Товаров/с':>12}")
+    for size in args.sizes:
+        text = make_page(size)
+        legacy_time, legacy_products = measure(legacy_parse, text, args.repeat)
+        new_time, new_products = measure(parse_mcp_text, text, args.repeat)
+
+        # Цены и скидки должны совпадать; размеры прежний парсер мог взять у соседа
+        key = lambda p: (p['url'], p['price'], p['old_price'], p['discount_percent'])
+        assert [key(p) for p in new_products] == [key(p) for p in legacy_products], "результаты расходятся"
+
+        print(f"{size:>10} {legacy_time:>12.3f} {new_time:>10.3f} "
+              f"{legacy_time / new_time:>9.1f}x {len(new_products) / new_time:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import hashlib
+import sqlite3
+from datetime import datetime
+
+class CrawlCheckpointStore:
+    """
+    Контрольные точки многостраничного парсинга в локальном SQLite.
+
+    Для каждой страницы каталога хранится статус, хеш содержимого и число
+    найденных/сохранённых товаров. Страница отмечается завершённой только после
+    коммита её товаров в базу, поэтому запуск с --resume запрашивает только
+    незавершённые страницы без потери уже сохранённых данных.
+    """
+
+    def __init__(self, path='crawl_checkpoints.sqlite3'):
+        self.path = path
+        # Страницы, отмеченные failed в этом запуске: (base_url, page_number)
+        self.failed_in_run = set()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_pages (
+                base_url TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                url TEXT,
+                status TEXT NOT NULL,
+                content_hash TEXT,
+                rows_found INTEGER,
+                rows_saved INTEGER,
+                error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (base_url, page_number)
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def content_hash(content):
+        """Хеш содержимого страницы"""
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def start_run(self, base_url, resume=False):
+        """Начало обхода: без resume прошлые отметки для base_url сбрасываются"""
+        self.failed_in_run = {key for key in self.failed_in_run if key[0] != base_url}
+        if not resume:
+            self.conn.execute("DELETE FROM crawl_pages WHERE base_url = ?", (base_url,))
+            self.conn.commit()
+
+    def completed_pages(self, base_url):
+        """Номера страниц, завершённых в текущем обходе"""
+        rows = self.conn.execute(
+            "SELECT page_number FROM crawl_pages WHERE base_url = ? AND status = 'done'",
+            (base_url,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def _upsert(self, base_url, page_number, url, status, content_hash=None,
+                rows_found=None, rows_saved=None, error=None):
+        self.conn.execute("""
+            INSERT INTO crawl_pages (base_url, page_number, url, status, content_hash,
+                                     rows_found, rows_saved, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (base_url, page_number) DO UPDATE SET
+                url = excluded.url,
+                status = excluded.status,
+                content_hash = excluded.content_hash,
+                rows_found = excluded.rows_found,
+                rows_saved = excluded.rows_saved,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+        """, (base_url, page_number, url, status, content_hash, rows_found, rows_saved,
+              error, datetime.now().isoformat(timespec='seconds')))
+        self.conn.commit()
+
+    def mark_page_done(self, base_url, page_number, url, content_hash, rows_found, rows_saved):
+        """
+        Страница разобрана и её товары закоммичены в базу. Ошибку этой же
+        страницы в текущем запуске отметка не перезаписывает (возвращает False):
+        часть её товаров в базу не попала.
+        """
+        if (base_url, page_number) in self.failed_in_run:
+            return False
+        self._upsert(base_url, page_number, url, 'done', content_hash, rows_found, rows_saved)
+        return True
+
+    def mark_page_failed(self, base_url, page_number, url, error):
+        """Страница не обработана; при --resume она будет запрошена снова"""
+        self.failed_in_run.add((base_url, page_number))
+        self._upsert(base_url, page_number, url, 'failed', error=str(error)[:500])
+
+    def summary(self, base_url):
+        """Число завершённых страниц и сохранённых на них товаров"""
+        pages, rows = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(rows_saved), 0) FROM crawl_pages "
+            "WHERE base_url = ? AND status = 'done'",
+            (base_url,)
+        ).fetchone()
+        return pages, rows
+
+    def close(self):
+        self.conn.close()
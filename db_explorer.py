@@ -1,8 +1,9 @@
-import psycopg2
-import pandas as pd
-from psycopg2.extras import RealDictCursor
+import argparse
+from psycopg2 import sql
 import os
 from dotenv import load_dotenv
+from db_pool import get_pool
+from divans_db import DEFAULT_ITERSIZE, server_cursor
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -16,10 +17,13 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD')
 }
 
+# Ширина колонки при выводе строк таблицы
+COLUMN_WIDTH = 20
+
 def connect_to_db():
-    """Подключение к базе данных"""
+    """Подключение к базе данных из общего пула"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_pool(DB_CONFIG).getconn()
         print("✅ Успешно подключились к базе данных PostgreSQL!")
         return conn
     except Exception as e:
@@ -78,33 +82,74 @@ def get_table_info(conn, table_name):
         print(f"❌ Ошибка получения информации о таблице {table_name}: {e}")
         return []
 
-def get_table_data(conn, table_name, limit=10):
-    """Получение данных из таблицы (первые N строк)"""
+def format_cell(value, width=COLUMN_WIDTH):
+    """Значение ячейки, обрезанное или дополненное до ширины колонки"""
+    text = "NULL" if value is None else str(value).replace('\n', ' ')
+    if len(text) > width:
+        return text[:width - 3] + "..."
+    return text.ljust(width)
+
+def print_rows(cursor, width=COLUMN_WIDTH):
+    """
+    Потоковый вывод строк курсора колонками фиксированной ширины: строка
+    печатается сразу после получения, ничего не накапливается в памяти.
+    Возвращает число выведенных строк.
+    """
+    count = 0
+    for row in cursor:
+        if count == 0:
+            # У серверного курсора описание колонок появляется после первой пачки
+            header = ' '.join(format_cell(col[0], width) for col in cursor.description)
+            print(header)
+            print("-" * len(header))
+        print(' '.join(format_cell(value, width) for value in row))
+        count += 1
+    return count
+
+def get_table_data(conn, table_name, limit=10, itersize=DEFAULT_ITERSIZE):
+    """
+    Вывод данных таблицы: первые limit строк, при limit=None - вся таблица.
+    Строки читаются серверным курсором пачками по itersize и печатаются
+    по мере получения, поэтому память не зависит от размера таблицы.
+    Возвращает число выведенных строк.
+    """
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute(f"SELECT * FROM {table_name} LIMIT {limit}")
-        rows = cursor.fetchall()
-        cursor.close()
+        query = sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name))
+        if limit is not None:
+            query = sql.SQL("{} LIMIT {}").format(query, sql.Literal(limit))
         
-        if rows:
-            print(f"\n📄 Первые {len(rows)} строк таблицы '{table_name}':")
-            print("-" * 80)
-            
-            # Конвертируем в DataFrame для красивого вывода
-            df = pd.DataFrame(rows)
-            print(df.to_string(index=False))
-            
-            return rows
+        if limit is not None:
+            print(f"\n📄 Первые строки таблицы '{table_name}' (до {limit}):")
         else:
-            print(f"\n📄 Таблица '{table_name}' пуста")
-            return []
+            print(f"\n📄 Все строки таблицы '{table_name}':")
+        print("-" * 80)
+        
+        with server_cursor(conn, 'db_explorer_rows', itersize) as cursor:
+            cursor.execute(query)
+            count = print_rows(cursor)
+        
+        if count:
+            print(f"📊 Выведено строк: {count}")
+        else:
+            print(f"📄 Таблица '{table_name}' пуста")
+        return count
             
     except Exception as e:
         print(f"❌ Ошибка получения данных из таблицы {table_name}: {e}")
-        return []
+        return 0
 
 def main():
     """Основная функция"""
+    parser = argparse.ArgumentParser(description="Обзор таблиц базы данных PostgreSQL")
+    parser.add_argument('--table', action='append',
+                        help="показать только эту таблицу (можно указать несколько раз)")
+    parser.add_argument('--limit', type=int, default=10,
+                        help="сколько строк выводить из таблицы (0 - все строки)")
+    parser.add_argument('--itersize', type=int, default=DEFAULT_ITERSIZE,
+                        help="строк за один запрос серверного курсора")
+    args = parser.parse_args()
+    limit = args.limit or None
+    
     print("🚀 Подключение к базе данных PostgreSQL...")
     
     # Подключаемся к базе данных
@@ -120,6 +165,9 @@ def main():
             print("❌ Таблицы не найдены")
             return
         
+        if args.table:
+            tables = [table_name for table_name in tables if table_name in args.table]
+        
         # Показываем информацию о каждой таблице
         for table_name in tables:
             print(f"\n{'='*80}")
@@ -130,7 +178,7 @@ def main():
             get_table_info(conn, table_name)
             
             # Данные таблицы
-            get_table_data(conn, table_name)
+            get_table_data(conn, table_name, limit, args.itersize)
             
             print(f"\n{'='*80}")
         
@@ -141,7 +189,9 @@ def main():
     
     finally:
         if conn:
-            conn.close()
+            pool = get_pool(DB_CONFIG)
+            pool.putconn(conn)
+            pool.close()
             print("🔌 Соединение с базой данных закрыто")
 
 if __name__ == "__main__":
@@ -0,0 +1,366 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+from divans_db import get_db_config
+
+logger = logging.getLogger(__name__)
+
+class PoolStats:
+    """Счётчики пула: ожидание свободного подключения, открытия, пересоздания"""
+
+    def __init__(self):
+        self.acquired = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.created = 0
+        self.recycled = 0
+        self.broken = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, waited):
+        with self._lock:
+            self.acquired += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'wait_avg': self.wait_total / self.acquired if self.acquired else 0.0,
+                'wait_max': self.wait_max,
+                'created': self.created,
+                'recycled': self.recycled,
+                'broken': self.broken
+            }
+
+    def format(self, title):
+        stats = self.as_dict()
+        return (f"{title}: выдано подключений {stats['acquired']}, ожидание "
+                f"ср. {stats['wait_avg'] * 1000:.1f} мс / макс {stats['wait_max'] * 1000:.1f} мс, "
+                f"открыто {stats['created']}, пересоздано по возрасту {stats['recycled']}, "
+                f"отброшено неисправных {stats['broken']}")
+
+def config_key(db_config):
+    return tuple(sorted(db_config.items()))
+
+class DbPool:
+    """
+    Пул подключений psycopg2, общий для всех стадий и потоков процесса.
+
+    Подключения открываются лениво, не больше maxconn одновременно; когда все
+    заняты, getconn ждёт освободившееся до acquire_timeout секунд. Свободные
+    подключения хранятся без ограничения на «минимум» (в отличие от
+    ThreadedConnectionPool, который закрывает всё сверх minconn при возврате).
+
+    Подключение старше max_lifetime закрывается и открывается заново, чтобы
+    балансировщики и сервер не рвали долгоживущие сессии посреди работы.
+    Пролежавшее без дела дольше check_idle_after проверяется SELECT 1 перед
+    выдачей; неисправное отбрасывается. Время ожидания копится в stats.
+    """
+
+    def __init__(self, db_config=None, maxconn=8, max_lifetime=1800.0,
+                 check_idle_after=30.0, acquire_timeout=30.0):
+        self.db_config = db_config or get_db_config()
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.check_idle_after = check_idle_after
+        self.acquire_timeout = acquire_timeout
+        self.stats = PoolStats()
+        self.closed = False
+
+        self._idle = []
+        self._open = 0
+        self._born = {}
+        self._returned = {}
+        self._cond = threading.Condition()
+
+    def getconn(self):
+        """Подключение из пула (вернуть через putconn)"""
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self.closed:
+                    raise PoolError("Пул подключений закрыт")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.maxconn:
+                    # Слот занят сразу, подключение откроется вне блокировки
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(f"Нет свободного подключения за {self.acquire_timeout} с "
+                                    f"(все {self.maxconn} заняты)")
+                self._cond.wait(remaining)
+        self.stats.record_wait(time.monotonic() - started)
+
+        if conn is not None:
+            conn = self._validate(conn)
+        if conn is None:
+            conn = self._connect()
+        return conn
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(**self.db_config)
+        except Exception:
+            self._release_slot()
+            raise
+        self._born[id(conn)] = time.monotonic()
+        self.stats.count('created')
+        return conn
+
+    def _validate(self, conn):
+        """Подключение, годное к выдаче, или None, если его пришлось закрыть"""
+        now = time.monotonic()
+        key = id(conn)
+        if now - self._born.get(key, now) > self.max_lifetime:
+            self._discard(conn)
+            self.stats.count('recycled')
+            return None
+        if conn.closed or (now - self._returned.get(key, now) > self.check_idle_after
+                           and not self._is_alive(conn)):
+            self._discard(conn)
+            self.stats.count('broken')
+            logger.warning("⚠️ Подключение из пула не прошло проверку и будет открыто заново")
+            return None
+        return conn
+
+    def _is_alive(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _discard(self, conn):
+        """Закрытие подключения без освобождения слота"""
+        self._born.pop(id(conn), None)
+        self._returned.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _release_slot(self):
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def putconn(self, conn, close=False):
+        """Возврат подключения; незавершённая транзакция откатывается"""
+        if not close and not conn.closed:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+        now = time.monotonic()
+        if not close and now - self._born.get(id(conn), now) > self.max_lifetime:
+            close = True
+            self.stats.count('recycled')
+
+        if close or conn.closed or self.closed:
+            self._discard(conn)
+            self._release_slot()
+            return
+        self._returned[id(conn)] = now
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Подключение из пула: коммит при успешном выходе, откат при ошибке"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except psycopg2.InterfaceError:
+            # Оборванное подключение не возвращается в пул
+            broken = True
+            raise
+        except Exception:
+            # OperationalError бывает и на живом подключении (lock_timeout,
+            # отмена запроса): закрываем только если связь действительно
+            # потеряна, иначе откатываем и возвращаем подключение в пул
+            if conn.closed:
+                broken = True
+            else:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def format_stats(self):
+        return self.stats.format("Пул БД")
+
+    def close(self):
+        """Закрытие свободных подключений; занятые закроются при возврате"""
+        with self._cond:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+        logger.info("🔌 %s", self.format_stats())
+
+class AsyncDbPool:
+    """
+    Пул подключений asyncpg с теми же правилами, что и DbPool: проверка
+    подключения, простоявшего дольше check_idle_after, пересоздание после
+    max_lifetime и учёт времени ожидания. Пул asyncpg привязан к циклу
+    событий, поэтому создаётся при первом acquire внутри работающего цикла.
+    """
+
+    def __init__(self, db_config=None, min_size=1, max_size=8, max_lifetime=1800.0,
+                 check_idle_after=30.0, acquire_timeout=30.0):
+        self.db_config = db_config or get_db_config()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.check_idle_after = check_idle_after
+        self.acquire_timeout = acquire_timeout
+        self.stats = PoolStats()
+        self._pool = None
+        self._create_lock = asyncio.Lock()
+        # Время открытия и возврата по pid серверного процесса подключения
+        self._born = {}
+        self._returned = {}
+
+    async def _init_connection(self, conn):
+        self._born[conn.get_server_pid()] = time.monotonic()
+        self.stats.count('created')
+
+    async def _get_pool(self):
+        async with self._create_lock:
+            if self._pool is None:
+                if asyncpg is None:
+                    raise RuntimeError("Для асинхронного пула установите asyncpg: pip install asyncpg")
+                self._pool = await asyncpg.create_pool(
+                    min_size=self.min_size, max_size=self.max_size,
+                    init=self._init_connection, **self.db_config
+                )
+            return self._pool
+
+    async def _is_alive(self, conn):
+        try:
+            await conn.fetchval("SELECT 1", timeout=self.acquire_timeout)
+            return True
+        except (OSError, asyncio.TimeoutError, asyncpg.InterfaceError,
+                asyncpg.PostgresConnectionError):
+            return False
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Подключение из пула на время блока async with"""
+        pool = await self._get_pool()
+        started = time.monotonic()
+        while True:
+            conn = await pool.acquire(timeout=self.acquire_timeout)
+            pid = conn.get_server_pid()
+            now = time.monotonic()
+            if now - self._born.get(pid, now) > self.max_lifetime:
+                self.stats.count('recycled')
+            elif (now - self._returned.get(pid, now) > self.check_idle_after
+                  and not await self._is_alive(conn)):
+                self.stats.count('broken')
+                logger.warning("⚠️ Подключение asyncpg не прошло проверку и будет открыто заново")
+            else:
+                break
+            # Закрытое подключение пул asyncpg откроет заново при следующей выдаче
+            self._born.pop(pid, None)
+            self._returned.pop(pid, None)
+            try:
+                conn.terminate()
+            except asyncpg.InterfaceError:
+                # Оборванное подключение asyncpg уже отцепил от пула сам
+                pass
+            await pool.release(conn)
+        self.stats.record_wait(time.monotonic() - started)
+        try:
+            yield conn
+        finally:
+            self._returned[pid] = time.monotonic()
+            await pool.release(conn)
+
+    def format_stats(self):
+        return self.stats.format("Пул БД (asyncpg)")
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        logger.info("🔌 %s", self.format_stats())
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Пулы asyncpg - отдельно для каждого цикла событий
+_async_pools = weakref.WeakKeyDictionary()
+
+def get_pool(db_config=None, **kwargs):
+    """Общий для всего процесса пул psycopg2 для этих параметров подключения"""
+    db_config = db_config or get_db_config()
+    key = config_key(db_config)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = DbPool(db_config, **kwargs)
+            _pools[key] = pool
+        return pool
+
+def get_async_pool(db_config=None, **kwargs):
+    """Общий пул asyncpg текущего цикла событий для этих параметров подключения"""
+    db_config = db_config or get_db_config()
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    key = config_key(db_config)
+    pool = pools.get(key)
+    if pool is None:
+        pool = AsyncDbPool(db_config, **kwargs)
+        pools[key] = pool
+    return pool
+
+def close_pools():
+    """Закрытие всех пулов psycopg2 процесса (например, перед выходом)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+async def close_async_pools():
+    """Закрытие пулов asyncpg текущего цикла событий"""
+    pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
@@ -1,6 +1,7 @@
 import requests
 from bs4 import BeautifulSoup
 import json
+from http_cache import HttpPageCache
 
 def debug_page():
     """Отладка структуры страницы divan.ru"""
@@ -9,13 +10,16 @@ def debug_page():
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
     
+    page_cache = HttpPageCache()
+    
     try:
         print("🔍 Получаем страницу для анализа...")
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+        response = page_cache.fetch(url, headers=headers)
         
-        print(f"✅ Страница получена. Статус: {response.status_code}")
+        print(f"✅ Страница получена. Статус: {response.status_code}"
+              f"{' (из кеша)' if response.from_cache else ''}")
         print(f"📏 Размер страницы: {len(response.text)} символов")
+        print(f"📡 {page_cache.format_stats()}")
         
         soup = BeautifulSoup(response.text, 'html.parser')
         
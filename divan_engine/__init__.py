@@ -0,0 +1,30 @@
+"""
+Движок парсинга каталога divan.ru из сменных частей.
+
+Загрузчики: HttpFetcher (requests + HTTP-кеш, в асинхронном режиме через
+пул потоков), McpFetcher (постоянная сессия MCP + кеш ответов).
+Парсеры: DomParser (BeautifulSoup), JsonParser (JSON ответа или состояние
+страницы window.__SERVER_STATE__), McpMarkdownParser (текст MCP).
+Приёмники: PostgresSink (upsert в divans), CsvSink, ParquetSink.
+
+Сессии, кеши и подключения живут в SharedResources и общие для всех стадий.
+"""
+
+from .engine import DEFAULT_CATALOG_URL, ScraperEngine, catalog_page_urls
+from .fetchers import FetchedPage, HttpFetcher, McpFetcher
+from .parsers import (DomParser, JsonParser, McpMarkdownParser, calculate_discount,
+                      dimension_fields, extract_int, extract_price)
+from .resources import SharedResources
+from .sinks import CsvSink, ParquetSink, PostgresSink
+
+FETCHERS = {cls.name: cls for cls in (HttpFetcher, McpFetcher)}
+PARSERS = {cls.name: cls for cls in (DomParser, JsonParser, McpMarkdownParser)}
+
+__all__ = [
+    'DEFAULT_CATALOG_URL', 'FETCHERS', 'PARSERS',
+    'ScraperEngine', 'catalog_page_urls', 'SharedResources',
+    'FetchedPage', 'HttpFetcher', 'McpFetcher',
+    'DomParser', 'JsonParser', 'McpMarkdownParser',
+    'extract_price', 'extract_int', 'calculate_discount', 'dimension_fields',
+    'PostgresSink', 'CsvSink', 'ParquetSink',
+]
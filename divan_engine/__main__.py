@@ -0,0 +1,67 @@
+"""
+Запуск движка из командной строки:
+
+    python -m divan_engine --fetcher mcp --parser mcp --sink postgres --pages 5
+    python -m divan_engine --fetcher http --parser json --sink csv --sink parquet --output divans
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from log_setup import setup_logging
+
+from . import (DEFAULT_CATALOG_URL, FETCHERS, PARSERS, CsvSink, ParquetSink, PostgresSink,
+               ScraperEngine, SharedResources, catalog_page_urls)
+
+logger = logging.getLogger('divan_engine')
+
+def build_sinks(names, resources, output):
+    sinks = []
+    for name in names:
+        if name == 'postgres':
+            sink = PostgresSink(resources)
+            sink.create_table()
+        elif name == 'csv':
+            sink = CsvSink(f"{output}.csv")
+        else:
+            sink = ParquetSink(f"{output}.parquet")
+        sinks.append(sink)
+    return sinks
+
+def main():
+    parser = argparse.ArgumentParser(description="Парсинг каталога диванов divan.ru")
+    parser.add_argument('--fetcher', choices=sorted(FETCHERS), default='mcp')
+    parser.add_argument('--parser', choices=sorted(PARSERS), default='mcp')
+    parser.add_argument('--sink', action='append', choices=['postgres', 'csv', 'parquet'],
+                        help="куда записывать товары (можно указать несколько раз)")
+    parser.add_argument('--url', default=DEFAULT_CATALOG_URL)
+    parser.add_argument('--pages', type=int, default=1)
+    parser.add_argument('--output', default=None,
+                        help="имя файла без расширения для CSV/Parquet")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="параллельная загрузка страниц")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--no-cache', action='store_true', help="не использовать кеш ответов MCP")
+    args = parser.parse_args()
+
+    load_dotenv()
+    setup_logging('divan_engine.log')
+
+    resources = SharedResources(use_mcp_cache=not args.no_cache)
+    output = args.output or f"divans_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    sinks = build_sinks(args.sink or ['postgres'], resources, output)
+    pages = catalog_page_urls(args.url, args.pages)
+
+    with ScraperEngine(FETCHERS[args.fetcher](resources), PARSERS[args.parser](), sinks, resources) as engine:
+        if args.async_mode:
+            total = asyncio.run(engine.scrape_async(pages, args.concurrency))
+        else:
+            total = engine.scrape(pages)
+    logger.info("🎉 Обход завершён: %s диванов", total)
+
+if __name__ == "__main__":
+    main()
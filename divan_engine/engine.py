@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+from .resources import SharedResources
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_URL = "https://www.divan.ru/blagoveshchensk/category/divany"
+
+def catalog_page_urls(base_url=DEFAULT_CATALOG_URL, pages=1):
+    """Пары (номер страницы, url) каталога; первая страница без суффикса /page-N"""
+    return [(page, base_url if page == 1 else f"{base_url}/page-{page}")
+            for page in range(1, pages + 1)]
+
+class ScraperEngine:
+    """
+    Обход каталога из сменных частей: загрузчик -> парсер -> приёмники.
+
+    Загрузчик отдаёт FetchedPage (или None), парсер превращает текст страницы
+    в поток словарей-товаров, каждый приёмник получает их пачками по batch_size.
+    Страница отмечается загрузчиком как разобранная только после того, как
+    все приёмники записали её товары.
+    """
+
+    def __init__(self, fetcher, parser, sinks, resources=None, batch_size=200):
+        self.fetcher = fetcher
+        self.parser = parser
+        self.sinks = list(sinks)
+        self.resources = resources or getattr(fetcher, 'resources', None) or SharedResources()
+        self.batch_size = batch_size
+
+    def write(self, products):
+        """Пачка товаров во все приёмники"""
+        if not products:
+            return
+        for sink in self.sinks:
+            sink.write(products)
+
+    def process_page(self, page):
+        """Разбор и запись загруженной страницы; возвращает число товаров"""
+        if not page.changed:
+            logger.info("⏭️ Страница %s не изменилась с прошлого запуска, разбор пропущен", page.page_number)
+            return 0
+
+        found = 0
+        batch = []
+        for product in self.parser.parse(page.text, page.page_number):
+            batch.append(product)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                found += len(batch)
+                batch = []
+        self.write(batch)
+        found += len(batch)
+
+        self.fetcher.mark_done(page)
+        logger.info("📄 Страница %s: записано %s диванов", page.page_number, found)
+        return found
+
+    def scrape_page(self, url, page_number=1):
+        page = self.fetcher.fetch(url, page_number)
+        if page is None:
+            return 0
+        return self.process_page(page)
+
+    def scrape(self, pages):
+        """Последовательный обход пар (номер страницы, url); возвращает число товаров"""
+        total = 0
+        for page_number, url in pages:
+            total += self.scrape_page(url, page_number)
+        logger.info("📡 %s", self.fetcher.format_stats())
+        return total
+
+    async def scrape_async(self, pages, concurrency=8):
+        """
+        Параллельная загрузка страниц с не более чем concurrency запросами
+        одновременно. Разбор и запись идут в пуле потоков по одной странице
+        за раз: приёмники (CSV, Parquet) не рассчитаны на параллельную запись.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        write_lock = asyncio.Lock()
+
+        async def run(page_number, url):
+            async with semaphore:
+                page = await self.fetcher.fetch_async(url, page_number)
+            if page is None:
+                return 0
+            async with write_lock:
+                return await asyncio.to_thread(self.process_page, page)
+
+        counts = await asyncio.gather(*(run(page_number, url) for page_number, url in pages))
+        logger.info("📡 %s", self.fetcher.format_stats())
+        return sum(counts)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+        self.resources.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+
+from rate_limiter import get_limiter
+
+logger = logging.getLogger(__name__)
+
+class FetchedPage:
+    """Загруженная страница каталога"""
+
+    def __init__(self, url, text, page_number=1, changed=True, from_cache=False):
+        self.url = url
+        self.text = text
+        self.page_number = page_number
+        self.changed = changed  # содержимое отличается от последнего успешного разбора
+        self.from_cache = from_cache
+
+class HttpFetcher:
+    """
+    Загрузка HTML через общую requests.Session и дисковый HTTP-кеш (ETag/Last-Modified).
+
+    fetch_async выполняет тот же запрос в пуле потоков: aiohttp не входит
+    в зависимости, а сессия и кеш уже потокобезопасно разделяются; темп и
+    параллельность запросов к хосту задаёт общий лимитер внутри кеша.
+    """
+
+    name = 'http'
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def fetch(self, url, page_number=1):
+        """Загрузка страницы; None, если она не получена"""
+        try:
+            page = self.resources.page_cache.fetch(url)
+        except Exception as e:
+            logger.error("Ошибка получения страницы %s: %s", url, e)
+            return None
+        return FetchedPage(url, page.text, page_number, page.changed, page.from_cache)
+
+    async def fetch_async(self, url, page_number=1):
+        return await asyncio.to_thread(self.fetch, url, page_number)
+
+    def mark_done(self, page):
+        """Содержимое страницы разобрано и записано"""
+        self.resources.page_cache.mark_parsed(page.url)
+
+    def format_stats(self):
+        return self.resources.page_cache.format_stats()
+
+class McpFetcher:
+    """
+    Загрузка текста страницы инструментом MCP webscraping.
+
+    Перед вызовом проверяется кеш ответов MCP; удалённый вызов идёт через
+    постоянную сессию MCP под слотом адаптивного лимитера хоста.
+    """
+
+    name = 'mcp'
+
+    def __init__(self, resources, tool=None):
+        self.resources = resources
+        self.tool = tool or os.getenv('MCP_TEXT_TOOL', 'webscraping_ai_text')
+
+    def arguments(self, url):
+        """Аргументы инструмента получения текста страницы"""
+        return {
+            'url': url,
+            'text_format': 'plain',
+            'return_links': True
+        }
+
+    def _cached(self, url, page_number):
+        cache = self.resources.mcp_cache
+        if cache is None:
+            return None
+        text = cache.get(self.tool, self.arguments(url))
+        if text is None:
+            return None
+        return FetchedPage(url, text, page_number, from_cache=True)
+
+    def _store(self, url, text):
+        cache = self.resources.mcp_cache
+        if cache is not None and text is not None:
+            cache.put(self.tool, self.arguments(url), text)
+
+    def fetch(self, url, page_number=1):
+        """Загрузка страницы из кеша или через MCP; None, если она не получена"""
+        page = self._cached(url, page_number)
+        if page is not None:
+            return page
+
+        # Сессия создаётся вне try: ошибка конфигурации (нет MCP_SERVER_COMMAND)
+        # останавливает обход, а не превращается в неудачную страницу
+        client = self.resources.mcp_client
+        logger.info("Получение данных с: %s", url)
+        with get_limiter(url).slot() as slot:
+            try:
+                text = client.call_tool_text(self.tool, self.arguments(url))
+            except Exception as e:
+                logger.error("Ошибка при получении данных MCP: %s", e)
+                slot.record(None)
+                return None
+        self._store(url, text)
+        return FetchedPage(url, text, page_number)
+
+    async def fetch_async(self, url, page_number=1):
+        """Асинхронная загрузка; может вызываться из любого цикла событий"""
+        page = self._cached(url, page_number)
+        if page is not None:
+            return page
+
+        client = self.resources.mcp_client
+        logger.info("Получение данных с: %s", url)
+        async with get_limiter(url).async_slot() as slot:
+            try:
+                text = await client.call_tool_text_async(self.tool, self.arguments(url))
+            except Exception as e:
+                logger.error("Ошибка при получении данных MCP: %s", e)
+                slot.record(None)
+                return None
+        self._store(url, text)
+        return FetchedPage(url, text, page_number)
+
+    def mark_done(self, page):
+        pass
+
+    def format_stats(self):
+        cache = self.resources.mcp_cache
+        return cache.format_stats() if cache is not None else "MCP-кеш отключён"
@@ -0,0 +1,534 @@
+import json
+import logging
+import re
+from typing import List, Optional, Union
+
+from mcp_parser import BASE_URL, dimension_fields, iter_mcp_products, looks_like_catalog
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него используется стандартный json
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec необязателен: без него схема применяется к готовому документу
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+# Цена: первая группа цифр с пробелами-разделителями разрядов ("41 150 руб.");
+# \s в str-паттерне покрывает и неразрывные/узкие пробелы
+PRICE_RE = re.compile(r'\d[\d\s]*')
+NON_DIGIT_RE = re.compile(r'\D')
+
+# Ключи, под которыми ответ MCP (или API) может отдавать список товаров
+PRODUCT_LIST_KEYS = ('products', 'items', 'data', 'result', 'content', 'products_data')
+
+# Возможные ключи полей товара в JSON, в порядке предпочтения
+NAME_KEYS = ('name', 'title', 'product_name')
+FIELD_KEYS = {
+    'name': NAME_KEYS,
+    'price': ('price', 'current_price'),
+    'old_price': ('old_price', 'original_price'),
+    'url': ('url', 'link', 'href'),
+    'image_url': ('image_url', 'image', 'img', 'images'),
+    'dimensions': ('dimensions', 'size'),
+    'sleeping_dimensions': ('sleeping_dimensions', 'sleeping_size'),
+}
+
+# Состояние страницы divan.ru, встроенное в HTML
+SERVER_STATE_MARKER = 'window.__SERVER_STATE__='
+
+def loads(text):
+    """json.loads через orjson, если он установлен (ошибки - ValueError в обоих случаях)"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def extract_price(price_text):
+    """Цена из числа или текста вида "41 150 руб." (или None)"""
+    if price_text is None or price_text == '':
+        return None
+    if isinstance(price_text, (int, float)):
+        return float(price_text)
+    match = PRICE_RE.search(str(price_text))
+    if not match:
+        return None
+    return float(NON_DIGIT_RE.sub('', match.group()))
+
+def extract_int(text):
+    """Целое из текста вида "-30%" (или None)"""
+    if isinstance(text, int):
+        return text
+    digits = NON_DIGIT_RE.sub('', str(text)) if text is not None else ''
+    return int(digits) if digits else None
+
+def calculate_discount(old_price, current_price):
+    """Процент скидки по старой и текущей цене (или None)"""
+    if old_price and current_price and old_price > current_price:
+        return int(((old_price - current_price) / old_price) * 100)
+    return None
+
+def absolute_url(url):
+    if url and url.startswith('/'):
+        return BASE_URL + url
+    return url or None
+
+class McpMarkdownParser:
+    """Товары из текста MCP webscraping (однопроходный разбор mcp_parser)"""
+
+    name = 'mcp'
+
+    def parse(self, text, page_number=1):
+        if not looks_like_catalog(text):
+            logger.warning("Ответ MCP не содержит ожидаемые элементы (стр. %s)", page_number)
+            return iter(())
+        return iter_mcp_products(text, page_number)
+
+class DomParser:
+    """
+    Товары из HTML каталога по карточкам data-testid="product-card".
+    Используется lxml, если он установлен (заметно быстрее html.parser).
+    """
+
+    name = 'dom'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self.BeautifulSoup = BeautifulSoup
+        try:
+            import lxml  # noqa: F401
+            self.features = 'lxml'
+        except ImportError:
+            self.features = 'html.parser'
+
+    def parse(self, text, page_number=1):
+        soup = self.BeautifulSoup(text, self.features)
+
+        product_cards = soup.find_all('div', attrs={'data-testid': 'product-card'})
+        if not product_cards:
+            # Прежняя вёрстка карточек
+            product_cards = soup.find_all('div', class_='_Ud0k')
+        if not product_cards:
+            logger.warning("Карточки товаров не найдены (стр. %s)", page_number)
+            return
+
+        logger.info("Найдено %s карточек товаров (стр. %s)", len(product_cards), page_number)
+        for i, card in enumerate(product_cards):
+            try:
+                product = self.parse_card(card, i, page_number)
+            except Exception as e:
+                logger.warning("Ошибка парсинга товара %s: %s", i + 1, e)
+                continue
+            yield product
+
+    def parse_card(self, card, index=0, page_number=1):
+        """Один товар из карточки"""
+        name_elem = card.find('span', attrs={'itemprop': 'name'})
+        url_elem = card.find('a', class_='qUioe')
+        img_elem = card.find('img', attrs={'itemprop': 'image'})
+        price_elem = card.find('span', attrs={'data-testid': 'price'})
+        old_price_elem = card.find('span', class_='ui-SVNym')
+        discount_elem = card.find('div', class_='ui-OQy8X')
+
+        dimensions = self.extract_dimensions(card.find('div', class_='nfZ4w'))
+        return {
+            'name': name_elem.get_text().strip() if name_elem else f"Диван {index + 1}",
+            'price': extract_price(price_elem.get_text()) if price_elem else None,
+            'old_price': extract_price(old_price_elem.get_text()) if old_price_elem else None,
+            'discount_percent': extract_int(discount_elem.get_text()) if discount_elem else None,
+            'dimensions': dimensions.get('dimensions'),
+            'sleeping_dimensions': dimensions.get('sleeping_dimensions'),
+            'url': absolute_url(url_elem.get('href')) if url_elem else None,
+            'image_url': img_elem.get('src') if img_elem else None,
+            'page_number': page_number,
+            **dimension_fields(dimensions.get('dimensions'), dimensions.get('sleeping_dimensions'))
+        }
+
+    def extract_dimensions(self, specs_list):
+        """Размеры из списка характеристик карточки"""
+        dimensions = {}
+        if not specs_list:
+            return dimensions
+        for spec in specs_list.find_all('li', class_='aoJQe'):
+            spec_name = spec.find('span', class_='u0pek')
+            spec_value = spec.find('span', class_='vdukP')
+            if spec_name and spec_value:
+                name = spec_name.get_text().strip()
+                value = spec_value.get_text().strip()
+                if 'Размеры (ДхШхВ)' in name:
+                    dimensions['dimensions'] = value
+                elif 'Спальное место (ДхШхВ)' in name:
+                    dimensions['sleeping_dimensions'] = value
+        return dimensions
+
+class ProductLayout:
+    """
+    Схема JSON-источника: путь к массивам товаров и ключи полей товара.
+
+    path - шаги от корня документа: ключ словаря, индекс списка или '*'
+    (каждый элемент списка). fields - ключ товара для каждого поля записи,
+    выбранный по первому товару; price_kind и image_kind говорят, как читать
+    цену (число/строка или словарь actual/expired/discount) и изображение.
+    """
+
+    def __init__(self, path, fields, price_kind='scalar', image_kind='scalar'):
+        self.path = tuple(path)
+        self.fields = fields
+        self.price_kind = price_kind
+        self.image_kind = image_kind
+        self.single = None
+        # Типизированный декодер msgspec (или None) и пары (ключ JSON, атрибут записи)
+        self.decoder = None
+        self.record_keys = ()
+
+    def build_decoder(self, extra_keys=()):
+        """
+        Декодер msgspec, который читает из текста только путь к товарам и
+        нужные поля: остальные ключи документа и товара пропускаются без
+        создания объектов. Путь с индексами списков не поддерживается.
+
+        Декодер строится только для товаров состояния страницы (цена - словарь
+        actual/expired): там большая часть каждого товара - варианты, параметры
+        и изображения, которые не нужны. В плоских товарах ответа MCP лишних
+        ключей почти нет, и пересборка словаря из записи msgspec обходится
+        дороже, чем orjson/json целиком (~97k против ~115k товаров/с).
+        """
+        if msgspec is None or self.single or any(isinstance(step, int) for step in self.path):
+            return
+        if self.price_kind != 'dict':
+            return
+        types = {
+            'price': dict if self.price_kind == 'dict' else Union[str, float],
+            'old_price': Union[str, float],
+            'image_url': list if self.image_kind == 'list' else str,
+        }
+        keys = [(key, types.get(field, str)) for field, key in self.fields.items() if key]
+        keys.extend(extra_keys)
+        record_keys = []
+        struct_fields = []
+        for i, (key, key_type) in enumerate(keys):
+            attr = f'f{i}'
+            record_keys.append((key, attr))
+            struct_fields.append((attr, Optional[key_type], msgspec.field(name=key, default=None)))
+        node_type = List[msgspec.defstruct('ProductRecord', struct_fields, gc=False)]
+        for step in reversed(self.path):
+            if step == '*':
+                node_type = List[node_type]
+            else:
+                node_type = msgspec.defstruct(
+                    'ProductPath', [('node', Optional[node_type], msgspec.field(name=step, default=None))]
+                )
+        self.decoder = msgspec.json.Decoder(node_type)
+        self.record_keys = tuple(record_keys)
+
+    def typed_items(self, text):
+        """Товары как словари нужных ключей; ValueError - текст не соответствует схеме"""
+        items = []
+        self._collect(self.decoder.decode(text), 0, items)
+        record_keys = self.record_keys
+        name_attr = record_keys[0][1]
+        records = []
+        for record in items:
+            if getattr(record, name_attr) is None:
+                # Товар без поля названия схемы: его ключей в записи может не оказаться
+                raise ValueError("товар без названия")
+            records.append({key: getattr(record, attr) for key, attr in record_keys})
+        return records
+
+    def _collect(self, node, depth, items):
+        for i in range(depth, len(self.path)):
+            if node is None:
+                raise ValueError(f"нет ключа {self.path[i]!r}")
+            if self.path[i] == '*':
+                for child in node:
+                    self._collect(child, i + 1, items)
+                return
+            node = node.node
+        items.extend(node or ())
+
+    def arrays(self, data):
+        """Массивы товаров по пути; KeyError/IndexError/TypeError - документ другой формы"""
+        return self._walk(data, 0)
+
+    def _walk(self, node, depth):
+        for i in range(depth, len(self.path)):
+            step = self.path[i]
+            if step == '*':
+                arrays = []
+                for child in node:
+                    arrays.extend(self._walk(child, i + 1))
+                return arrays
+            node = node[step]
+        if node is None:
+            return []
+        if self.single is None:
+            # Первый документ источника задаёт, список здесь или один товар
+            self.single = isinstance(node, dict)
+        if isinstance(node, dict) and self.single:
+            return [[node]]
+        if isinstance(node, list) and not self.single:
+            return [node]
+        raise TypeError(f"по пути {self.path} ожидался {'товар' if self.single else 'список товаров'}")
+
+class JsonParser:
+    """
+    Товары из JSON: ответ MCP/API со списком товаров или состояние страницы
+    window.__SERVER_STATE__, встроенное в HTML каталога divan.ru.
+
+    Форма документа определяется один раз на источник: путь к массивам товаров
+    и ключи полей кешируются в ProductLayout, и следующие ответы того же
+    источника разбираются прямым доступом по ключам, без обхода словарей.
+    Тяжёлые товары состояния страницы с msgspec декодируются сразу в
+    типизированные записи (лишние ключи не создаются), остальное - orjson
+    или json целиком.
+    Если документ перестал соответствовать схеме, она определяется заново.
+    """
+
+    name = 'json'
+
+    def __init__(self):
+        self.layouts = {}
+        self.detections = 0
+
+    def parse(self, text, page_number=1, source=None):
+        if source is None:
+            source = 'json' if isinstance(text, (dict, list)) or text.lstrip()[:1] in ('{', '[') else 'state'
+        layout = self.layouts.get(source)
+        if layout is not None and layout.decoder is not None and isinstance(text, str):
+            try:
+                items = layout.typed_items(text)
+            except ValueError as e:
+                # Документ другой формы: дальше этот источник разбирается без
+                # типизированного декодера, пока схема не определится заново
+                logger.debug("Схема JSON источника %s не подошла: %s", source, e)
+                layout.decoder = None
+            else:
+                yield from self.decode_items(layout, items, page_number)
+                return
+        try:
+            data = self.load(text)
+        except ValueError as e:
+            logger.error("Ошибка разбора JSON (стр. %s): %s", page_number, e)
+            return
+        if data is None:
+            logger.warning("JSON с товарами не найден (стр. %s)", page_number)
+            return
+        yield from self.parse_data(data, page_number, source)
+
+    def load(self, text):
+        """JSON-документ из ответа или из HTML страницы (или None)"""
+        if isinstance(text, (dict, list)):
+            return text
+        stripped = text.lstrip()
+        if stripped[:1] in ('{', '['):
+            return loads(stripped)
+        start = text.find(SERVER_STATE_MARKER)
+        if start < 0:
+            return None
+        start += len(SERVER_STATE_MARKER)
+        # Обычно объект занимает весь <script>: его можно отдать быстрому
+        # декодеру целиком; иначе raw_decode читает ровно один объект
+        end = text.find('</script>', start)
+        if end > 0:
+            try:
+                return loads(text[start:end].rstrip().rstrip(';'))
+            except ValueError:
+                pass
+        data, _ = json.JSONDecoder().raw_decode(text, start)
+        return data
+
+    def detect_path(self, data):
+        """Путь к массивам товаров в документе (или None)"""
+        if isinstance(data, list):
+            return ()
+        if not isinstance(data, dict):
+            return None
+        if isinstance(data.get('queries'), list):
+            # Состояние страницы: queries[i].state.data.pages[].products
+            for index, query in enumerate(data['queries']):
+                query_data = ((query or {}).get('state') or {}).get('data')
+                if isinstance(query_data, dict) and isinstance(query_data.get('pages'), list):
+                    if any(isinstance(page, dict) and page.get('products') for page in query_data['pages']):
+                        return ('queries', index, 'state', 'data', 'pages', '*', 'products')
+            return None
+        for key in PRODUCT_LIST_KEYS:
+            if key in data:
+                value = data[key]
+                # Обёртка вида {"data": {"products": [...]}}
+                if isinstance(value, dict) and not self.has_name(value):
+                    nested = self.detect_path(value)
+                    if nested is not None:
+                        return (key,) + nested
+                return (key,)
+        return None
+
+    def has_name(self, item):
+        return any(key in item for key in NAME_KEYS)
+
+    def detect_layout(self, data):
+        """ProductLayout документа по пути к товарам и первому товару (или None)"""
+        path = self.detect_path(data)
+        if path is None:
+            return None
+        layout = ProductLayout(path, {})
+        sample = next((item for array in layout.arrays(data) for item in array
+                       if isinstance(item, dict) and self.has_name(item)), None)
+        if sample is None:
+            return layout
+
+        fields = {}
+        for field, keys in FIELD_KEYS.items():
+            fields[field] = next((key for key in keys if key in sample), None)
+        if isinstance(sample.get(fields['price']), dict):
+            layout.price_kind = 'dict'
+        if fields['image_url'] == 'images':
+            layout.image_kind = 'list'
+        layout.fields = fields
+        # Размеры из вариантов (состояние страницы) читаются по этим ключам
+        extra_keys = ()
+        if not (fields['dimensions'] or fields['sleeping_dimensions']) and 'variants' in sample:
+            extra_keys = (('variants', dict), ('parameters', list))
+            if fields['url'] != 'link':
+                extra_keys += (('link', str),)
+        layout.build_decoder(extra_keys)
+        self.detections += 1
+        logger.debug("Схема JSON: путь %s, поля %s", path, fields)
+        return layout
+
+    def parse_data(self, data, page_number=1, source='json'):
+        layout = self.layouts.get(source)
+        arrays = None
+        if layout is not None:
+            try:
+                arrays = layout.arrays(data)
+            except (KeyError, IndexError, TypeError):
+                arrays = None
+        if arrays is None:
+            # Первый документ источника или он сменил форму
+            layout = self.detect_layout(data)
+            if layout is None:
+                # Ответ MCP с текстом страницы вместо структуры
+                if isinstance(data, dict) and data.get('text'):
+                    yield from iter_mcp_products(data['text'], page_number)
+                return
+            if layout.fields:
+                self.layouts[source] = layout
+            arrays = layout.arrays(data)
+
+        for array in arrays:
+            yield from self.decode_items(layout, array, page_number)
+
+    def decode_items(self, layout, items, page_number=1):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            product = self.decode_item(layout, item, page_number)
+            if product is None:
+                # Товар не по схеме: разбор перебором ключей
+                product = self.parse_item(item, page_number)
+            if product:
+                yield product
+
+    def decode_item(self, layout, item, page_number=1):
+        """Товар по схеме источника: прямой доступ к ключам и приведение типов"""
+        fields = layout.fields
+        name_key = fields.get('name')
+        name = item.get(name_key) if name_key else None
+        if not name:
+            return None
+
+        discount = None
+        if layout.price_kind == 'dict':
+            price_field = item.get(fields['price']) or {}
+            price = extract_price(price_field.get('actual'))
+            old_price = extract_price(price_field.get('expired'))
+            discount = extract_int(price_field.get('discount'))
+        else:
+            price = extract_price(item.get(fields['price'])) if fields['price'] else None
+            old_price = extract_price(item.get(fields['old_price'])) if fields['old_price'] else None
+        if not discount:
+            discount = calculate_discount(old_price, price)
+
+        image_url = item.get(fields['image_url']) if fields['image_url'] else None
+        if layout.image_kind == 'list':
+            first = image_url[0] if image_url else None
+            image_url = first.get('src') if isinstance(first, dict) else first
+
+        dimensions = item.get(fields['dimensions']) if fields['dimensions'] else None
+        sleeping_dimensions = item.get(fields['sleeping_dimensions']) if fields['sleeping_dimensions'] else None
+        if not (dimensions or sleeping_dimensions) and 'variants' in item:
+            dimensions, sleeping_dimensions = self.variant_dimensions(item)
+
+        return {
+            'name': name,
+            'price': price,
+            'old_price': old_price,
+            'discount_percent': discount,
+            'dimensions': dimensions or None,
+            'sleeping_dimensions': sleeping_dimensions or None,
+            'url': absolute_url(item.get(fields['url'])) if fields['url'] else None,
+            'image_url': image_url or None,
+            'page_number': page_number,
+            **dimension_fields(dimensions, sleeping_dimensions)
+        }
+
+    def parse_item(self, item, page_number=1):
+        """Один товар из словаря перебором возможных ключей (или None, если у него нет названия)"""
+        name = item.get('name') or item.get('title') or item.get('product_name')
+        if not name:
+            return None
+
+        price_field = item.get('price')
+        discount = None
+        if isinstance(price_field, dict):
+            # Состояние страницы: {"actual": 41150, "expired": 58790, "discount": 30}
+            price = extract_price(price_field.get('actual'))
+            old_price = extract_price(price_field.get('expired'))
+            discount = price_field.get('discount') or None
+        else:
+            price = extract_price(price_field or item.get('current_price'))
+            old_price = extract_price(item.get('old_price') or item.get('original_price'))
+        if discount is None:
+            discount = calculate_discount(old_price, price)
+
+        url = item.get('url') or item.get('link') or item.get('href')
+        image_url = item.get('image_url') or item.get('image') or item.get('img')
+        images = item.get('images')
+        if not image_url and isinstance(images, list) and images:
+            first = images[0]
+            image_url = first.get('src') if isinstance(first, dict) else first
+
+        dimensions = item.get('dimensions') or item.get('size')
+        sleeping_dimensions = item.get('sleeping_dimensions') or item.get('sleeping_size')
+        if not (dimensions or sleeping_dimensions):
+            dimensions, sleeping_dimensions = self.variant_dimensions(item)
+
+        return {
+            'name': name,
+            'price': price,
+            'old_price': old_price,
+            'discount_percent': discount,
+            'dimensions': dimensions or None,
+            'sleeping_dimensions': sleeping_dimensions or None,
+            'url': absolute_url(url),
+            'image_url': image_url or None,
+            'page_number': page_number,
+            **dimension_fields(dimensions, sleeping_dimensions)
+        }
+
+    def variant_dimensions(self, item):
+        """
+        Размеры из вариантов товара в состоянии страницы: строка вида "198 x 120 x 36"
+        у варианта с той же ссылкой; что это за размеры, говорит заголовок параметров.
+        """
+        variants = (item.get('variants') or {}).get('values') or []
+        value = next((variant.get('parameters') for variant in variants
+                      if variant.get('link') == item.get('link')), None)
+        if not value:
+            return None, None
+        titles = ' '.join(param.get('title') or '' for param in item.get('parameters') or [])
+        if 'Спальное место' in titles:
+            return None, value
+        return value, None
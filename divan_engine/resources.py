@@ -0,0 +1,101 @@
+import threading
+
+from db_pool import get_pool
+from divans_db import get_db_config
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+class SharedResources:
+    """
+    Дорогие ресурсы, общие для всех стадий движка.
+
+    HTTP-сессия с дисковым кешем страниц, постоянная сессия MCP, кеш ответов
+    MCP и пул подключений к базе создаются лениво, один раз на процесс обхода,
+    и переиспользуются всеми загрузчиками, парсерами и приёмниками.
+    """
+
+    def __init__(self, db_config=None, headers=None, use_mcp_cache=True):
+        self.db_config = db_config or get_db_config()
+        self.headers = headers or DEFAULT_HEADERS
+        self.use_mcp_cache = use_mcp_cache
+        self._lock = threading.Lock()
+        self._http_session = None
+        self._page_cache = None
+        self._mcp_client = None
+        self._mcp_cache = None
+        self._db_pool = None
+
+    @property
+    def http_session(self):
+        """requests.Session с заголовками по умолчанию (пул соединений keep-alive)"""
+        with self._lock:
+            if self._http_session is None:
+                import requests
+                self._http_session = requests.Session()
+                self._http_session.headers.update(self.headers)
+            return self._http_session
+
+    @property
+    def page_cache(self):
+        """Дисковый HTTP-кеш с условными запросами поверх общей сессии"""
+        session = self.http_session
+        with self._lock:
+            if self._page_cache is None:
+                from http_cache import HttpPageCache
+                self._page_cache = HttpPageCache(session=session)
+            return self._page_cache
+
+    @property
+    def mcp_client(self):
+        """Постоянная сессия MCP, общая для всех потоков и задач"""
+        with self._lock:
+            if self._mcp_client is None:
+                from mcp_client import McpClientSync
+                self._mcp_client = McpClientSync()
+            return self._mcp_client
+
+    @property
+    def mcp_cache(self):
+        """Кеш ответов MCP (None, если отключён)"""
+        if not self.use_mcp_cache:
+            return None
+        with self._lock:
+            if self._mcp_cache is None:
+                from mcp_cache import McpResponseCache
+                self._mcp_cache = McpResponseCache()
+            return self._mcp_cache
+
+    @property
+    def db_pool(self):
+        """Общий для процесса пул подключений к базе (db_pool.DbPool)"""
+        with self._lock:
+            if self._db_pool is None or self._db_pool.closed:
+                self._db_pool = get_pool(self.db_config)
+            return self._db_pool
+
+    def connection(self):
+        """Подключение из пула: коммит при успешном выходе, откат при ошибке"""
+        return self.db_pool.connection()
+
+    def close_mcp_client(self):
+        """Закрытие сессии MCP (при следующем обращении она откроется заново)"""
+        with self._lock:
+            client, self._mcp_client = self._mcp_client, None
+        if client is not None:
+            client.close()
+
+    def close(self):
+        self.close_mcp_client()
+        with self._lock:
+            if self._mcp_cache is not None:
+                self._mcp_cache.close()
+                self._mcp_cache = None
+            if self._http_session is not None:
+                self._http_session.close()
+                self._http_session = None
+                self._page_cache = None
+            if self._db_pool is not None:
+                self._db_pool.close()
+                self._db_pool = None
@@ -0,0 +1,140 @@
+import csv
+import logging
+
+from divans_db import DIMENSION_COLUMNS, DIVAN_COLUMNS, notify_scrape_finished, upsert_divans
+from divans_migrations import migrate
+
+logger = logging.getLogger(__name__)
+
+class PostgresSink:
+    """
+    Идемпотентная запись товаров (upsert по url) в products / product_prices,
+    изменения цен - наблюдениями в price_observations; читатели видят их через
+    представление divans. Общий приёмник всех парсеров. close() завершает
+    запуск: NOTIFY divans_scraped сбрасывает кеш API.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, resources, columns=DIVAN_COLUMNS):
+        self.resources = resources
+        self.columns = tuple(columns)
+        self.written = 0
+
+    def create_table(self):
+        """Недостающие миграции схемы divans; возвращает список применённых"""
+        with self.resources.connection() as conn:
+            applied = migrate(conn)
+        if applied:
+            logger.info("Применено миграций схемы: %s", len(applied))
+        logger.info("Таблица divans готова к работе")
+        return applied
+
+    def write(self, products):
+        """Upsert пачки товаров; возвращает счётчики inserted / updated / unchanged / skipped"""
+        with self.resources.connection() as conn:
+            with conn.cursor() as cursor:
+                stats = upsert_divans(cursor, products, self.columns)
+        self.written += stats['inserted'] + stats['updated']
+        logger.info("Сохранено в базу данных: %s диванов (новых: %s, обновлено: %s, "
+                    "без изменений: %s, без url: %s)",
+                    stats['inserted'] + stats['updated'] + stats['unchanged'],
+                    stats['inserted'], stats['updated'], stats['unchanged'], stats['skipped'])
+        return stats
+
+    def close(self):
+        """Уведомление о завершённом запуске, если он что-то изменил в divans"""
+        if not self.written:
+            return
+        with self.resources.connection() as conn:
+            with conn.cursor() as cursor:
+                notify_scrape_finished(cursor, self.written)
+        logger.info("📣 Запуск завершён, изменено диванов: %s", self.written)
+        self.written = 0
+
+class CsvSink:
+    """Потоковая запись товаров в CSV (utf-8-sig, чтобы файл открывался в Excel)"""
+
+    name = 'csv'
+
+    def __init__(self, path, columns=DIVAN_COLUMNS):
+        self.path = path
+        self.columns = tuple(columns)
+        self._file = None
+        self._writer = None
+        self.rows = 0
+
+    def write(self, products):
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8-sig')
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerows(products)
+        self._file.flush()
+        self.rows += len(products)
+        return {'written': len(products)}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+            logger.info("Экспортировано в %s: %s записей", self.path, self.rows)
+
+class ParquetSink:
+    """
+    Запись товаров в Parquet группами строк (нужен pyarrow).
+    Строки копятся до row_group_size и пишутся одной группой, так что
+    память ограничена размером группы, а не числом товаров.
+    """
+
+    name = 'parquet'
+
+    def __init__(self, path, columns=DIVAN_COLUMNS, row_group_size=10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Для записи в Parquet установите pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.path = path
+        self.columns = tuple(columns)
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([(col, self._arrow_type(col)) for col in self.columns])
+        self._buffer = []
+        self._writer = None
+        self.rows = 0
+
+    def _arrow_type(self, column):
+        if column in ('price', 'old_price'):
+            return self.pa.float64()
+        if column in ('discount_percent', 'page_number') or column in DIMENSION_COLUMNS:
+            return self.pa.int32()
+        return self.pa.string()
+
+    def write(self, products):
+        self._buffer.extend(products)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+        return {'written': len(products)}
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        table = self.pa.Table.from_pylist(
+            [{col: product.get(col) for col in self.columns} for product in self._buffer],
+            schema=self.schema
+        )
+        if self._writer is None:
+            self._writer = self.pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        self._writer.write_table(table)
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            logger.info("Экспортировано в %s: %s записей", self.path, self.rows)
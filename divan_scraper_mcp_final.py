@@ -1,21 +1,26 @@
 import os
-import psycopg2
-import pandas as pd
+import asyncio
 import re
+import math
+import argparse
 import logging
+import queue
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from mcp_parser import looks_like_catalog
+from divan_engine import McpFetcher, McpMarkdownParser, PostgresSink, SharedResources
+from divans_db import fetch_price_statistics, fetch_top_expensive, get_db_config
+from rate_limiter import get_limiter
+from crawl_checkpoints import CrawlCheckpointStore
+from divans_export import IncrementalCsvExport, ParquetDatasetExport
+from log_setup import setup_logging
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('divan_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
+# Настройка логирования: запись в файл (с ротацией) и stderr в фоновом потоке
+setup_logging('divan_scraper.log')
 logger = logging.getLogger(__name__)
 
 # Загружаем переменные окружения
@@ -24,18 +29,33 @@ load_dotenv()
 class DivanScraperMCPFinal:
     """Улучшенный парсер диванов через MCP webscraping"""
     
-    def __init__(self):
+    def __init__(self, max_pages=None, max_workers=8, async_mode=False, use_cache=True,
+                 queue_size=16, batch_size=200):
         """Инициализация парсера"""
         self.base_url = "https://www.divan.ru/blagoveshchensk/category/divany"
-        self.max_pages = 3  # Для тестирования используем только 3 страницы
-        self.delay_between_requests = 1.0  # Задержка между запросами
-        self.db_config = {
-            'host': os.getenv('DB_HOST'),
-            'port': int(os.getenv('DB_PORT', 5432)),
-            'database': os.getenv('DB_NAME'),
-            'user': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD')
-        }
+        # Число страниц определяется по заголовку "Найдено N" на первой странице;
+        # max_pages только ограничивает его сверху (None - без ограничения)
+        self.max_pages = max_pages
+        # Одновременных загрузок страниц (потоков или задач asyncio);
+        # реальный темп задаёт лимитер
+        self.max_workers = max_workers
+        # asyncio вместо пула потоков: загрузки идут задачами в цикле сессии MCP
+        self.async_mode = async_mode
+        # Конвейер загрузка -> разбор -> запись: размер очереди сырых страниц
+        # и размер пакета записи в базу ограничивают память обхода
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        # Общий адаптивный лимитер хоста вместо фиксированной задержки
+        self.limiter = get_limiter(self.base_url)
+        self.db_config = get_db_config()
+        # Общие ресурсы движка: постоянная сессия MCP (команда сервера -
+        # MCP_SERVER_COMMAND, без неё клиент не запускается)
+        # и постоянный кеш ответов MCP: повторный разбор или выгрузка не делает
+        # удалённых вызовов, пока запись не устарела (MCP_CACHE_TTL)
+        self.resources = SharedResources(self.db_config, use_mcp_cache=use_cache)
+        self.fetcher = McpFetcher(self.resources)
+        self.parser = McpMarkdownParser()
+        self.sink = PostgresSink(self.resources)
         
         # Проверяем конфигурацию
         self.validate_config()
@@ -46,7 +66,7 @@ class DivanScraperMCPFinal:
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         
         if missing_vars:
-            logger.error(f"Отсутствуют переменные окружения: {missing_vars}")
+            logger.error("Отсутствуют переменные окружения: %s", missing_vars)
             raise ValueError(f"Необходимо настроить: {missing_vars}")
         
         logger.info("Конфигурация проверена")
@@ -54,361 +74,523 @@ class DivanScraperMCPFinal:
     def create_table(self):
         """Создание таблицы divans если её нет"""
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS divans (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(500),
-                    price DECIMAL(10,2),
-                    old_price DECIMAL(10,2),
-                    discount_percent INTEGER,
-                    dimensions VARCHAR(100),
-                    sleeping_dimensions VARCHAR(100),
-                    url VARCHAR(500),
-                    image_url VARCHAR(500),
-                    page_number INTEGER,
-                    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            conn.commit()
-            logger.info("Таблица divans готова к работе")
-            
+            self.sink.create_table()
         except Exception as e:
-            logger.error(f"Ошибка при создании таблицы: {e}")
+            logger.error("Ошибка при создании таблицы: %s", e)
             raise
-        finally:
-            if conn:
-                conn.close()
     
-    def get_mcp_data(self, url):
-        """
-        Получение данных через MCP webscraping
-        В реальной реализации здесь будет прямой вызов MCP API
-        """
-        try:
-            logger.info(f"Получение данных с: {url}")
-            
-            # Импортируем реальные данные MCP
-            from mcp_real_data import get_mcp_data_by_page
-            
-            # Определяем номер страницы из URL
-            if "page-" in url:
-                page_number = int(url.split("page-")[-1])
-            else:
-                page_number = 1
-                
-            # Получаем данные для страницы
-            return get_mcp_data_by_page(page_number)
-                
-        except Exception as e:
-            logger.error(f"Ошибка при получении данных MCP: {e}")
-            return None
+    def get_mcp_client(self):
+        """Постоянная сессия MCP, общая для всех потоков загрузки"""
+        return self.resources.mcp_client
     
-
+    def close_mcp_client(self):
+        """Закрытие сессии MCP"""
+        self.resources.close_mcp_client()
     
     def validate_mcp_response(self, response):
         """Проверка корректности ответа MCP"""
-        if not response:
-            return False
-        
-        # Проверяем наличие ключевых элементов
-        required_elements = ['диван', 'руб.']
-        response_lower = response.lower()
-        
-        has_required = all(element in response_lower for element in required_elements)
+        has_required = looks_like_catalog(response)
         
-        if not has_required:
+        if response and not has_required:
             logger.warning("Ответ MCP не содержит ожидаемые элементы")
             
         return has_required
     
-    def parse_mcp_text_data(self, text_content, page_number=1):
-        """Улучшенный парсинг данных о продуктах из текста MCP webscraping"""
-        products = []
-        
+    def iter_page_products(self, text_content, page_number=1):
+        """Потоковый разбор текста MCP webscraping: товары отдаются по одному"""
         if not self.validate_mcp_response(text_content):
-            logger.error(f"Неверный ответ MCP для страницы {page_number}")
-            return products
-        
-        # Разбиваем текст на строки для анализа
-        lines = text_content.split('\n')
-        
-        # Улучшенные паттерны для поиска диванов
-        product_patterns = [
-            # Паттерн: [Название] (/product/...) цена руб. старая_цена руб. скидка
-            r'\[([^\]]+)\]\s*\(/product/[^)]+\)\s*([\d\s]+)руб\.\s*([\d\s]+)руб\.\s*(\d+)',
-            # Паттерн: Название цена руб. старая_цена руб. скидка
-            r'([^[]+)\s*([\d\s]+)руб\.\s*([\d\s]+)руб\.\s*(\d+)',
-            # Паттерн: Название цена руб. скидка (без старой цены)
-            r'([^[]+)\s*([\d\s]+)руб\.\s*(\d+)'
-        ]
+            logger.error("Неверный ответ MCP для страницы %s", page_number)
+            return
         
-        # Улучшенные паттерны для размеров
-        dimensions_patterns = [
-            r'Размеры \(ДхШхВ\)\s*:\s*([\d\sx]+)см',
-            r'Размеры \(ДхШхВ\)\s*([\d\sx]+)см',
-            r'Размеры:\s*([\d\sx]+)см'
-        ]
-        
-        sleeping_patterns = [
-            r'Спальное место \(ДхШхВ\)\s*:\s*([\d\sx]+)см',
-            r'Спальное место \(ДхШхВ\)\s*([\d\sx]+)см',
-            r'Спальное место:\s*([\d\sx]+)см'
-        ]
+        # Товары логируются на DEBUG, на INFO - одна сводка по странице
+        debug = logger.isEnabledFor(logging.DEBUG)
+        count = 0
+        min_price = max_price = None
+        for product in self.parser.parse(text_content, page_number):
+            count += 1
+            price = product['price']
+            if min_price is None or price < min_price:
+                min_price = price
+            if max_price is None or price > max_price:
+                max_price = price
+            if debug:
+                logger.debug("Найден диван: %s - %.0f₽ (стр. %s)", product['name'][:50], price, page_number)
+            yield product
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Ищем диваны по паттернам
-            for pattern in product_patterns:
-                matches = re.findall(pattern, line)
-                if matches:
-                    for match in matches:
-                        try:
-                            if len(match) == 4:  # Название, цена, старая цена, скидка
-                                name, price, old_price, discount = match
-                            elif len(match) == 3:  # Название, цена, скидка
-                                name, price, discount = match
-                                old_price = None
-                            else:
-                                continue
-                            
-                            # Очищаем данные
-                            name = name.strip()
-                            price = re.sub(r'[^\d]', '', price.strip())
-                            if old_price:
-                                old_price = re.sub(r'[^\d]', '', old_price.strip())
-                            discount = re.sub(r'[^\d]', '', discount.strip())
-                            
-                            # Проверяем, что это действительно диван
-                            if 'диван' in name.lower() or 'кушетка' in name.lower():
-                                # Ищем размеры в ближайших строках
-                                dimensions = self.find_dimensions(lines, i, dimensions_patterns)
-                                sleeping_dimensions = self.find_dimensions(lines, i, sleeping_patterns)
-                                
-                                # Формируем URL продукта
-                                url = f"https://www.divan.ru/product/{name.lower().replace(' ', '-')}"
-                                
-                                product = {
-                                    'name': name,
-                                    'price': float(price) if price else None,
-                                    'old_price': float(old_price) if old_price else None,
-                                    'discount_percent': int(discount) if discount else None,
-                                    'dimensions': dimensions,
-                                    'sleeping_dimensions': sleeping_dimensions,
-                                    'url': url,
-                                    'image_url': None,
-                                    'page_number': page_number
-                                }
-                                
-                                products.append(product)
-                                logger.info(f"✅ Найден диван: {name[:50]}... - {price}₽ (стр. {page_number})")
-                                
-                        except Exception as e:
-                            logger.warning(f"⚠️ Ошибка при парсинге строки: {e}")
-                            continue
-        
-        return products
+        if count:
+            logger.info("📄 Страница %s: разобрано %s диванов, цены %.0f-%.0f₽",
+                        page_number, count, min_price, max_price)
     
-    def find_dimensions(self, lines, current_index, patterns):
-        """Поиск размеров в ближайших строках"""
-        # Ищем размеры в диапазоне ±5 строк
-        for j in range(max(0, current_index-5), min(len(lines), current_index+5)):
-            for pattern in patterns:
-                match = re.search(pattern, lines[j])
-                if match:
-                    return match.group(1).strip()
-        return None
+    def parse_mcp_text_data(self, text_content, page_number=1):
+        """Однопроходный разбор данных о продуктах из текста MCP webscraping"""
+        return list(self.iter_page_products(text_content, page_number))
     
-    def save_to_database(self, products):
+    def save_to_database(self, products, raise_on_error=False):
         """Сохранение продуктов в базу данных"""
         if not products:
             logger.warning("Нет данных для сохранения")
             return 0
         
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            saved_count = 0
-            for product in products:
-                try:
-                    cursor.execute("""
-                        INSERT INTO divans (name, price, old_price, discount_percent, 
-                                         dimensions, sleeping_dimensions, url, image_url, page_number)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (name) DO UPDATE SET
-                            price = EXCLUDED.price,
-                            old_price = EXCLUDED.old_price,
-                            discount_percent = EXCLUDED.discount_percent,
-                            dimensions = EXCLUDED.dimensions,
-                            sleeping_dimensions = EXCLUDED.sleeping_dimensions,
-                            page_number = EXCLUDED.page_number,
-                            scraped_at = CURRENT_TIMESTAMP
-                    """, (
-                        product['name'],
-                        product['price'],
-                        product['old_price'],
-                        product['discount_percent'],
-                        product['dimensions'],
-                        product['sleeping_dimensions'],
-                        product['url'],
-                        product['image_url'],
-                        product['page_number']
-                    ))
-                    saved_count += 1
-                    
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка при сохранении {product['name']}: {e}")
-                    continue
-            
-            conn.commit()
-            logger.info(f"✅ Сохранено в базу данных: {saved_count} диванов")
-            return saved_count
+            # Пакетный upsert по url: неизменённые товары не переписываются,
+            # но тоже считаются сохранёнными - они уже актуальны в базе
+            stats = self.sink.write(products)
+            return stats['inserted'] + stats['updated'] + stats['unchanged']
             
         except Exception as e:
-            logger.error(f"❌ Ошибка при сохранении в базу: {e}")
+            logger.error("❌ Ошибка при сохранении в базу: %s", e)
+            if raise_on_error:
+                raise
             return 0
-        finally:
-            if conn:
-                conn.close()
     
-    def scrape_all_pages(self):
-        """Парсинг всех страниц каталога"""
-        all_products = []
+    def page_url(self, page):
+        """URL страницы каталога"""
+        if page == 1:
+            return self.base_url
+        return f"{self.base_url}/page-{page}"
+    
+    def parse_total_count(self, text_content):
+        """Общее число товаров из заголовка "Найдено N" на первой странице"""
+        match = re.search(r'Найдено\s+(\d[\d\s]*)', text_content or '')
+        if match:
+            return int(re.sub(r'\D', '', match.group(1)))
+        return None
+    
+    def fetch_page(self, page):
+        """Получение данных страницы: из кеша или через MCP (темп задаёт лимитер)"""
+        fetched = self.fetcher.fetch(self.page_url(page), page)
+        return fetched.text if fetched is not None else None
+    
+    async def fetch_page_async(self, page):
+        """Асинхронное получение данных страницы: из кеша или через MCP"""
+        fetched = await self.fetcher.fetch_async(self.page_url(page), page)
+        return fetched.text if fetched is not None else None
+    
+    def process_page(self, page, page_data=None, save=True):
+        """
+        Загрузка (если данные не переданы), разбор и сохранение одной страницы.
+        Возвращает словарь с данными для контрольной точки и списком url товаров.
+        """
+        if page_data is None:
+            page_data = self.fetch_page(page)
+        if not page_data:
+            return {'page_number': page, 'ok': False, 'error': "данные не получены"}
+        
+        products = self.parse_mcp_text_data(page_data, page)
+        saved_count = 0
+        if save and products:
+            saved_count = self.save_to_database(products, raise_on_error=True)
         
-        logger.info(f"🚀 Начинаем парсинг {self.max_pages} страниц...")
+        return {
+            'page_number': page,
+            'ok': True,
+            'content_hash': CrawlCheckpointStore.content_hash(page_data),
+            'found': len(products),
+            'saved': saved_count,
+            'urls': [product['url'] for product in products if product.get('url')]
+        }
+    
+    def iter_pipeline_pages(self, pages, stop):
+        """
+        Конвейер загрузка -> разбор -> запись для списка страниц.
+        
+        Загрузчики (пул потоков или, при async_mode, задачи asyncio) кладут
+        сырые страницы в ограниченную очередь; поток разбора превращает их в
+        поток записей товаров во второй ограниченной очереди; вызывающий поток
+        пишет записи в базу пакетами по batch_size. Страница отдаётся (в формате
+        process_page, с ключом 'page_number') после коммита всех её товаров,
+        в порядке завершения. Страницы после stop['after'] не загружаются.
+        """
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        record_queue = queue.Queue(maxsize=self.batch_size * 2)
+        closing = threading.Event()
         
-        for page in range(1, self.max_pages + 1):
+        def stopped(page):
+            return closing.is_set() or (stop['after'] is not None and page > stop['after'])
+        
+        def fetch_one(page):
+            if stopped(page):
+                return
             try:
-                # Формируем URL страницы
-                if page == 1:
-                    url = self.base_url
+                page_data = self.fetch_page(page)
+            except Exception as e:
+                logger.error("❌ Ошибка при загрузке страницы %s: %s", page, e)
+                page_data = None
+            # Очередь ограничена: загрузчик ждёт, пока разбор не освободит место
+            raw_queue.put((page, page_data))
+        
+        async def fetch_all_async():
+            semaphore = asyncio.Semaphore(self.max_workers)
+            
+            async def fetch_one_async(page):
+                async with semaphore:
+                    if stopped(page):
+                        return
+                    try:
+                        page_data = await self.fetch_page_async(page)
+                    except Exception as e:
+                        logger.error("❌ Ошибка при загрузке страницы %s: %s", page, e)
+                        page_data = None
+                    # Семафор держится до постановки в очередь, чтобы загруженные
+                    # страницы не копились в памяти, пока очередь заполнена
+                    await asyncio.to_thread(raw_queue.put, (page, page_data))
+            
+            await asyncio.gather(*(fetch_one_async(page) for page in pages))
+        
+        def fetch_stage():
+            try:
+                if self.async_mode:
+                    self.get_mcp_client().run(fetch_all_async())
                 else:
-                    url = f"{self.base_url}/page-{page}"
-                
-                logger.info(f"📄 Обработка страницы {page}/{self.max_pages}: {url}")
-                
-                # Получаем данные через MCP
-                page_data = self.get_mcp_data(url)
-                
-                if page_data:
-                    # Парсим данные страницы
-                    products = self.parse_mcp_text_data(page_data, page)
-                    all_products.extend(products)
-                    
-                    logger.info(f"✅ Страница {page}: найдено {len(products)} диванов")
+                    with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                        for page in pages:
+                            executor.submit(fetch_one, page)
+            finally:
+                raw_queue.put(None)
+        
+        def parse_stage():
+            while True:
+                item = raw_queue.get()
+                if item is None:
+                    record_queue.put(None)
+                    return
+                page, page_data = item
+                if closing.is_set():
+                    continue
+                if not page_data:
+                    record_queue.put(('failed', page, "данные не получены"))
+                    continue
+                try:
+                    found = 0
+                    for product in self.iter_page_products(page_data, page):
+                        record_queue.put(('row', page, product))
+                        found += 1
+                    record_queue.put(('page', page, CrawlCheckpointStore.content_hash(page_data), found))
+                except Exception as e:
+                    record_queue.put(('failed', page, str(e)))
+        
+        batch = []
+        pages_state = {}
+        # Страницы с ошибкой записи или разбора: их оставшиеся строки и отметка
+        # конца отбрасываются, чтобы страница не вернулась позже как ok
+        failed_pages = set()
+        
+        def page_state(page):
+            return pages_state.setdefault(page, {
+                'pending': 0, 'saved': 0, 'urls': [], 'ended': False,
+                'content_hash': None, 'found': 0
+            })
+        
+        def flush():
+            """Коммит пакета; возвращает страницы, все товары которых уже в базе"""
+            completed = []
+            if batch:
+                batch_pages = Counter(product['page_number'] for product in batch)
+                try:
+                    self.save_to_database(batch, raise_on_error=True)
+                except Exception as e:
+                    for page in batch_pages:
+                        failed_pages.add(page)
+                        pages_state.pop(page, None)
+                        completed.append({'page_number': page, 'ok': False, 'error': str(e)})
+                    return completed
+                finally:
+                    batch.clear()
+                for page, count in batch_pages.items():
+                    if page in pages_state:
+                        pages_state[page]['pending'] -= count
+                        pages_state[page]['saved'] += count
+            
+            for page, state in list(pages_state.items()):
+                if state['ended'] and state['pending'] == 0:
+                    del pages_state[page]
+                    completed.append({
+                        'page_number': page,
+                        'ok': True,
+                        'content_hash': state['content_hash'],
+                        'found': state['found'],
+                        'saved': state['saved'],
+                        'urls': state['urls']
+                    })
+            return completed
+        
+        threads = [
+            threading.Thread(target=fetch_stage, name='pipeline-fetch', daemon=True),
+            threading.Thread(target=parse_stage, name='pipeline-parse', daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        try:
+            while True:
+                item = record_queue.get()
+                if item is None:
+                    break
+                kind, page = item[0], item[1]
+                if page in failed_pages:
+                    continue
+                if kind == 'row':
+                    product = item[2]
+                    state = page_state(page)
+                    state['pending'] += 1
+                    state['urls'].append(product['url'])
+                    batch.append(product)
+                    if len(batch) >= self.batch_size:
+                        yield from flush()
+                elif kind == 'page':
+                    state = page_state(page)
+                    state['ended'] = True
+                    state['content_hash'], state['found'] = item[2], item[3]
+                    # Пакет дописывается, пока записи поступают; простаивающий
+                    # конвейер коммитит сразу, чтобы строки появлялись в базе без задержки
+                    if not batch or record_queue.empty():
+                        yield from flush()
                 else:
-                    logger.warning(f"⚠️ Страница {page}: данные не получены")
-                
-                # Задержка между запросами
-                if page < self.max_pages:
-                    time.sleep(self.delay_between_requests)
-                    
-            except Exception as e:
-                logger.error(f"❌ Ошибка при обработке страницы {page}: {e}")
-                continue
+                    failed_pages.add(page)
+                    pages_state.pop(page, None)
+                    batch[:] = [product for product in batch if product['page_number'] != page]
+                    yield {'page_number': page, 'ok': False, 'error': item[2]}
+            yield from flush()
+        finally:
+            # Досрочный выход: останавливаем загрузку и освобождаем очереди,
+            # чтобы потоки конвейера не остались висеть на put()
+            closing.set()
+            for thread in threads:
+                while thread.is_alive():
+                    for pending_queue in (raw_queue, record_queue):
+                        try:
+                            while True:
+                                pending_queue.get_nowait()
+                        except queue.Empty:
+                            pass
+                    thread.join(0.05)
+    
+    def scrape_all_pages(self, resume=False):
+        """
+        Парсинг всех страниц каталога.
+        Первая страница загружается отдельно: по "Найдено N" и размеру страницы
+        определяется число страниц, остальные проходят через конвейер
+        iter_pipeline_pages (загрузка, разбор и пакетная запись идут одновременно).
+        Обход останавливается, когда страница не приносит новых товаров.
+        Страница отмечается в контрольных точках после коммита всех её товаров;
+        с resume=True уже завершённые страницы пропускаются. Возвращает
+        (найдено, сохранено) за все завершённые страницы.
+        """
+        checkpoints = CrawlCheckpointStore()
+        checkpoints.start_run(self.base_url, resume=resume)
+        completed = checkpoints.completed_pages(self.base_url)
+        
+        found_count = 0
+        seen_urls = set()
+        # Первая страница без новых товаров: следующие за ней не загружаются
+        stop = {'after': None}
+        
+        def record(result):
+            """Отметка страницы в контрольных точках (из одного потока)"""
+            page = result['page_number']
+            if not result['ok']:
+                checkpoints.mark_page_failed(self.base_url, page, self.page_url(page), result['error'])
+                logger.warning("⚠️ Страница %s: %s", page, result['error'])
+                return 0
+            if page not in completed:
+                checkpoints.mark_page_done(
+                    self.base_url, page, self.page_url(page),
+                    result['content_hash'], result['found'], result['saved']
+                )
+            new_urls = set(result['urls']) - seen_urls
+            seen_urls.update(new_urls)
+            logger.info("✅ Страница %s: найдено %s диванов, "
+                        "новых %s, сохранено %s",
+                        page, result['found'], len(new_urls), result['saved'])
+            return len(new_urls)
+        
+        # Первая страница: определяем число товаров и размер страницы.
+        # При resume она разбирается заново, но повторно не сохраняется
+        try:
+            first_data = self.fetch_page(1)
+            first_result = self.process_page(1, first_data or '', save=1 not in completed)
+        except Exception as e:
+            first_data = None
+            first_result = {'page_number': 1, 'ok': False, 'error': str(e)}
+        record(first_result)
+        if not first_result['ok']:
+            checkpoints.close()
+            logger.error("❌ Первая страница не получена, обход остановлен")
+            return 0, 0
+        found_count += first_result['found'] if 1 not in completed else 0
+        
+        total_count = self.parse_total_count(first_data)
+        page_size = first_result['found']
+        if total_count and page_size:
+            total_pages = math.ceil(total_count / page_size)
+        else:
+            total_pages = 1
+        if self.max_pages:
+            total_pages = min(total_pages, self.max_pages)
+        logger.info("🔢 Найдено товаров: %s, на странице: %s, "
+                    "страниц: %s", total_count, page_size, total_pages)
+        
+        pending_pages = [page for page in range(2, total_pages + 1) if page not in completed]
+        if resume and completed:
+            logger.info("⏩ Продолжаем обход, завершено ранее: %s страниц, "
+                        "осталось: %s", len(completed), len(pending_pages))
+        
+        def handle(result):
+            """Учёт результата страницы; True, если на ней обход нужно остановить"""
+            nonlocal found_count
+            new_count = record(result)
+            if not result['ok']:
+                return False
+            found_count += result['found']
+            page = result['page_number']
+            # Страница без новых товаров - каталог закончился
+            if new_count == 0 and (stop['after'] is None or page < stop['after']):
+                stop['after'] = page
+                return True
+            return False
+        
+        logger.info("🚀 Конвейерная загрузка %s страниц "
+                    "(%s, одновременно до %s, "
+                    "пакет записи %s)...",
+                    len(pending_pages), 'asyncio' if self.async_mode else 'пул потоков', self.max_workers, self.batch_size)
+        
+        for result in self.iter_pipeline_pages(pending_pages, stop):
+            if handle(result):
+                logger.info("⏹️ Страница %s без новых товаров, "
+                            "следующие страницы не загружаются", result['page_number'])
         
-        logger.info(f"🎯 Всего найдено диванов: {len(all_products)}")
-        return all_products
+        done_pages, saved_total = checkpoints.summary(self.base_url)
+        checkpoints.close()
+        
+        logger.info(self.limiter.format_stats())
+        logger.info("🎯 Всего найдено диванов: %s; "
+                    "завершено страниц: %s, сохранено: %s", found_count, done_pages, saved_total)
+        return found_count, saved_total
     
-    def export_to_csv(self, filename="divans_mcp_final.csv"):
-        """Экспорт данных в CSV файл"""
+    def export_to_csv(self, filename="divans_mcp_final.csv", incremental=True):
+        """
+        Экспорт данных в CSV файл. По умолчанию дописываются только строки,
+        новые или изменённые после прошлой выгрузки; incremental=False
+        перечитывает всю таблицу и переписывает файл.
+        """
         try:
-            conn = psycopg2.connect(**self.db_config)
-            
-            # Читаем данные из базы
-            df = pd.read_sql_query("""
-                SELECT name, price, old_price, discount_percent, 
-                       dimensions, sleeping_dimensions, url, page_number, scraped_at
-                FROM divans 
-                ORDER BY scraped_at DESC
-            """, conn)
-            
-            # Сохраняем в CSV
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            logger.info(f"✅ Данные экспортированы в {filename}")
-            logger.info(f"📊 Всего записей: {len(df)}")
+            exporter = IncrementalCsvExport(filename)
+            if not incremental:
+                # Без отметки выгрузка перечитывает таблицу и пишет файл заново
+                for path in (filename, exporter.watermark_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+            with self.resources.connection() as conn:
+                written, total = exporter.export(conn)
+            logger.info("✅ В %s дописано новых записей: %s", filename, written)
+            logger.info("📊 Всего записей в файле: %s", total)
             
             # Показываем статистику
-            if not df.empty:
-                self.show_statistics(df)
+            if total:
+                self.show_statistics()
             
         except Exception as e:
-            logger.error(f"❌ Ошибка при экспорте: {e}")
-        finally:
-            if conn:
-                conn.close()
+            logger.error("❌ Ошибка при экспорте: %s", e)
     
-    def show_statistics(self, df):
-        """Показ статистики по данным"""
+    def export_to_parquet(self, root="divans_parquet"):
+        """Дописывание новых строк в набор Parquet, разбитый по дате парсинга"""
+        try:
+            with self.resources.connection() as conn:
+                written, files = ParquetDatasetExport(root).export(conn)
+            logger.info("✅ В %s выгружено новых записей: %s (файлов: %s)", root, written, files)
+        except Exception as e:
+            logger.error("❌ Ошибка при выгрузке в Parquet: %s", e)
+    
+    def show_statistics(self):
+        """Показ статистики по данным (агрегаты считаются в базе)"""
+        with self.resources.connection() as conn:
+            with conn.cursor() as cursor:
+                stats = fetch_price_statistics(cursor)
+                top_expensive = fetch_top_expensive(cursor, 5)
+        if not stats['total'] or stats['avg_price'] is None:
+            return
+        
         print("\n📈 СТАТИСТИКА:")
-        print(f"💰 Средняя цена: {df['price'].mean():,.0f}₽")
-        print(f"💰 Минимальная цена: {df['price'].min():,.0f}₽")
-        print(f"💰 Максимальная цена: {df['price'].max():,.0f}₽")
+        print(f"💰 Средняя цена: {stats['avg_price']:,.0f}₽")
+        print(f"💰 Минимальная цена: {stats['min_price']:,.0f}₽")
+        print(f"💰 Максимальная цена: {stats['max_price']:,.0f}₽")
         
-        # Фильтруем скидки (убираем NaN)
-        valid_discounts = df['discount_percent'].dropna()
-        if len(valid_discounts) > 0:
-            print(f"🎯 Средняя скидка: {valid_discounts.mean():.1f}%")
+        # AVG не учитывает NULL
+        if stats['avg_discount'] is not None:
+            print(f"🎯 Средняя скидка: {stats['avg_discount']:.1f}%")
         
         # Статистика по страницам
-        print(f"📄 Обработано страниц: {df['page_number'].nunique()}")
+        print(f"📄 Обработано страниц: {stats['pages']}")
         
         # Топ-5 самых дорогих диванов
         print("\n🏆 ТОП-5 самых дорогих диванов:")
-        top_expensive = df.nlargest(5, 'price')[['name', 'price', 'discount_percent', 'page_number']]
-        for _, row in top_expensive.iterrows():
-            discount_str = f"{row['discount_percent']}%" if pd.notna(row['discount_percent']) else "N/A"
-            print(f"   • {row['name'][:40]}... - {row['price']:,.0f}₽ (скидка: {discount_str}, стр. {row['page_number']})")
+        for name, price, discount_percent, page_number in top_expensive:
+            discount_str = f"{discount_percent}%" if discount_percent is not None else "N/A"
+            print(f"   • {name[:40]}... - {price:,.0f}₽ (скидка: {discount_str}, стр. {page_number})")
     
-    def run_scraping(self):
+    def run_scraping(self, resume=False, full_export=False, parquet_dir=None):
         """Основной метод запуска парсинга"""
         logger.info("🚀 Запуск улучшенного парсера диванов через MCP webscraping...")
-        logger.info(f"🌐 Базовый URL: {self.base_url}")
-        logger.info(f"📄 Максимум страниц: {self.max_pages}")
+        logger.info("🌐 Базовый URL: %s", self.base_url)
+        logger.info("📄 Максимум страниц: %s", self.max_pages or 'по заголовку Найдено N')
         
         try:
             # Создаем таблицу
             self.create_table()
             
-            # Парсим все страницы
-            all_products = self.scrape_all_pages()
+            # Парсим все страницы (товары сохраняются постранично)
+            found_count, saved_count = self.scrape_all_pages(resume=resume)
             
-            if all_products:
-                logger.info(f"📦 Всего найдено диванов: {len(all_products)}")
-                
-                # Сохраняем в базу
-                saved_count = self.save_to_database(all_products)
+            if found_count or saved_count:
+                logger.info("📦 Всего найдено диванов: %s", found_count)
                 
                 if saved_count > 0:
                     # Экспортируем в CSV
-                    self.export_to_csv()
+                    self.export_to_csv(incremental=not full_export)
+                    if parquet_dir:
+                        self.export_to_parquet(parquet_dir)
                     
-                    logger.info(f"🎉 Парсинг завершен успешно! Сохранено {saved_count} диванов")
+                    logger.info("🎉 Парсинг завершен успешно! Сохранено %s диванов", saved_count)
                 else:
                     logger.error("❌ Не удалось сохранить данные в базу")
             else:
                 logger.warning("⚠️ Диваны не найдены на всех страницах")
                 
         except Exception as e:
-            logger.error(f"❌ Критическая ошибка при парсинге: {e}")
+            logger.error("❌ Критическая ошибка при парсинге: %s", e)
             raise
+        finally:
+            self.close_mcp_client()
+            self.sink.close()
+            logger.info(self.fetcher.format_stats())
         
         logger.info("✅ Парсинг завершен!")
 
 def main():
     """Главная функция"""
+    parser = argparse.ArgumentParser(description="Парсер диванов через MCP webscraping")
+    parser.add_argument('--resume', action='store_true',
+                        help="продолжить прерванный обход с первой незавершённой страницы")
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help="ограничить число страниц (по умолчанию - все по заголовку Найдено N)")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="загружать страницы задачами asyncio вместо пула потоков")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="не использовать кеш ответов MCP (mcp_cache.sqlite3)")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="одновременных загрузок страниц (по умолчанию 8)")
+    parser.add_argument('--full-export', action='store_true',
+                        help="переписать CSV целиком вместо дописывания новых строк")
+    parser.add_argument('--parquet', metavar='DIR', default=None,
+                        help="дописать новые строки в набор Parquet по датам (нужен pyarrow)")
+    args = parser.parse_args()
+    
     try:
-        scraper = DivanScraperMCPFinal()
-        scraper.run_scraping()
+        scraper = DivanScraperMCPFinal(max_pages=args.max_pages, max_workers=args.concurrency,
+                                       async_mode=args.async_mode, use_cache=not args.no_cache)
+        scraper.run_scraping(resume=args.resume, full_export=args.full_export, parquet_dir=args.parquet)
     except Exception as e:
-        logger.error(f"❌ Ошибка в главной функции: {e}")
+        logger.error("❌ Ошибка в главной функции: %s", e)
         print(f"\n❌ Критическая ошибка: {e}")
         print("📋 Проверьте логи в файле divan_scraper.log")
 
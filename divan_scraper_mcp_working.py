@@ -1,9 +1,10 @@
 import os
-import psycopg2
-import pandas as pd
-import re
 from datetime import datetime
 from dotenv import load_dotenv
+from divan_engine import PostgresSink, SharedResources
+from divans_db import DIVAN_COLUMNS, fetch_price_statistics, fetch_top_expensive, get_db_config
+from divans_export import EXPORT_COLUMNS, IncrementalCsvExport
+from mcp_parser import iter_mcp_products
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -14,125 +15,29 @@ class DivanScraperMCPWorking:
     def __init__(self):
         """Инициализация парсера"""
         self.url = "https://www.divan.ru/blagoveshchensk/category/divany"
-        self.db_config = {
-            'host': os.getenv('DB_HOST'),
-            'port': int(os.getenv('DB_PORT', 5432)),
-            'database': os.getenv('DB_NAME'),
-            'user': os.getenv('DB_USER'),
-            'password': os.getenv('DB_PASSWORD')
-        }
+        self.db_config = get_db_config()
+        self.resources = SharedResources(self.db_config)
+        # В этой схеме таблицы нет page_number
+        self.sink = PostgresSink(self.resources, [col for col in DIVAN_COLUMNS if col != 'page_number'])
         
     def create_table(self):
         """Создание таблицы divans если её нет"""
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS divans (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(500),
-                    price DECIMAL(10,2),
-                    old_price DECIMAL(10,2),
-                    discount_percent INTEGER,
-                    dimensions VARCHAR(100),
-                    sleeping_dimensions VARCHAR(100),
-                    url VARCHAR(500),
-                    image_url VARCHAR(500),
-                    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            
-            conn.commit()
+            self.sink.create_table()
             print("✅ Таблица divans готова к работе")
-            
         except Exception as e:
             print(f"❌ Ошибка при создании таблицы: {e}")
-        finally:
-            if conn:
-                conn.close()
     
     def parse_product_data(self, text_content):
-        """Парсинг данных о продуктах из текста страницы"""
+        """Парсинг данных о продуктах из текста страницы (линейный по длине текста)"""
         products = []
         
-        # Паттерны для поиска данных
-        # Ищем блоки с диванами (между названиями и ценами)
-        product_patterns = [
-            r'\[([^\]]+)\]\s*\(/product/[^)]+\)\s*([\d\s]+)руб\.\s*([\d\s]+)руб\.\s*(\d+)',
-            r'([^[]+)\s*([\d\s]+)руб\.\s*([\d\s]+)руб\.\s*(\d+)',
-            r'([^[]+)\s*([\d\s]+)руб\.\s*(\d+)'
-        ]
-        
-        # Ищем размеры
-        dimensions_pattern = r'Размеры \(ДхШхВ\)\s*([\d\sx]+)см'
-        sleeping_pattern = r'Спальное место \(ДхШхВ\)\s*([\d\sx]+)см'
-        
-        # Разбиваем текст на строки для анализа
-        lines = text_content.split('\n')
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Ищем диваны
-            for pattern in product_patterns:
-                matches = re.findall(pattern, line)
-                if matches:
-                    for match in matches:
-                        try:
-                            if len(match) == 4:  # Название, цена, старая цена, скидка
-                                name, price, old_price, discount = match
-                            elif len(match) == 3:  # Название, цена, скидка
-                                name, price, discount = match
-                                old_price = None
-                            else:
-                                continue
-                            
-                            # Очищаем данные
-                            name = name.strip()
-                            price = re.sub(r'[^\d]', '', price.strip())
-                            if old_price:
-                                old_price = re.sub(r'[^\d]', '', old_price.strip())
-                            discount = re.sub(r'[^\d]', '', discount.strip())
-                            
-                            # Проверяем, что это действительно диван
-                            if 'диван' in name.lower() or 'кушетка' in name.lower():
-                                # Ищем размеры в следующих строках
-                                dimensions = None
-                                sleeping_dimensions = None
-                                
-                                # Ищем размеры в ближайших строках
-                                for j in range(max(0, i-5), min(len(lines), i+5)):
-                                    dim_match = re.search(dimensions_pattern, lines[j])
-                                    if dim_match:
-                                        dimensions = dim_match.group(1).strip()
-                                    
-                                    sleep_match = re.search(sleeping_pattern, lines[j])
-                                    if sleep_match:
-                                        sleeping_dimensions = sleep_match.group(1).strip()
-                                
-                                # Формируем URL продукта
-                                url = f"https://www.divan.ru/product/{name.lower().replace(' ', '-')}"
-                                
-                                product = {
-                                    'name': name,
-                                    'price': float(price) if price else None,
-                                    'old_price': float(old_price) if old_price else None,
-                                    'discount_percent': int(discount) if discount else None,
-                                    'dimensions': dimensions,
-                                    'sleeping_dimensions': sleeping_dimensions,
-                                    'url': url,
-                                    'image_url': None  # Пока не извлекаем изображения
-                                }
-                                
-                                products.append(product)
-                                print(f"✅ Найден диван: {name[:50]}... - {price}₽")
-                                
-                        except Exception as e:
-                            print(f"⚠️ Ошибка при парсинге строки: {e}")
-                            continue
+        # Однопроходный разбор без паттернов с катастрофическим бэктрекингом
+        for product in iter_mcp_products(text_content):
+            # В этой схеме таблицы нет page_number
+            product.pop('page_number', None)
+            products.append(product)
+            print(f"✅ Найден диван: {product['name'][:50]}... - {product['price']:.0f}₽")
         
         return products
     
@@ -143,80 +48,51 @@ class DivanScraperMCPWorking:
             return 0
         
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cursor = conn.cursor()
-            
-            saved_count = 0
-            for product in products:
-                try:
-                    cursor.execute("""
-                        INSERT INTO divans (name, price, old_price, discount_percent, 
-                                         dimensions, sleeping_dimensions, url, image_url)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        product['name'],
-                        product['price'],
-                        product['old_price'],
-                        product['discount_percent'],
-                        product['dimensions'],
-                        product['sleeping_dimensions'],
-                        product['url'],
-                        product['image_url']
-                    ))
-                    saved_count += 1
-                    
-                except Exception as e:
-                    print(f"⚠️ Ошибка при сохранении {product['name']}: {e}")
-                    continue
-            
-            conn.commit()
-            print(f"✅ Сохранено в базу данных: {saved_count} диванов")
+            # Пакетный upsert по url
+            stats = self.sink.write(products)
+            saved_count = stats['inserted'] + stats['updated'] + stats['unchanged']
+            print(f"✅ Сохранено в базу данных: {saved_count} диванов "
+                  f"(новых: {stats['inserted']}, обновлено: {stats['updated']}, "
+                  f"без изменений: {stats['unchanged']})")
             return saved_count
             
         except Exception as e:
             print(f"❌ Ошибка при сохранении в базу: {e}")
             return 0
-        finally:
-            if conn:
-                conn.close()
     
     def export_to_csv(self, filename="divans_mcp.csv"):
         """Экспорт данных в CSV файл"""
         try:
-            conn = psycopg2.connect(**self.db_config)
-            
-            # Читаем данные из базы
-            df = pd.read_sql_query("""
-                SELECT name, price, old_price, discount_percent, 
-                       dimensions, sleeping_dimensions, url, scraped_at
-                FROM divans 
-                ORDER BY scraped_at DESC
-            """, conn)
-            
-            # Сохраняем в CSV
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
+            # Файл пишется заново: строки читаются серверным курсором без DataFrame
+            # (в этой схеме таблицы нет page_number)
+            exporter = IncrementalCsvExport(filename, [col for col in EXPORT_COLUMNS if col != 'page_number'])
+            for path in (filename, exporter.watermark_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            with self.resources.connection() as conn:
+                _, total = exporter.export(conn)
             print(f"✅ Данные экспортированы в {filename}")
-            print(f"📊 Всего записей: {len(df)}")
+            print(f"📊 Всего записей: {total}")
             
-            # Показываем статистику
-            if not df.empty:
+            # Показываем статистику (агрегаты считаются в базе)
+            if total:
+                with self.resources.connection() as conn:
+                    with conn.cursor() as cursor:
+                        stats = fetch_price_statistics(cursor)
+                        top_expensive = fetch_top_expensive(cursor, 5)
                 print("\n📈 СТАТИСТИКА:")
-                print(f"💰 Средняя цена: {df['price'].mean():,.0f}₽")
-                print(f"💰 Минимальная цена: {df['price'].min():,.0f}₽")
-                print(f"💰 Максимальная цена: {df['price'].max():,.0f}₽")
-                print(f"🎯 Средняя скидка: {df['discount_percent'].mean():.1f}%")
+                print(f"💰 Средняя цена: {stats['avg_price']:,.0f}₽")
+                print(f"💰 Минимальная цена: {stats['min_price']:,.0f}₽")
+                print(f"💰 Максимальная цена: {stats['max_price']:,.0f}₽")
+                print(f"🎯 Средняя скидка: {stats['avg_discount'] or 0:.1f}%")
                 
                 # Топ-5 самых дорогих диванов
                 print("\n🏆 ТОП-5 самых дорогих диванов:")
-                top_expensive = df.nlargest(5, 'price')[['name', 'price', 'discount_percent']]
-                for _, row in top_expensive.iterrows():
-                    print(f"   • {row['name'][:40]}... - {row['price']:,.0f}₽ (скидка: {row['discount_percent']}%)")
+                for name, price, discount_percent, _ in top_expensive:
+                    print(f"   • {name[:40]}... - {price:,.0f}₽ (скидка: {discount_percent}%)")
             
         except Exception as e:
             print(f"❌ Ошибка при экспорте: {e}")
-        finally:
-            if conn:
-                conn.close()
     
     def run_scraping(self):
         """Основной метод запуска парсинга"""
@@ -260,6 +136,7 @@ class DivanScraperMCPWorking:
         
         # Сохраняем в базу
         saved_count = self.save_to_database(test_products)
+        self.sink.close()
         
         if saved_count > 0:
             # Экспортируем в CSV
@@ -0,0 +1,425 @@
+import os
+from contextlib import contextmanager
+from datetime import date
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Уникальный индекс, по которому работает upsert
+URL_INDEX_NAME = 'divans_url_key'
+
+# Индекс для инкрементального экспорта по отметке (scraped_at, id)
+SCRAPED_AT_INDEX_NAME = 'divans_scraped_at_id_idx'
+
+# Индекс для топа самых дорогих диванов (ORDER BY price DESC LIMIT N)
+PRICE_INDEX_NAME = 'divans_price_idx'
+
+# BRIN-индекс для агрегатов по диапазону дат scraped_at
+SCRAPED_AT_BRIN_INDEX_NAME = 'divans_scraped_at_brin'
+
+# Индексы для фильтров по размерам (диапазон по первой колонке, вторая - в индексе)
+SLEEPING_SIZE_INDEX_NAME = 'divans_sleeping_size_idx'
+SIZE_INDEX_NAME = 'divans_size_idx'
+
+# Индекс для постраничной выдачи по цене (keyset по (price, id))
+PRICE_ID_INDEX_NAME = 'divans_price_id_idx'
+
+# Индексы текущего состояния после миграции 12 (divans - представление):
+# прежние индексы divans остаются на таблице divans_legacy
+PRICES_SCRAPED_AT_INDEX_NAME = 'product_prices_scraped_at_idx'
+PRICES_PRICE_INDEX_NAME = 'product_prices_price_idx'
+PRICES_PRICE_ID_INDEX_NAME = 'product_prices_price_id_idx'
+PRODUCTS_URL_INDEX_NAME = 'products_url_key'
+PRODUCTS_SLEEPING_SIZE_INDEX_NAME = 'products_sleeping_size_idx'
+PRODUCTS_SIZE_INDEX_NAME = 'products_size_idx'
+
+# Канал NOTIFY, в который парсеры сообщают о завершённом запуске
+SCRAPE_FINISHED_CHANNEL = 'divans_scraped'
+
+# Сколько строк серверный курсор передаёт за один запрос к базе
+DEFAULT_ITERSIZE = 2000
+
+# Размеры в см, разобранные парсером из dimensions / sleeping_dimensions
+# (mcp_parser.dimension_fields)
+DIMENSION_COLUMNS = (
+    'length', 'width', 'height', 'sleeping_length', 'sleeping_width', 'sleeping_height'
+)
+
+# Колонки таблицы divans, которые заполняют парсеры
+DIVAN_COLUMNS = (
+    'name', 'price', 'old_price', 'discount_percent',
+    'dimensions', 'sleeping_dimensions', 'url', 'image_url', 'page_number'
+) + DIMENSION_COLUMNS
+
+# Колонки справочника products (кроме url) и текущей цены product_prices
+PRODUCT_COLUMNS = ('name', 'dimensions', 'sleeping_dimensions', 'image_url') + DIMENSION_COLUMNS
+PRICE_COLUMNS = ('price', 'old_price', 'discount_percent', 'page_number')
+
+# Поля товара в ответах API (main.py)
+API_COLUMNS = (
+    'id', 'url', 'name', 'price', 'old_price', 'discount_percent',
+    'dimensions', 'sleeping_dimensions'
+) + DIMENSION_COLUMNS + ('image_url', 'page_number', 'scraped_at')
+
+# Порядки постраничной выдачи: ключ (колонки индекса, id - для уникальности) и направление
+PAGE_ORDERS = {
+    'recent': (('scraped_at', 'id'), 'DESC'),
+    'price': (('price', 'id'), 'ASC'),
+    'price_desc': (('price', 'id'), 'DESC'),
+}
+
+# Фильтры выдачи: параметр запроса -> условие
+DIVAN_FILTERS = {
+    'min_price': "price >= %s",
+    'max_price': "price <= %s",
+    'min_discount': "discount_percent >= %s",
+    'min_sleeping_width': "sleeping_width >= %s",
+    'min_sleeping_length': "sleeping_length >= %s",
+    'max_width': "width <= %s",
+    'max_length': "length <= %s",
+}
+
+def get_db_config():
+    """Параметры подключения к базе данных из переменных окружения"""
+    return {
+        'host': os.getenv('DB_HOST'),
+        'port': int(os.getenv('DB_PORT', 5432)),
+        'database': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD')
+    }
+
+@contextmanager
+def server_cursor(conn, name, itersize=DEFAULT_ITERSIZE):
+    """
+    Именованный (серверный) курсор: результат остаётся на сервере, а при
+    итерации строки приходят пачками по itersize, так что память клиента
+    не зависит от размера выборки. Транзакция чтения закрывается на выходе.
+    """
+    cursor = conn.cursor(name=name)
+    cursor.itersize = itersize
+    try:
+        yield cursor
+        cursor.close()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+# Исходная схема таблицы divans (миграция 1, см. divans_migrations.py)
+DIVANS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS divans (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(500),
+        price DECIMAL(10,2),
+        old_price DECIMAL(10,2),
+        discount_percent INTEGER,
+        dimensions VARCHAR(100),
+        sleeping_dimensions VARCHAR(100),
+        url VARCHAR(500),
+        image_url VARCHAR(500),
+        page_number INTEGER,
+        scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Справочник товаров: одна строка на url, описание без истории
+PRODUCTS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS products (
+        id SERIAL PRIMARY KEY,
+        url VARCHAR(500) NOT NULL UNIQUE,
+        name VARCHAR(500),
+        dimensions VARCHAR(100),
+        sleeping_dimensions VARCHAR(100),
+        image_url VARCHAR(500),
+        first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Текущая цена товара: узкая строка на товар, переписывается только при
+# изменении цены (миграция 12). Поэтому scraped_at и page_number здесь - время
+# и страница последнего изменения цены, а не последнего обхода, где товар видели.
+# Строки обновляются на месте и физический порядок не следует scraped_at, так
+# что диапазоны по нему обслуживает btree (scraped_at, product_id), не BRIN
+PRODUCT_PRICES_DDL = """
+    CREATE TABLE IF NOT EXISTS product_prices (
+        product_id INTEGER PRIMARY KEY REFERENCES products (id),
+        price DECIMAL(10,2),
+        old_price DECIMAL(10,2),
+        discount_percent INTEGER,
+        page_number INTEGER,
+        scraped_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Текущее состояние для читателей (API, выгрузки, статистика): колонки
+# прежней таблицы divans поверх products и product_prices, id - id товара.
+# scraped_at / page_number - последнего изменения цены (см. product_prices)
+DIVANS_VIEW_DDL = f"""
+    CREATE OR REPLACE VIEW divans AS
+    SELECT c.product_id AS id, p.name, c.price, c.old_price, c.discount_percent,
+           p.dimensions, p.sleeping_dimensions, p.url, p.image_url, c.page_number, c.scraped_at,
+           {', '.join(f'p.{column}' for column in DIMENSION_COLUMNS)}
+    FROM product_prices c
+    JOIN products p ON p.id = c.product_id
+"""
+
+# Наблюдения цен: узкие строки, секции по месяцам observed_at
+PRICE_OBSERVATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS price_observations (
+        product_id INTEGER NOT NULL REFERENCES products (id),
+        observed_at TIMESTAMP NOT NULL,
+        price DECIMAL(10,2),
+        old_price DECIMAL(10,2),
+        discount_percent SMALLINT,
+        PRIMARY KEY (product_id, observed_at)
+    ) PARTITION BY RANGE (observed_at)
+"""
+
+def dedupe_by_url(products):
+    """
+    Товары по url (повтор url внутри пачки - побеждает последний) и число
+    товаров без url: без него товар нельзя идентифицировать между запусками.
+    """
+    by_url = {}
+    skipped = 0
+    for product in products:
+        url = product.get('url')
+        if not url:
+            skipped += 1
+            continue
+        by_url[url] = product
+    return by_url, skipped
+
+def build_products_query(columns=DIVAN_COLUMNS):
+    """
+    INSERT ... ON CONFLICT (url) в справочник products. Описание переписывается
+    только при изменении, незаполненные парсером поля не затирают известные.
+    """
+    fields = [col for col in PRODUCT_COLUMNS if col in columns]
+    merged = [f"COALESCE(EXCLUDED.{col}, products.{col})" for col in fields]
+    set_clause = ",\n            ".join(f"{col} = {value}" for col, value in zip(fields, merged))
+    return f"""
+        INSERT INTO products (url, {', '.join(fields)})
+        VALUES %s
+        ON CONFLICT (url) DO UPDATE SET
+            {set_clause}
+        WHERE ({', '.join(f'products.{col}' for col in fields)})
+            IS DISTINCT FROM ({', '.join(merged)})
+    """
+
+def build_upsert_query(columns=DIVAN_COLUMNS):
+    """
+    INSERT ... ON CONFLICT (product_id) DO UPDATE текущих цен пачки товаров.
+    Строка переписывается только если изменились цена, старая цена или скидка:
+    UPDATE неизменённой строки всё равно создаёт мёртвый кортеж. Вставленные и
+    изменённые строки тем же оператором пишутся наблюдением в price_observations
+    со временем scraped_at (CURRENT_TIMESTAMP сервера).
+    RETURNING отдаёт строки только для вставленных и реально обновлённых товаров.
+    """
+    fields = [col for col in PRICE_COLUMNS if col in columns]
+    set_clause = ",\n                ".join(f"{col} = EXCLUDED.{col}" for col in fields)
+    return f"""
+        WITH changed AS (
+            INSERT INTO product_prices (product_id, {', '.join(fields)})
+            VALUES %s
+            ON CONFLICT (product_id) DO UPDATE SET
+                {set_clause},
+                scraped_at = CURRENT_TIMESTAMP
+            WHERE (product_prices.price, product_prices.old_price, product_prices.discount_percent)
+                IS DISTINCT FROM (EXCLUDED.price, EXCLUDED.old_price, EXCLUDED.discount_percent)
+            RETURNING product_id, scraped_at, price, old_price, discount_percent, (xmax = 0) AS inserted
+        ), observed AS (
+            INSERT INTO price_observations (product_id, observed_at, price, old_price, discount_percent)
+            SELECT product_id, scraped_at, price, old_price, discount_percent FROM changed
+            ON CONFLICT DO NOTHING
+        )
+        SELECT inserted FROM changed
+    """
+
+def upsert_divans(cursor, products, columns=DIVAN_COLUMNS):
+    """
+    Идемпотентная запись товаров по url: описание - в справочник products,
+    цена - в узкую product_prices, её изменение - наблюдением в price_observations.
+    Неизменившийся товар не пишет ни одной строки.
+    Возвращает словарь со счётчиками inserted / updated / unchanged / skipped.
+    """
+    # В одной команде ON CONFLICT нельзя дважды затронуть одну строку,
+    # поэтому повторы url внутри пачки схлопываются
+    by_url, skipped = dedupe_by_url(products)
+
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': skipped}
+    if not by_url:
+        return stats
+
+    fields = [col for col in PRODUCT_COLUMNS if col in columns]
+    execute_values(cursor, build_products_query(columns), [
+        (url,) + tuple(product.get(col) for col in fields) for url, product in by_url.items()
+    ])
+    cursor.execute("SELECT url, id FROM products WHERE url = ANY(%s)", (list(by_url),))
+    product_ids = dict(cursor.fetchall())
+
+    # Секция наблюдений - на месяц по часам сервера, как и observed_at
+    cursor.execute("SELECT LOCALTIMESTAMP")
+    ensure_observation_partition(cursor, cursor.fetchone()[0])
+
+    fields = [col for col in PRICE_COLUMNS if col in columns]
+    rows = [(product_ids[url],) + tuple(product.get(col) for col in fields) for url, product in by_url.items()]
+    returned = execute_values(cursor, build_upsert_query(columns), rows, fetch=True)
+
+    stats['inserted'] = sum(1 for (inserted,) in returned if inserted)
+    stats['updated'] = len(returned) - stats['inserted']
+    stats['unchanged'] = len(rows) - len(returned)
+    return stats
+
+def observation_partition(moment):
+    """Имя и границы [начало, конец) месячной секции price_observations"""
+    start = date(moment.year, moment.month, 1)
+    end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return f"price_observations_{start:%Y_%m}", start, end
+
+def ensure_observation_partition(cursor, moment):
+    """Создание месячной секции price_observations, в которую попадает moment"""
+    name, start, end = observation_partition(moment)
+    cursor.execute("SELECT to_regclass(%s)", (name,))
+    if cursor.fetchone()[0] is None:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF price_observations "
+            f"FOR VALUES FROM (%s) TO (%s)", (start, end)
+        )
+    return name
+
+def fetch_price_history(cursor, url, since, until):
+    """
+    Наблюдения цены товара за [since, until): (observed_at, price, old_price,
+    discount_percent). Наблюдение пишется при появлении товара и при изменении
+    цены, до следующего цена не менялась. Условие по observed_at отсекает лишние
+    месячные секции.
+    """
+    cursor.execute("""
+        SELECT o.observed_at, o.price, o.old_price, o.discount_percent
+        FROM price_observations o
+        JOIN products p ON p.id = o.product_id
+        WHERE p.url = %s AND o.observed_at >= %s AND o.observed_at < %s
+        ORDER BY o.observed_at
+    """, (url, since, until))
+    return cursor.fetchall()
+
+# Корзины скидок сводки divans_summary (номер из divans_discount_bucket)
+DISCOUNT_BUCKETS = {
+    1: '50%+',
+    2: '30-49%',
+    3: '20-29%',
+    4: '10-19%',
+    5: '1-9%',
+    6: 'Без скидки',
+}
+
+def fetch_price_statistics(cursor):
+    """
+    Сводка по таблице из divans_summary (её ведут триггеры, миграция 9):
+    суммы по нескольким десяткам строк, MIN/MAX - по индексу цены.
+    Словарь с ключами total / avg_price / min_price / max_price / avg_discount / pages.
+    """
+    cursor.execute("""
+        SELECT COALESCE(SUM(rows), 0)::BIGINT,
+               SUM(price_sum) / NULLIF(SUM(priced), 0),
+               (SELECT MIN(price) FROM product_prices),
+               (SELECT MAX(price) FROM product_prices),
+               SUM(discount_sum) / NULLIF(SUM(discounted), 0)::NUMERIC,
+               COUNT(DISTINCT page_number) FILTER (WHERE page_number <> -1 AND rows > 0)
+        FROM divans_summary
+    """)
+    total, avg_price, min_price, max_price, avg_discount, pages = cursor.fetchone()
+    return {
+        'total': total,
+        'avg_price': avg_price,
+        'min_price': min_price,
+        'max_price': max_price,
+        'avg_discount': avg_discount,
+        'pages': pages
+    }
+
+def fetch_discount_histogram(cursor):
+    """Число диванов по корзинам скидок из divans_summary: [(корзина, число)]"""
+    cursor.execute("""
+        SELECT discount_bucket, SUM(rows)::BIGINT
+        FROM divans_summary
+        GROUP BY discount_bucket
+        HAVING SUM(rows) > 0
+        ORDER BY discount_bucket
+    """)
+    return [(DISCOUNT_BUCKETS[bucket], count) for bucket, count in cursor.fetchall()]
+
+def fetch_by_sleeping_size(cursor, min_width, min_length=None, limit=50):
+    """
+    Диваны со спальным местом не уже min_width (и не короче min_length) см:
+    (name, price, sleeping_width, sleeping_length, url), диапазоном по индексу
+    (sleeping_width, sleeping_length), самые узкие подходящие - первыми.
+    """
+    cursor.execute("""
+        SELECT name, price, sleeping_width, sleeping_length, url
+        FROM divans
+        WHERE sleeping_width >= %s AND sleeping_length >= COALESCE(%s, 0)
+        ORDER BY sleeping_width, sleeping_length
+        LIMIT %s
+    """, (min_width, min_length, limit))
+    return cursor.fetchall()
+
+def fetch_divans_page(cursor, order='recent', after=None, filters=None, limit=50, columns=API_COLUMNS):
+    """
+    Страница выдачи с keyset-пагинацией: вместо OFFSET - условие «ключ после
+    ключа последней строки прошлой страницы», так что любая страница читается
+    коротким диапазоном по индексу ключа, а не пропуском всех предыдущих строк.
+    Строки с NULL в первой колонке ключа в выдачу не попадают.
+    Возвращает (строки-словари, ключ для следующей страницы или None).
+    """
+    key, direction = PAGE_ORDERS[order]
+    conditions = [f"{key[0]} IS NOT NULL"]
+    params = []
+    for name, value in (filters or {}).items():
+        conditions.append(DIVAN_FILTERS[name])
+        params.append(value)
+    if after is not None:
+        comparison = '<' if direction == 'DESC' else '>'
+        conditions.append(f"({', '.join(key)}) {comparison} ({', '.join(['%s'] * len(key))})")
+        params.extend(after)
+    order_by = ', '.join(f"{col} {direction}" for col in key)
+    # Лишняя строка показывает, есть ли следующая страница
+    cursor.execute(f"""
+        SELECT {', '.join(columns)} FROM divans
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {order_by}
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(rows[-1][col] for col in key)
+
+def fetch_divan_by_url(cursor, url, columns=API_COLUMNS):
+    """Товар по ссылке (словарь или None), по уникальному индексу url"""
+    cursor.execute(f"SELECT {', '.join(columns)} FROM divans WHERE url = %s", (url,))
+    row = cursor.fetchone()
+    return dict(zip(columns, row)) if row else None
+
+def notify_scrape_finished(cursor, written=0):
+    """
+    NOTIFY о завершённом запуске парсера: читатели (кеш API) сбрасывают
+    посчитанные ответы. Уведомление уходит при коммите транзакции cursor.
+    """
+    cursor.execute("SELECT pg_notify(%s, %s)", (SCRAPE_FINISHED_CHANNEL, str(written)))
+
+def fetch_top_expensive(cursor, limit=5):
+    """Самые дорогие диваны: (name, price, discount_percent, page_number), по индексу цены"""
+    cursor.execute("""
+        SELECT name, price, discount_percent, page_number
+        FROM divans
+        WHERE price IS NOT NULL
+        ORDER BY price DESC NULLS LAST
+        LIMIT %s
+    """, (limit,))
+    return cursor.fetchall()
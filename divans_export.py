@@ -0,0 +1,348 @@
+import argparse
+import csv
+import glob
+import json
+import os
+from datetime import datetime
+
+from db_pool import get_pool
+from divans_db import DEFAULT_ITERSIZE, get_db_config, server_cursor
+from divans_migrations import SchemaOutdatedError, require_schema
+
+# Колонки выгрузки (как в прежнем export_to_csv парсера MCP)
+EXPORT_COLUMNS = (
+    'name', 'price', 'old_price', 'discount_percent',
+    'dimensions', 'sleeping_dimensions', 'url', 'page_number', 'scraped_at'
+)
+
+# Все колонки таблицы divans (как SELECT * в полной выгрузке view_divans)
+EXPORT_ALL_COLUMNS = (
+    'id', 'name', 'price', 'old_price', 'discount_percent', 'dimensions',
+    'sleeping_dimensions', 'url', 'image_url', 'page_number', 'scraped_at'
+)
+
+# Колонки колоночной выгрузки и их типы Arrow: цены - float64 вместо текста,
+# повторяющиеся строки (названия, размеры) - словарные
+PARQUET_COLUMNS = (
+    ('id', 'int64'),
+    ('name', 'dictionary'),
+    ('price', 'float64'),
+    ('old_price', 'float64'),
+    ('discount_percent', 'int32'),
+    ('dimensions', 'dictionary'),
+    ('sleeping_dimensions', 'dictionary'),
+    ('url', 'string'),
+    ('image_url', 'string'),
+    ('page_number', 'int32'),
+    ('scraped_at', 'timestamp'),
+)
+
+# Пространство id в отметках: после миграции 12 id в divans - id товара
+WATERMARK_IDS = 'products'
+
+def load_watermark_file(path, columns):
+    """Отметка прошлой выгрузки из JSON (или None, если её нет или колонки другие)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            watermark = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if watermark.get('columns') != list(columns):
+        return None
+    if watermark.get('ids') != WATERMARK_IDS:
+        # id отметки - из прежней таблицы divans: строки с тем же scraped_at
+        # выгружаются повторно (лишняя версия строки безвредна), но не теряются
+        watermark['id'] = 0
+    return watermark
+
+def save_watermark_file(path, watermark):
+    # Запись через временный файл, чтобы прерванный запуск не оставил битую отметку
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(watermark, ids=WATERMARK_IDS), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def committed_bound(conn):
+    """
+    Граница scraped_at, раньше которой новых строк уже не появится.
+
+    scraped_at - CURRENT_TIMESTAMP, то есть время начала транзакции записи, а не
+    её коммита: долгая транзакция парсера может закоммитить строки со временем
+    раньше уже выгруженных, и отметка их перескочит. Поэтому выгрузка берёт
+    только строки раньше начала самой старой из открытых сейчас транзакций базы:
+    все такие строки уже закоммичены, а будущие получат время не раньше границы.
+    Открытые транзакции видны в pg_stat_activity сессиям той же роли (или с
+    pg_read_all_stats), поэтому выгрузка должна работать под ролью парсеров.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT LEAST(statement_timestamp(), MIN(xact_start))
+            FROM pg_stat_activity
+            WHERE datname = current_database()
+              AND pid <> pg_backend_pid()
+              AND backend_type = 'client backend'
+              AND xact_start IS NOT NULL
+        """)
+        return cursor.fetchone()[0]
+
+def watermark_query(select, watermark, bound):
+    """
+    Выборка строк после отметки (scraped_at, id) и раньше границы bound
+    (committed_bound) в порядке появления; строки без scraped_at не выгружаются.
+    """
+    if watermark is None:
+        return f"{select} WHERE scraped_at < %s ORDER BY scraped_at, id", (bound,)
+    return (f"{select} WHERE (scraped_at, id) > (%s, %s) AND scraped_at < %s ORDER BY scraped_at, id",
+            (datetime.fromisoformat(watermark['scraped_at']), watermark['id'], bound))
+
+def export_full_csv(conn, path, columns=EXPORT_ALL_COLUMNS, itersize=DEFAULT_ITERSIZE):
+    """
+    Полная выгрузка таблицы в CSV (недавно изменившие цену первыми) серверным курсором:
+    строки пишутся по мере получения, память не зависит от размера таблицы.
+    Возвращает число выгруженных строк.
+    """
+    # Индекс (scraped_at, id) создаёт миграция
+    require_schema(conn)
+
+    written = 0
+    # Обратный проход по индексу (scraped_at, id) вместо сортировки всей таблицы
+    query = f"SELECT {', '.join(columns)} FROM divans ORDER BY scraped_at DESC, id DESC"
+    with server_cursor(conn, 'divans_full_export', itersize) as cursor:
+        cursor.execute(query)
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in cursor:
+                writer.writerow(row)
+                written += 1
+    return written
+
+class IncrementalCsvExport:
+    """
+    Инкрементальная выгрузка таблицы divans в CSV по отметке (scraped_at, id).
+
+    Каждый запуск дописывает в файл только товары, добавленные или сменившие
+    цену после прошлой выгрузки: scraped_at в divans - время последнего
+    изменения цены (см. product_prices), а не последнего обхода. Товар, у
+    которого поменялось только описание, заново не выгружается. Стоимость
+    выгрузки зависит от объёма новых данных, а не от размера таблицы.
+    Изменённый товар дописывается новой строкой: файл - журнал версий, актуальна
+    последняя строка по url.
+
+    Строки читаются серверным курсором и пишутся модулем csv без DataFrame.
+    Отметка хранится рядом с файлом (<файл>.watermark.json) вместе с размером
+    файла: если прошлый запуск прервался после дозаписи, но до сохранения
+    отметки, недописанный хвост отрезается и строки выгружаются заново.
+    """
+
+    def __init__(self, path, columns=EXPORT_COLUMNS, itersize=DEFAULT_ITERSIZE):
+        self.path = path
+        self.columns = tuple(columns)
+        self.itersize = itersize
+        self.watermark_path = path + '.watermark.json'
+
+    def load_watermark(self):
+        """Отметка прошлой выгрузки (или None, если выгрузки не было или файл пропал)"""
+        if not os.path.exists(self.path):
+            return None
+        return load_watermark_file(self.watermark_path, self.columns)
+
+    def export(self, conn):
+        """
+        Дописывание новых строк; без отметки файл пишется заново.
+        Возвращает (дописано строк, всего строк в файле).
+        """
+        require_schema(conn)
+
+        watermark = self.load_watermark()
+        if watermark is None:
+            mode, encoding = 'w', 'utf-8-sig'
+        else:
+            mode, encoding = 'a', 'utf-8'
+            if os.path.getsize(self.path) > watermark['size']:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(watermark['size'])
+
+        select = f"SELECT {', '.join(self.columns)}, id, scraped_at FROM divans"
+        query, params = watermark_query(select, watermark, committed_bound(conn))
+        written = 0
+        last = None
+        # Серверный (именованный) курсор: строки приходят пачками по itersize
+        with server_cursor(conn, 'divans_csv_export', self.itersize) as cursor:
+            cursor.execute(query, params)
+            with open(self.path, mode, newline='', encoding=encoding) as f:
+                writer = csv.writer(f)
+                if watermark is None:
+                    writer.writerow(self.columns)
+                width = len(self.columns)
+                for row in cursor:
+                    writer.writerow(row[:width])
+                    last = row[width:]
+                    written += 1
+                f.flush()
+                os.fsync(f.fileno())
+
+        total = written + (watermark['rows'] if watermark else 0)
+        if last is not None or watermark is None:
+            last_id, last_scraped_at = last if last is not None else (0, datetime.min)
+            save_watermark_file(self.watermark_path, {
+                'id': last_id,
+                'scraped_at': last_scraped_at.isoformat(),
+                'rows': total,
+                'size': os.path.getsize(self.path),
+                'columns': list(self.columns)
+            })
+        return written, total
+
+class ParquetDatasetExport:
+    """
+    Инкрементальная колоночная выгрузка divans в набор Parquet, разбитый по дате
+    scraped_at: <каталог>/scrape_date=ГГГГ-ММ-ДД/part-<запуск>.parquet (нужен pyarrow).
+    scraped_at - время последнего изменения цены товара, поэтому раздел даты
+    содержит товары, добавленные или сменившие цену в этот день.
+
+    Строки после отметки (scraped_at, id) читаются серверным курсором и пишутся
+    пакетами RecordBatch, без промежуточного DataFrame; каждый запуск добавляет
+    новые файлы в разделы своих дат. Строки без scraped_at не попадают ни в один
+    раздел и не выгружаются (их отсекает граница watermark_query). Чтение берёт
+    только нужные колонки и разделы:
+
+        pq.read_table('divans_parquet', columns=['name', 'price'],
+                      filters=[('scrape_date', '>=', '2026-10-01')])
+
+    Файлы пишутся с суффиксом .tmp и переименовываются перед сохранением
+    отметки; хвосты .tmp прерванного запуска удаляются при следующем.
+    """
+
+    def __init__(self, root='divans_parquet', columns=PARQUET_COLUMNS, batch_size=10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Для выгрузки в Parquet установите pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.pq = pq
+        self.root = root
+        self.columns = tuple(columns)
+        self.batch_size = batch_size
+        self.watermark_path = os.path.join(root, '_watermark.json')
+        self.schema = pa.schema([(name, self.arrow_type(kind)) for name, kind in self.columns])
+
+    def arrow_type(self, kind):
+        pa = self.pa
+        if kind == 'dictionary':
+            return pa.dictionary(pa.int32(), pa.string())
+        if kind == 'timestamp':
+            return pa.timestamp('us')
+        return getattr(pa, kind)()
+
+    def select_expression(self, name, kind):
+        # DECIMAL приводится к float8 на стороне сервера: без Decimal в Python
+        return f"{name}::float8 AS {name}" if kind == 'float64' else name
+
+    def record_batch(self, columns_data):
+        arrays = []
+        for (name, kind), values in zip(self.columns, columns_data):
+            if kind == 'dictionary':
+                arrays.append(self.pa.array(values, self.pa.string()).dictionary_encode())
+            else:
+                arrays.append(self.pa.array(values, self.arrow_type(kind)))
+        return self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def export(self, conn):
+        """Выгрузка строк после отметки; возвращает (выгружено строк, новых файлов)"""
+        require_schema(conn)
+
+        os.makedirs(self.root, exist_ok=True)
+        for stale in glob.glob(os.path.join(self.root, '*', '*.parquet.tmp')):
+            os.remove(stale)
+        names = [name for name, _ in self.columns]
+        watermark = load_watermark_file(self.watermark_path, names)
+
+        select = ("SELECT " + ', '.join(self.select_expression(name, kind) for name, kind in self.columns)
+                  + ", id, scraped_at FROM divans")
+        query, params = watermark_query(select, watermark, committed_bound(conn))
+        run_stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        width = len(self.columns)
+
+        written = 0
+        last = None
+        files = []
+        writer = None
+        writer_date = None
+        batch = [[] for _ in range(width)]
+
+        def flush():
+            if batch[0]:
+                writer.write_batch(self.record_batch(batch))
+                for values in batch:
+                    values.clear()
+
+        try:
+            with server_cursor(conn, 'divans_parquet_export', self.batch_size) as cursor:
+                cursor.execute(query, params)
+                for row in cursor:
+                    # scraped_at не NULL: такие строки отсекает условие scraped_at < границы
+                    row_date = row[-1].date()
+                    if row_date != writer_date:
+                        # Строки идут по scraped_at: раздел даты закрывается, когда дата сменилась
+                        if writer is not None:
+                            flush()
+                            writer.close()
+                        partition = os.path.join(self.root, f"scrape_date={row_date.isoformat()}")
+                        os.makedirs(partition, exist_ok=True)
+                        path = os.path.join(partition, f"part-{run_stamp}.parquet.tmp")
+                        writer = self.pq.ParquetWriter(path, self.schema, compression='zstd')
+                        writer_date = row_date
+                        files.append(path)
+                    for values, value in zip(batch, row):
+                        values.append(value)
+                    if len(batch[0]) >= self.batch_size:
+                        flush()
+                    last = row[width:]
+                    written += 1
+                if writer is not None:
+                    flush()
+        finally:
+            if writer is not None:
+                writer.close()
+
+        for path in files:
+            os.replace(path, path[:-len('.tmp')])
+        if last is not None or watermark is None:
+            last_id, last_scraped_at = last if last is not None else (0, datetime.min)
+            save_watermark_file(self.watermark_path, {
+                'id': last_id,
+                'scraped_at': last_scraped_at.isoformat(),
+                'rows': written + (watermark['rows'] if watermark else 0),
+                'columns': names
+            })
+        return written, len(files)
+
+def main():
+    parser = argparse.ArgumentParser(description="Инкрементальная выгрузка таблицы divans")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--output', default=None,
+                        help="файл CSV (divans_export.csv) или каталог Parquet (divans_parquet)")
+    args = parser.parse_args()
+
+    pool = get_pool(get_db_config())
+    conn = pool.getconn()
+    try:
+        if args.format == 'csv':
+            output = args.output or 'divans_export.csv'
+            written, total = IncrementalCsvExport(output, EXPORT_ALL_COLUMNS).export(conn)
+            print(f"✅ В {output} дописано записей: {written} (всего {total})")
+        else:
+            output = args.output or 'divans_parquet'
+            written, files = ParquetDatasetExport(output).export(conn)
+            print(f"✅ В {output} выгружено записей: {written} (новых файлов: {files})")
+    except SchemaOutdatedError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    finally:
+        pool.putconn(conn)
+        pool.close()
+
+if __name__ == "__main__":
+    main()
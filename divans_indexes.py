@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Индексы под запросы к divans (представлению поверх products и product_prices):
+какие должны быть, есть ли они, валидны ли и используются ли.
+
+    python divans_indexes.py            # состояние индексов
+    python divans_indexes.py --create   # достроить недостающие (CONCURRENTLY)
+
+Индексы создают миграции divans_migrations.py; здесь - проверка того, что
+база соответствует ожидаемому набору. Что их действительно выбирает
+планировщик для горячих запросов, проверяет bench_indexes.py.
+"""
+
+import argparse
+
+from db_pool import get_pool
+from divans_db import (
+    PRICES_PRICE_ID_INDEX_NAME, PRICES_PRICE_INDEX_NAME, PRICES_SCRAPED_AT_INDEX_NAME, PRODUCTS_SIZE_INDEX_NAME, PRODUCTS_SLEEPING_SIZE_INDEX_NAME,
+    PRODUCTS_URL_INDEX_NAME, get_db_config
+)
+from divans_migrations import MigrationRunner
+
+class IndexSpec:
+    """Ожидаемый индекс: CREATE [UNIQUE] INDEX name ON table definition"""
+
+    def __init__(self, name, table, definition, unique=False, purpose=''):
+        self.name = name
+        self.table = table
+        self.definition = definition
+        self.unique = unique
+        self.purpose = purpose
+
+# divans - представление поверх products и product_prices (миграция 12),
+# поэтому индексы его запросов лежат на этих таблицах
+DIVANS_INDEXES = (
+    IndexSpec(PRODUCTS_URL_INDEX_NAME, 'products', "(url)", unique=True,
+              purpose="upsert ON CONFLICT (url), поиск товара по ссылке"),
+    IndexSpec(PRICES_SCRAPED_AT_INDEX_NAME, 'product_prices', "(scraped_at, product_id)",
+              purpose="последние изменения цен (ORDER BY scraped_at DESC), выгрузки по отметке, "
+                      "агрегаты по диапазону дат"),
+    IndexSpec(PRICES_PRICE_INDEX_NAME, 'product_prices', "(price DESC NULLS LAST)",
+              purpose="топ самых дорогих (ORDER BY price DESC LIMIT N)"),
+    IndexSpec(PRODUCTS_SLEEPING_SIZE_INDEX_NAME, 'products', "(sleeping_width, sleeping_length)",
+              purpose="фильтр по спальному месту (WHERE sleeping_width >= ...)"),
+    IndexSpec(PRODUCTS_SIZE_INDEX_NAME, 'products', "(width, length)",
+              purpose="фильтр по габаритам (WHERE width <= ... AND length <= ...)"),
+    IndexSpec(PRICES_PRICE_ID_INDEX_NAME, 'product_prices', "(price, product_id)",
+              purpose="постраничная выдача API по цене (keyset (price, id))"),
+)
+
+def index_status(conn, specs=DIVANS_INDEXES):
+    """
+    Состояние ожидаемых индексов: словари name / state ('ok', 'missing',
+    'invalid') / definition / size (байт) / scans (idx_scan с последнего
+    сброса статистики) / purpose.
+    """
+    status = []
+    with conn.cursor() as cursor:
+        for spec in specs:
+            cursor.execute("""
+                SELECT i.indisvalid, pg_get_indexdef(i.indexrelid),
+                       pg_relation_size(i.indexrelid), COALESCE(s.idx_scan, 0)
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = i.indexrelid
+                WHERE c.relname = %s
+            """, (spec.name,))
+            row = cursor.fetchone()
+            if row is None:
+                status.append({'name': spec.name, 'state': 'missing', 'definition': None,
+                               'size': 0, 'scans': 0, 'purpose': spec.purpose})
+                continue
+            valid, definition, size, scans = row
+            status.append({'name': spec.name, 'state': 'ok' if valid else 'invalid',
+                           'definition': definition, 'size': size, 'scans': scans,
+                           'purpose': spec.purpose})
+    conn.rollback()
+    return status
+
+def ensure_indexes(conn, specs=DIVANS_INDEXES):
+    """Достраивание недостающих и недостроенных индексов; возвращает имена созданных"""
+    runner = MigrationRunner(conn)
+    conn.rollback()
+    autocommit = conn.autocommit
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    conn.autocommit = True
+    try:
+        return [spec.name for spec in specs
+                if runner.create_index(spec.name, spec.table, spec.definition, spec.unique)]
+    finally:
+        conn.autocommit = autocommit
+
+def print_status(status):
+    print(f"{'Индекс':<28} {'Состояние':<10} {'Размер':>10} {'Сканов':>10}  Назначение")
+    print("-" * 100)
+    for index in status:
+        mark = {'ok': "✅", 'missing': "❌", 'invalid': "⚠️"}[index['state']]
+        size = f"{index['size'] / 1024:,.0f} КБ" if index['definition'] else "-"
+        print(f"{index['name']:<28} {mark} {index['state']:<7} {size:>10} {index['scans']:>10}  {index['purpose']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка индексов таблицы divans")
+    parser.add_argument('--create', action='store_true', help="достроить недостающие индексы")
+    args = parser.parse_args()
+
+    pool = get_pool(get_db_config())
+    conn = pool.getconn()
+    try:
+        if args.create:
+            created = ensure_indexes(conn)
+            print(f"📇 Построено индексов: {len(created)}")
+        status = index_status(conn)
+        print_status(status)
+        if any(index['state'] != 'ok' for index in status):
+            print("\n⚠️ Не все индексы на месте: python divans_indexes.py --create")
+    finally:
+        pool.putconn(conn)
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,709 @@
+#!/usr/bin/env python3
+"""
+Версионные миграции схемы divans вместо fix_table.py / fix_table_mcp.py.
+
+Применённые версии записываются в schema_migrations, так что каждая миграция
+выполняется один раз. Изменения только добавляющие и без перезаписи таблицы:
+
+- колонки добавляются без DEFAULT (меняется только каталог), а значения для
+  старых строк проставляются пачками по первичному ключу, каждая пачка - своя
+  короткая транзакция;
+- индексы строятся CREATE INDEX CONCURRENTLY;
+- DDL выполняется с коротким lock_timeout и повторами, чтобы ALTER TABLE не
+  вставал в очередь за долгой транзакцией и не блокировал запись парсеров.
+
+Поэтому миграции можно запускать, пока парсеры пишут в таблицу. Миграция
+обязана быть идемпотентной: прерванная посреди работы запускается заново.
+
+    python divans_migrations.py             # применить недостающие
+    python divans_migrations.py --status    # показать версии
+"""
+
+import argparse
+import logging
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from psycopg2 import errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from db_pool import get_pool
+from divans_db import (
+    DIMENSION_COLUMNS, DIVANS_TABLE_DDL, DIVANS_VIEW_DDL, PRICE_COLUMNS, PRICE_ID_INDEX_NAME, PRICE_INDEX_NAME,
+    PRICE_OBSERVATIONS_DDL, PRICES_PRICE_ID_INDEX_NAME, PRICES_PRICE_INDEX_NAME,
+    PRICES_SCRAPED_AT_INDEX_NAME, PRODUCT_COLUMNS, PRODUCT_PRICES_DDL, PRODUCTS_SIZE_INDEX_NAME,
+    PRODUCTS_SLEEPING_SIZE_INDEX_NAME, PRODUCTS_TABLE_DDL, SCRAPED_AT_BRIN_INDEX_NAME, SCRAPED_AT_INDEX_NAME,
+    SIZE_INDEX_NAME, SLEEPING_SIZE_INDEX_NAME, URL_INDEX_NAME, ensure_observation_partition, get_db_config
+)
+from mcp_parser import DIMENSION_NUMBERS_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock: одновременно миграции применяет только один процесс
+MIGRATION_LOCK_KEY = 0x64697661
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(200) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+class Migration:
+    def __init__(self, version, name, apply):
+        self.version = version
+        self.name = name
+        self.apply = apply
+
+MIGRATIONS = []
+
+def migration(version, name):
+    """Регистрация функции apply(runner) как миграции с номером version"""
+    def register(apply):
+        MIGRATIONS.append(Migration(version, name, apply))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return apply
+    return register
+
+class MigrationRunner:
+    """
+    Применение миграций на подключении psycopg2. На время работы подключение
+    переводится в autocommit: каждый DDL и каждая пачка заполнения фиксируются
+    сразу и не держат блокировки дольше необходимого.
+    """
+
+    def __init__(self, conn, batch_size=1000, pause=0.0, lock_timeout='3s', lock_retries=10):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pause = pause
+        self.lock_timeout = lock_timeout
+        self.lock_retries = lock_retries
+
+    def applied_versions(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('schema_migrations')")
+            if cursor.fetchone()[0] is None:
+                return set()
+            cursor.execute("SELECT version FROM schema_migrations")
+            return {version for (version,) in cursor.fetchall()}
+
+    def pending(self):
+        applied = self.applied_versions()
+        return [m for m in MIGRATIONS if m.version not in applied]
+
+    def ddl(self, statement, params=None):
+        """DDL с коротким lock_timeout; при занятой блокировке - повтор с паузой"""
+        for attempt in range(1, self.lock_retries + 1):
+            try:
+                with self.conn.cursor() as cursor:
+                    cursor.execute(f"SET lock_timeout = '{self.lock_timeout}'")
+                    try:
+                        cursor.execute(statement, params)
+                    finally:
+                        cursor.execute("RESET lock_timeout")
+                return
+            except errors.LockNotAvailable:
+                if attempt == self.lock_retries:
+                    raise
+                logger.warning("⏳ Таблица занята, повтор DDL через %s с (попытка %s/%s)",
+                               attempt, attempt, self.lock_retries)
+                time.sleep(attempt)
+
+    @contextmanager
+    def transaction(self):
+        """Явная транзакция поверх autocommit (BEGIN ... COMMIT) с коротким lock_timeout"""
+        with self.conn.cursor() as cursor:
+            cursor.execute("BEGIN")
+            cursor.execute(f"SET LOCAL lock_timeout = '{self.lock_timeout}'")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def has_column(self, table, column):
+        with self.conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+            """, (table, column))
+            return cursor.fetchone() is not None
+
+    def index_valid(self, name):
+        """True - индекс готов, False - недостроен, None - индекса нет"""
+        with self.conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s
+            """, (name,))
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def create_index(self, name, table, definition, unique=False):
+        """
+        CREATE INDEX CONCURRENTLY: запись в таблицу не блокируется. Невалидный
+        индекс, оставшийся от прерванной сборки, удаляется и строится заново.
+        """
+        valid = self.index_valid(name)
+        if valid:
+            return False
+        if valid is not None:
+            logger.warning("🧹 Индекс %s недостроен прошлым запуском, строим заново", name)
+            self.ddl(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        unique_sql = "UNIQUE " if unique else ""
+        self.ddl(f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+        logger.info("📇 Построен индекс %s", name)
+        return True
+
+    def backfill(self, table, assignments, condition):
+        """
+        UPDATE table SET assignments WHERE condition пачками по batch_size строк
+        в порядке id: каждая пачка блокирует только свои строки и фиксируется
+        отдельно. Возвращает число обновлённых строк.
+        """
+        last_id = 0
+        total = 0
+        query = f"""
+            UPDATE {table} SET {assignments}
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE id > %s AND ({condition})
+                ORDER BY id
+                LIMIT %s
+            )
+            RETURNING id
+        """
+        while True:
+            with self.conn.cursor() as cursor:
+                cursor.execute(query, (last_id, self.batch_size))
+                ids = [row_id for (row_id,) in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+            total += len(ids)
+            logger.debug("🔁 %s: заполнено %s строк (до id %s)", table, total, last_id)
+            if self.pause:
+                time.sleep(self.pause)
+        if total:
+            logger.info("🔁 %s: заполнено %s строк (%s)", table, total, assignments)
+        return total
+
+    def id_range_batches(self, table, statement):
+        """
+        Запрос statement с параметрами (id от, id до] по диапазонам id таблицы
+        размером batch_size; возвращает сумму затронутых строк.
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            max_id = cursor.fetchone()[0]
+        deleted = 0
+        for low in range(0, max_id, self.batch_size):
+            with self.conn.cursor() as cursor:
+                cursor.execute(statement, (low, low + self.batch_size))
+                deleted += cursor.rowcount
+            if self.pause:
+                time.sleep(self.pause)
+        return deleted
+
+    def run(self, target=None):
+        """Применение недостающих миграций (до target включительно); возвращает их список"""
+        if not any(target is None or m.version <= target for m in self.pending()):
+            # Быстрый путь для каждого запуска парсера: схема актуальна
+            self.conn.rollback()
+            return []
+
+        self.conn.rollback()
+        autocommit = self.conn.autocommit
+        self.conn.autocommit = True
+        applied = []
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+            try:
+                self.ddl(SCHEMA_MIGRATIONS_DDL)
+                # Пока ждали блокировку, миграции мог применить другой процесс
+                for m in self.pending():
+                    if target is not None and m.version > target:
+                        break
+                    logger.info("🛠️ Миграция %s: %s", m.version, m.name)
+                    started = time.monotonic()
+                    m.apply(self)
+                    with self.conn.cursor() as cursor:
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (m.version, m.name)
+                        )
+                    logger.info("✅ Миграция %s применена за %.1f с", m.version, time.monotonic() - started)
+                    applied.append(m)
+            finally:
+                with self.conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        finally:
+            self.conn.autocommit = autocommit
+        return applied
+
+def migrate(conn, target=None, **kwargs):
+    """Применение недостающих миграций; см. MigrationRunner"""
+    return MigrationRunner(conn, **kwargs).run(target)
+
+class SchemaOutdatedError(RuntimeError):
+    """В базе применены не все миграции"""
+
+def require_schema(conn):
+    """
+    Проверка версии схемы для читателей (просмотр, выгрузки). Сами они миграции
+    не применяют - это делают только парсер при записи и этот модуль; при
+    отставшей схеме - SchemaOutdatedError с подсказкой запустить миграции.
+    """
+    idle = conn.get_transaction_status() == TRANSACTION_STATUS_IDLE
+    pending = MigrationRunner(conn).pending()
+    if idle and not conn.autocommit:
+        # Проверка не оставляет за собой открытую транзакцию
+        conn.rollback()
+    if pending:
+        versions = ', '.join(str(m.version) for m in pending)
+        raise SchemaOutdatedError(
+            f"Схема базы устарела (не применены миграции: {versions}): "
+            f"запустите python divans_migrations.py"
+        )
+
+@migration(1, "create divans")
+def create_divans(runner):
+    runner.ddl(DIVANS_TABLE_DDL)
+
+@migration(2, "add divans.page_number")
+def add_page_number(runner):
+    # Без DEFAULT: меняется только каталог, строки таблицы не переписываются
+    runner.ddl("ALTER TABLE divans ADD COLUMN IF NOT EXISTS page_number INTEGER")
+    # Строки прежних парсеров - с первой страницы каталога (как в fix_table_mcp.py)
+    runner.backfill('divans', "page_number = 1", "page_number IS NULL")
+
+@migration(3, "unify async scraper columns")
+def unify_async_columns(runner):
+    """
+    Асинхронный парсер создавал таблицу со своими колонками price_original /
+    price_discount / material / color / style / features. Общая схема получает
+    недостающие колонки, цены переносятся пачками; старые колонки остаются.
+    """
+    for column, column_type in (
+        ('price', 'DECIMAL(10,2)'),
+        ('old_price', 'DECIMAL(10,2)'),
+        ('image_url', 'VARCHAR(500)'),
+        ('material', 'VARCHAR(200)'),
+        ('color', 'VARCHAR(100)'),
+        ('style', 'VARCHAR(100)'),
+        ('features', 'TEXT[]'),
+    ):
+        runner.ddl(f"ALTER TABLE divans ADD COLUMN IF NOT EXISTS {column} {column_type}")
+    if runner.has_column('divans', 'price_discount'):
+        runner.backfill('divans', "price = price_discount, old_price = price_original",
+                        "price IS NULL AND (price_discount IS NOT NULL OR price_original IS NOT NULL)")
+
+@migration(4, "unique index on divans.url")
+def url_unique_index(runner):
+    if runner.index_valid(URL_INDEX_NAME):
+        return
+    # Дубликаты прошлых запусков схлопываются до самой свежей записи
+    deleted = runner.id_range_batches('divans', """
+        DELETE FROM divans a USING divans b
+        WHERE a.url = b.url AND a.id < b.id AND a.id > %s AND a.id <= %s
+    """)
+    if deleted:
+        logger.info("🧹 Удалено дубликатов по url: %s", deleted)
+    runner.create_index(URL_INDEX_NAME, 'divans', "(url)", unique=True)
+
+@migration(5, "index on divans (scraped_at, id)")
+def scraped_at_index(runner):
+    runner.create_index(SCRAPED_AT_INDEX_NAME, 'divans', "(scraped_at, id)")
+
+@migration(6, "index on divans.price")
+def price_index(runner):
+    runner.create_index(PRICE_INDEX_NAME, 'divans', "(price DESC NULLS LAST)")
+
+@migration(7, "BRIN index on divans.scraped_at")
+def scraped_at_brin_index(runner):
+    runner.create_index(SCRAPED_AT_BRIN_INDEX_NAME, 'divans', "USING brin (scraped_at)")
+
+@migration(8, "products and monthly price_observations")
+def products_and_observations(runner):
+    """
+    Справочник products (строка на url) и узкая таблица наблюдений цен с
+    секциями по месяцам. Текущие строки divans переносятся пачками: товар
+    в products, его цена - наблюдением на момент scraped_at.
+    """
+    runner.ddl(PRODUCTS_TABLE_DDL)
+    runner.ddl(PRICE_OBSERVATIONS_DDL)
+
+    with runner.conn.cursor() as cursor:
+        cursor.execute("SELECT MIN(scraped_at), MAX(scraped_at) FROM divans")
+        first, last = cursor.fetchone()
+        # Секции на все месяцы, за которые есть данные, и на текущий
+        moments = [datetime.now()]
+        if first is not None:
+            month = date(first.year, first.month, 1)
+            while month <= last.date():
+                moments.append(month)
+                month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        for moment in moments:
+            ensure_observation_partition(cursor, moment)
+
+    copied = runner.id_range_batches('divans', """
+        INSERT INTO products (url, name, dimensions, sleeping_dimensions, image_url)
+        SELECT url, name, dimensions, sleeping_dimensions, image_url
+        FROM divans
+        WHERE url IS NOT NULL AND id > %s AND id <= %s
+        ON CONFLICT (url) DO NOTHING
+    """)
+    logger.info("📦 Перенесено товаров в products: %s", copied)
+    observed = runner.id_range_batches('divans', """
+        INSERT INTO price_observations (product_id, observed_at, price, old_price, discount_percent)
+        SELECT p.id, d.scraped_at, d.price, d.old_price, d.discount_percent
+        FROM divans d
+        JOIN products p ON p.url = d.url
+        WHERE d.scraped_at IS NOT NULL AND d.id > %s AND d.id <= %s
+        ON CONFLICT DO NOTHING
+    """)
+    logger.info("📈 Перенесено наблюдений цен: %s", observed)
+
+# Изменение сводки по строкам переходной таблицы триггера (знак +1 / -1)
+# Строки без номера страницы попадают в сводку под page_number = -1
+SUMMARY_DELTA_SQL = """
+        SELECT divans_discount_bucket(discount_percent), COALESCE(page_number, -1),
+               {sign} * COUNT(*), {sign} * COUNT(price), {sign} * COALESCE(SUM(price), 0),
+               {sign} * COUNT(discount_percent), {sign} * COALESCE(SUM(discount_percent), 0)
+        FROM {source}
+        GROUP BY 1, 2
+"""
+
+SUMMARY_APPLY_SQL = """
+        INSERT INTO divans_summary AS s
+            (discount_bucket, page_number, rows, priced, price_sum, discounted, discount_sum)
+        SELECT discount_bucket, page_number, SUM(rows), SUM(priced), SUM(price_sum),
+               SUM(discounted), SUM(discount_sum)
+        FROM ({delta}) AS delta (discount_bucket, page_number, rows, priced, price_sum,
+                                  discounted, discount_sum)
+        GROUP BY 1, 2
+        HAVING SUM(rows) <> 0 OR SUM(price_sum) <> 0 OR SUM(discount_sum) <> 0
+        -- Один порядок строк сводки у всех писателей: без взаимных блокировок
+        ORDER BY 1, 2
+        ON CONFLICT (discount_bucket, page_number) DO UPDATE SET
+            rows = s.rows + EXCLUDED.rows,
+            priced = s.priced + EXCLUDED.priced,
+            price_sum = s.price_sum + EXCLUDED.price_sum,
+            discounted = s.discounted + EXCLUDED.discounted,
+            discount_sum = s.discount_sum + EXCLUDED.discount_sum;
+"""
+
+def summary_apply(*parts):
+    return SUMMARY_APPLY_SQL.format(delta=" UNION ALL ".join(
+        SUMMARY_DELTA_SQL.format(sign=sign, source=source) for sign, source in parts
+    ))
+
+# Пока сводка заполняется, триггеры учитывают только строки, уже пройденные
+# заполнением (id <= upto), и строки, вставленные после установки триггеров
+SUMMARY_BACKFILL_SOURCE = "{rows} JOIN divans_summary_backfill b ON {rows}.id <= b.upto OR {rows}.id > b.max_id"
+
+def create_summary_function(runner, backfilling):
+    """Функция триггеров сводки (backfilling - с фильтром на время заполнения)"""
+    def source(rows):
+        return SUMMARY_BACKFILL_SOURCE.format(rows=rows) if backfilling else rows
+
+    runner.ddl(f"""
+        CREATE OR REPLACE FUNCTION divans_summary_apply() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {summary_apply((1, source('new_rows')))}
+            ELSIF TG_OP = 'DELETE' THEN
+                {summary_apply((-1, source('old_rows')))}
+            ELSE
+                {summary_apply((1, source('new_rows')), (-1, source('old_rows')))}
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+
+def create_summary_triggers(cursor, table):
+    """Триггеры уровня оператора, которые ведут divans_summary по изменениям table"""
+    for event, transition in (
+        ('INSERT', "NEW TABLE AS new_rows"),
+        ('UPDATE', "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+        ('DELETE', "OLD TABLE AS old_rows"),
+    ):
+        name = f"divans_summary_{event.lower()}"
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        cursor.execute(f"""
+            CREATE TRIGGER {name} AFTER {event} ON {table}
+            REFERENCING {transition}
+            FOR EACH STATEMENT EXECUTE FUNCTION divans_summary_apply()
+        """)
+
+@migration(9, "divans_summary maintained by triggers")
+def divans_summary(runner):
+    """
+    Сводка по корзинам скидок и страницам каталога: число строк, суммы цен
+    и скидок. Триггеры уровня оператора с переходными таблицами применяют
+    к ней изменения divans в той же транзакции, что и запись парсера, так
+    что панели читают несколько десятков строк вместо всей таблицы.
+    """
+    runner.ddl("""
+        CREATE OR REPLACE FUNCTION divans_discount_bucket(discount INTEGER) RETURNS SMALLINT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT (CASE
+                WHEN discount >= 50 THEN 1
+                WHEN discount >= 30 THEN 2
+                WHEN discount >= 20 THEN 3
+                WHEN discount >= 10 THEN 4
+                WHEN discount > 0 THEN 5
+                ELSE 6
+            END)::SMALLINT
+        $$
+    """)
+    runner.ddl("""
+        CREATE TABLE IF NOT EXISTS divans_summary (
+            discount_bucket SMALLINT NOT NULL,
+            page_number INTEGER NOT NULL,
+            rows BIGINT NOT NULL DEFAULT 0,
+            priced BIGINT NOT NULL DEFAULT 0,
+            price_sum NUMERIC NOT NULL DEFAULT 0,
+            discounted BIGINT NOT NULL DEFAULT 0,
+            discount_sum BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (discount_bucket, page_number)
+        )
+    """)
+    runner.ddl("""
+        CREATE TABLE IF NOT EXISTS divans_summary_backfill (
+            upto BIGINT NOT NULL,
+            max_id BIGINT NOT NULL
+        )
+    """)
+    create_summary_function(runner, backfilling=True)
+
+    # Сначала триггеры, потом заполнение: таблица divans блокируется только на
+    # время CREATE TRIGGER и MAX(id). Строки с id не больше max_id в этот момент
+    # триггеры учитывают, только когда заполнение дошло до их id (upto)
+    with runner.transaction() as cursor:
+        cursor.execute("SELECT 1 FROM divans_summary_backfill")
+        if cursor.fetchone() is None:
+            create_summary_triggers(cursor, 'divans')
+            cursor.execute("DELETE FROM divans_summary")
+            cursor.execute("INSERT INTO divans_summary_backfill SELECT 0, COALESCE(MAX(id), 0) FROM divans")
+
+    # Пачка блокирует свои строки FOR SHARE и сдвигает upto в том же операторе:
+    # запись, начатая раньше, успевает закоммититься и попадает в пачку новой
+    # версией строки, а начатая позже ждёт коммита пачки и учитывается триггером.
+    # Повторный запуск продолжает с сохранённого upto
+    runner.id_range_batches('divans', f"""
+        WITH bounds AS (
+            SELECT GREATEST(%s, upto) AS low, LEAST(%s, max_id) AS high
+            FROM divans_summary_backfill
+        ), batch AS (
+            SELECT d.* FROM divans d, bounds
+            WHERE d.id > bounds.low AND d.id <= bounds.high
+            FOR SHARE OF d
+        ), progress AS (
+            UPDATE divans_summary_backfill SET upto = bounds.high
+            FROM bounds WHERE bounds.high > bounds.low
+        )
+        {summary_apply((1, 'batch'))}
+    """)
+    logger.info("📊 Сводка divans_summary заполнена")
+
+    create_summary_function(runner, backfilling=False)
+    runner.ddl("DROP TABLE divans_summary_backfill")
+
+@migration(10, "integer dimension columns with size indexes")
+def dimension_columns(runner):
+    """
+    Длина / ширина / высота (общие и спального места) целыми см. Новые строки
+    приходят с ними от парсеров (mcp_parser.dimension_fields); для старых
+    текст разбирается в SQL тем же паттерном, пачками по id.
+    """
+    runner.ddl("ALTER TABLE divans " + ", ".join(
+        f"ADD COLUMN IF NOT EXISTS {column} SMALLINT" for column in DIMENSION_COLUMNS
+    ))
+    runner.ddl(f"""
+        CREATE OR REPLACE FUNCTION divans_dimension(value TEXT, part INTEGER) RETURNS SMALLINT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT (regexp_match(value, '{DIMENSION_NUMBERS_PATTERN}'))[part]::SMALLINT
+        $$
+    """)
+    runner.backfill(
+        'divans',
+        "length = divans_dimension(dimensions, 1), width = divans_dimension(dimensions, 2), "
+        "height = divans_dimension(dimensions, 3), "
+        "sleeping_length = divans_dimension(sleeping_dimensions, 1), "
+        "sleeping_width = divans_dimension(sleeping_dimensions, 2), "
+        "sleeping_height = divans_dimension(sleeping_dimensions, 3)",
+        "(dimensions IS NOT NULL AND length IS NULL) "
+        "OR (sleeping_dimensions IS NOT NULL AND sleeping_length IS NULL)"
+    )
+    # "Спальное место не уже 160": диапазон по ширине, длина проверяется в индексе
+    runner.create_index(SLEEPING_SIZE_INDEX_NAME, 'divans', "(sleeping_width, sleeping_length)")
+    runner.create_index(SIZE_INDEX_NAME, 'divans', "(width, length)")
+
+@migration(11, "index on divans (price, id)")
+def price_id_index(runner):
+    # Keyset-пагинация API по цене: (price, id) > (...) - диапазон по индексу
+    # в обе стороны; индекс price DESC NULLS LAST остаётся для топа дорогих
+    runner.create_index(PRICE_ID_INDEX_NAME, 'divans', "(price, id)")
+
+# Колонки, которые копируются из строки divans в products и product_prices
+MIRROR_PRODUCT_COLUMNS = ('url',) + PRODUCT_COLUMNS
+MIRROR_PRICE_COLUMNS = PRICE_COLUMNS + ('scraped_at',)
+
+def mirror_set_clause(columns):
+    return ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+
+@migration(12, "current state in products and product_prices, divans as a view")
+def divans_view(runner):
+    """
+    Парсеры пишут описание товара в products, а текущую цену - в узкую таблицу
+    product_prices (и наблюдение - только при изменении цены). divans становится
+    представлением поверх них с прежними колонками; id в нём - id товара.
+
+    Пока миграция идёт, строковый триггер на divans повторяет каждое изменение
+    в products / product_prices, а строки копируются пачками по id под FOR SHARE:
+    запись, начатая раньше пачки, попадает в неё новой версией, начатая позже -
+    через триггер. Затем в одной короткой транзакции таблица переименовывается
+    в divans_legacy (её можно удалить после проверки), на её месте создаётся
+    представление, а триггеры сводки переходят на product_prices. Сводка при
+    этом не пересчитывается: строки product_prices повторяют строки divans,
+    вычитаются только строки без url. Парсеры со старым кодом после миграции
+    писать в divans не смогут - их нужно перезапустить.
+    """
+    runner.ddl("ALTER TABLE products " + ", ".join(
+        f"ADD COLUMN IF NOT EXISTS {column} SMALLINT" for column in DIMENSION_COLUMNS
+    ))
+    runner.ddl(PRODUCT_PRICES_DDL)
+
+    with runner.conn.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('divans')")
+        if cursor.fetchone() == ('v',):
+            # Прошлый запуск прервался после замены таблицы представлением
+            runner.ddl("DROP FUNCTION IF EXISTS divans_mirror()")
+            return
+
+    product_columns = ', '.join(MIRROR_PRODUCT_COLUMNS)
+    price_columns = ', '.join(MIRROR_PRICE_COLUMNS)
+    runner.ddl(f"""
+        CREATE OR REPLACE FUNCTION divans_mirror() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            linked_id INTEGER;
+        BEGIN
+            IF TG_OP <> 'INSERT' AND OLD.url IS NOT NULL
+                    AND (TG_OP = 'DELETE' OR NEW.url IS DISTINCT FROM OLD.url) THEN
+                DELETE FROM product_prices
+                WHERE product_id = (SELECT id FROM products WHERE url = OLD.url);
+            END IF;
+            IF TG_OP = 'DELETE' OR NEW.url IS NULL THEN
+                RETURN NULL;
+            END IF;
+            INSERT INTO products ({product_columns})
+            VALUES ({', '.join(f'NEW.{column}' for column in MIRROR_PRODUCT_COLUMNS)})
+            ON CONFLICT (url) DO UPDATE SET {mirror_set_clause(PRODUCT_COLUMNS)}
+            RETURNING id INTO linked_id;
+            INSERT INTO product_prices (product_id, {price_columns})
+            VALUES (linked_id, {', '.join(f'NEW.{column}' for column in PRICE_COLUMNS)},
+                    COALESCE(NEW.scraped_at, CURRENT_TIMESTAMP))
+            ON CONFLICT (product_id) DO UPDATE SET {mirror_set_clause(MIRROR_PRICE_COLUMNS)};
+            RETURN NULL;
+        END
+        $$
+    """)
+    runner.ddl("DROP TRIGGER IF EXISTS divans_mirror ON divans")
+    runner.ddl("""
+        CREATE TRIGGER divans_mirror AFTER INSERT OR UPDATE OR DELETE ON divans
+        FOR EACH ROW EXECUTE FUNCTION divans_mirror()
+    """)
+
+    copied = runner.id_range_batches('divans', f"""
+        WITH batch AS (
+            SELECT * FROM divans
+            WHERE url IS NOT NULL AND id > %s AND id <= %s
+            FOR SHARE
+        ), linked AS (
+            INSERT INTO products ({product_columns})
+            SELECT {product_columns} FROM batch
+            ON CONFLICT (url) DO UPDATE SET {mirror_set_clause(PRODUCT_COLUMNS)}
+            RETURNING id, url
+        )
+        INSERT INTO product_prices (product_id, {price_columns})
+        SELECT linked.id, {', '.join(f'batch.{column}' for column in PRICE_COLUMNS)},
+               COALESCE(batch.scraped_at, CURRENT_TIMESTAMP)
+        FROM batch
+        JOIN linked ON linked.url = batch.url
+        ON CONFLICT (product_id) DO UPDATE SET {mirror_set_clause(MIRROR_PRICE_COLUMNS)}
+    """)
+    logger.info("📦 Скопировано текущих цен в product_prices: %s", copied)
+
+    # Индексы прежних запросов к divans - на таблицах, где теперь лежат колонки
+    runner.create_index(PRICES_SCRAPED_AT_INDEX_NAME, 'product_prices', "(scraped_at, product_id)")
+    runner.create_index(PRICES_PRICE_INDEX_NAME, 'product_prices', "(price DESC NULLS LAST)")
+    runner.create_index(PRICES_PRICE_ID_INDEX_NAME, 'product_prices', "(price, product_id)")
+    runner.create_index(PRODUCTS_SLEEPING_SIZE_INDEX_NAME, 'products', "(sleeping_width, sleeping_length)")
+    runner.create_index(PRODUCTS_SIZE_INDEX_NAME, 'products', "(width, length)")
+
+    with runner.transaction() as cursor:
+        cursor.execute("LOCK TABLE divans IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("DROP TRIGGER divans_mirror ON divans")
+        for event in ('insert', 'update', 'delete'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS divans_summary_{event} ON divans")
+        # Строки без url в представление не попадают
+        cursor.execute(summary_apply((-1, "(SELECT * FROM divans WHERE url IS NULL) AS unlinked")))
+        cursor.execute("ALTER TABLE divans RENAME TO divans_legacy")
+        cursor.execute(DIVANS_VIEW_DDL)
+        create_summary_triggers(cursor, 'product_prices')
+    runner.ddl("DROP FUNCTION divans_mirror()")
+    logger.info("🔀 divans - представление поверх products и product_prices")
+
+@migration(13, "drop BRIN index on product_prices.scraped_at")
+def drop_prices_scraped_at_brin(runner):
+    """
+    BRIN на product_prices строила прежняя версия миграции 12. Таблица
+    обновляется на месте, новые версии строк ложатся в любые свободные места
+    страниц, и диапазоны min/max scraped_at быстро расползаются на всю таблицу:
+    индекс перестаёт отсекать страницы. Диапазоны по scraped_at обслуживает
+    btree (scraped_at, product_id); у журнала price_observations время
+    отсекают секции по observed_at.
+    """
+    runner.ddl("DROP INDEX CONCURRENTLY IF EXISTS product_prices_scraped_at_brin")
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы таблицы divans")
+    parser.add_argument('--status', action='store_true', help="только показать применённые версии")
+    parser.add_argument('--target', type=int, default=None, help="применить миграции до этой версии")
+    parser.add_argument('--batch-size', type=int, default=1000, help="строк в пачке заполнения")
+    parser.add_argument('--pause', type=float, default=0.0, help="пауза между пачками, с")
+    args = parser.parse_args()
+
+    from log_setup import setup_logging
+    setup_logging('divans_migrations.log')
+
+    pool = get_pool(get_db_config())
+    conn = pool.getconn()
+    try:
+        runner = MigrationRunner(conn, batch_size=args.batch_size, pause=args.pause)
+        if args.status:
+            applied = runner.applied_versions()
+            for m in MIGRATIONS:
+                mark = "✅" if m.version in applied else "⏳"
+                print(f"{mark} {m.version:>3} {m.name}")
+            return
+        applied = runner.run(args.target)
+        if applied:
+            print(f"✅ Применено миграций: {len(applied)}")
+        else:
+            print("✅ Схема актуальна")
+    finally:
+        pool.putconn(conn)
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Фазз-тест и бенчмарк устойчивости парсера MCP к патологическим строкам (ReDoS).
+
+На вход mcp_parser подаются очень длинные строки без совпадения, собранные
+из символов, на которых пересекающиеся квантификаторы прежних паттернов
+уходят в катастрофический бэктрекинг, а также случайные строки из того же
+алфавита. Для каждой строки проверяется граница времени, линейная по длине. Перед
+фаззом проверяется разбор размеров со всеми допустимыми разделителями.
+
+    python fuzz_mcp_parser.py                   # фазз + проверка границ
+    python fuzz_mcp_parser.py --show-legacy     # рост времени прежних паттернов
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+
+from mcp_parser import parse_mcp_text
+
+# Граница времени на строку: постоянная часть + линейная по длине
+BASE_BUDGET = 0.05
+PER_CHAR_BUDGET = 2e-6
+
+# Прежние резервные паттерны divan_scraper_mcp_working.py / divan_scraper_mcp_final.py
+LEGACY_PATTERNS = [
+    r'([^[]+)\s*([\d\s]+)руб\.\s*([\d\s]+)руб\.\s*(\d+)',
+    r'([^[]+)\s*([\d\s]+)руб\.([\d\s]+)руб\.\s*(\d+)',
+    r'([^[]+)\s*([\d\s]+)руб\.\s*(\d+)',
+]
+
+# Префиксы, которые переводят парсер в разные ветки разбора строки
+CONTEXTS = [
+    "",
+    "[Диван прямой A](/product/a)\n",
+    "[Диван прямой A](/product/a)\n41 150руб.58 790руб.\n",
+]
+
+ALPHABET = "[]()/ 0123456789руб.xх×*смРазмеры#%:\t" + "Диван"
+
+# Строки размеров с разными разделителями и ожидаемые целочисленные колонки
+DIMENSION_CASES = [
+    ("Размеры (ДхШхВ): 205 x 112 x 92 см", (205, 112, 92)),
+    ("Размеры (ДхШхВ): 205 х 112 х 92 см", (205, 112, 92)),
+    ("Размеры: 205×112×92 см", (205, 112, 92)),
+    ("Размеры: 205 * 112 * 92 см", (205, 112, 92)),
+    ("Размеры: 205 x 112 см", (205, 112, None)),
+]
+
+def adversarial_lines(length):
+    """Длинные строки без совпадения для известных опасных конструкций"""
+    return {
+        'цифры и пробелы': ("1 " * length)[:length],
+        'цифры и пробелы + "руб"': ("1 " * length)[:length] + "руб",
+        'повтор "руб."': ("руб." * length)[:length],
+        'цены без скидки': ("1 руб." * length)[:length] + " x",
+        'открывающие скобки': "[" * length,
+        'незакрытое название': "[Диван " + "а" * length,
+        'незакрытая ссылка': "[Диван](/product/" + "a" * length,
+        'размеры и пробелы': "Размеры (ДхШхВ): 1" + " " * length,
+        'размеры без "см"': "Размеры: " + ("1 x " * length)[:length],
+        'спальное место': "Спальное место" + ":" * length,
+    }
+
+def random_lines(length, count, rng):
+    """Случайные строки из алфавита значимых для паттернов символов"""
+    for _ in range(count):
+        yield ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+def timed_parse(line):
+    """Худшее время разбора строки во всех контекстах"""
+    worst = 0.0
+    for context in CONTEXTS:
+        started = time.perf_counter()
+        parse_mcp_text(context + line)
+        worst = max(worst, time.perf_counter() - started)
+    return worst
+
+def check_line(label, line):
+    """Проверка границы времени; возвращает True, если граница соблюдена"""
+    elapsed = timed_parse(line)
+    budget = BASE_BUDGET + PER_CHAR_BUDGET * len(line)
+    ok = elapsed <= budget
+    status = "✅" if ok else "❌"
+    print(f"{status} {label:<32} {len(line):>9} симв. {elapsed * 1000:>9.2f} мс (граница {budget * 1000:.0f} мс)")
+    return ok
+
+def check_dimensions():
+    """Разбор размеров товара со всеми разделителями; возвращает число ошибок"""
+    failures = 0
+    print("Размеры с разными разделителями:")
+    for line, expected in DIMENSION_CASES:
+        products = parse_mcp_text(f"[Диван прямой A](/product/a)\n41 150руб.\n{line}\n")
+        product = products[0] if products else {}
+        parsed = (product.get('length'), product.get('width'), product.get('height'))
+        ok = product.get('dimensions') is not None and parsed == expected
+        failures += not ok
+        status = "✅" if ok else "❌"
+        print(f"{status} {line:<40} {parsed}")
+    return failures
+
+def show_legacy(lengths):
+    """Рост времени прежних паттернов на строке из цифр и пробелов"""
+    print("\nПрежние паттерны (re.findall), строка '1 1 1 ...' без 'руб.':")
+    for length in lengths:
+        line = ("1 " * length)[:length]
+        started = time.perf_counter()
+        for pattern in LEGACY_PATTERNS:
+            re.findall(pattern, line)
+        elapsed = time.perf_counter() - started
+        print(f"   {length:>6} симв. {elapsed:>9.3f} с")
+
+def main():
+    parser = argparse.ArgumentParser(description="Фазз-тест парсера MCP на ReDoS")
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--random', type=int, default=20, help="случайных строк на каждую длину")
+    parser.add_argument('--seed', type=int, default=17)
+    parser.add_argument('--show-legacy', action='store_true')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = check_dimensions()
+
+    for length in args.lengths:
+        print(f"\nДлина строки: {length}")
+        for label, line in adversarial_lines(length).items():
+            failures += not check_line(label, line)
+        # Случайные строки длиннее 100k генерируются долго, ограничиваем длину
+        for n, line in enumerate(random_lines(min(length, 100_000), args.random, rng)):
+            failures += not check_line(f"случайная #{n + 1}", line)
+
+    if args.show_legacy:
+        show_legacy([100, 200, 400, 800])
+
+    if failures:
+        print(f"\n❌ Ошибок разбора или превышений границы времени: {failures}")
+        sys.exit(1)
+    print("\n✅ Все строки разобраны в пределах линейной границы времени")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import zlib
+import requests
+from rate_limiter import get_limiter
+
+class CachedPage:
+    """Результат загрузки страницы через кеш"""
+
+    def __init__(self, url, content, encoding, status_code, from_cache, changed):
+        self.url = url
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.status_code = status_code
+        self.from_cache = from_cache  # тело взято из кеша (ответ 304)
+        self.changed = changed  # содержимое отличается от последнего успешного разбора
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+class HttpPageCache:
+    """
+    Постоянный дисковый HTTP-кеш страниц каталога с условными запросами.
+
+    Для каждого URL хранятся ETag/Last-Modified, хеш содержимого и сжатое тело.
+    Повторный запрос отправляет If-None-Match/If-Modified-Since; на 304 тело
+    берётся с диска. Хеш последнего успешно разобранного содержимого позволяет
+    не парсить страницу, которая не изменилась с прошлого запуска.
+    """
+
+    def __init__(self, cache_dir='.http_cache', session=None, timeout=30):
+        self.cache_dir = cache_dir
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Счётчики
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.body.z'
+
+    def _load_meta(self, url):
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path, data):
+        # Запись через временный файл, чтобы прерванный запуск не оставил битый кеш
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _save_meta(self, url, meta):
+        meta_path, _ = self._paths(url)
+        self._write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    def _load_body(self, url):
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def fetch(self, url, headers=None):
+        """Загрузка страницы с условным GET; возвращает CachedPage"""
+        meta = self._load_meta(url)
+        cached_body = self._load_body(url) if meta else None
+
+        request_headers = dict(headers or {})
+        if meta and cached_body is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        self.requests += 1
+        # Темп запросов к хосту регулирует общий адаптивный лимитер
+        with get_limiter(url).slot() as slot:
+            response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+            slot.record(response.status_code, response.headers.get('Retry-After'))
+
+        if response.status_code == 304 and cached_body is not None:
+            self.hits += 1
+            self.bytes_saved += len(cached_body)
+            return CachedPage(
+                url, cached_body, meta.get('encoding'), 304, True,
+                meta.get('content_hash') != meta.get('parsed_hash')
+            )
+
+        response.raise_for_status()
+        self.misses += 1
+        content = response.content
+        self.bytes_downloaded += len(content)
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        # Сервер мог прислать то же самое тело без валидаторов - сравниваем по хешу
+        parsed_hash = meta.get('parsed_hash') if meta else None
+        new_meta = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'encoding': response.encoding,
+            'content_hash': content_hash,
+            'parsed_hash': parsed_hash,
+            'size': len(content)
+        }
+
+        _, body_path = self._paths(url)
+        self._write_atomic(body_path, zlib.compress(content, 6))
+        self._save_meta(url, new_meta)
+
+        return CachedPage(
+            url, content, response.encoding, response.status_code, False,
+            content_hash != parsed_hash
+        )
+
+    def mark_parsed(self, url):
+        """Отметка, что текущее содержимое URL успешно разобрано и сохранено"""
+        meta = self._load_meta(url)
+        if meta:
+            meta['parsed_hash'] = meta.get('content_hash')
+            self._save_meta(url, meta)
+
+    def stats(self):
+        """Счётчики кеша"""
+        return {
+            'requests': self.requests,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_saved': self.bytes_saved
+        }
+
+    def format_stats(self):
+        """Строка со статистикой кеша для вывода в лог"""
+        return (f"HTTP-кеш: запросов {self.requests}, попаданий (304) {self.hits}, "
+                f"промахов {self.misses}, скачано {self.bytes_downloaded} байт, "
+                f"сэкономлено {self.bytes_saved} байт")
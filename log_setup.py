@@ -0,0 +1,42 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+def setup_logging(log_file='divan_scraper.log', level=None, max_bytes=10 * 1024 * 1024, backup_count=5):
+    """
+    Логирование через очередь: вызывающий поток только кладёт запись в
+    QueueHandler, а форматирование и запись в файл и stderr выполняет фоновый
+    QueueListener. Файл ротируется по размеру (max_bytes, backup_count).
+    Уровень - level или переменная LOG_LEVEL (по умолчанию INFO).
+    Повторный вызов возвращает уже запущенный listener.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+    _listener.start()
+    # Остановка listener дописывает оставшиеся в очереди записи
+    atexit.register(_listener.stop)
+    return _listener
@@ -1,13 +1,172 @@
 from flask import Flask, jsonify, request
+import base64
+import binascii
+import json
 import random
 import os
+import threading
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import wraps
+
 from dotenv import load_dotenv
 
+from api_cache import ResponseCache, ScrapeListener
+from db_pool import get_pool
+from divans_db import DIVAN_FILTERS, PAGE_ORDERS, fetch_divan_by_url, fetch_divans_page
+
 # Загружаем переменные окружения
 load_dotenv()
 
 app = Flask(__name__)
 
+# Размер страницы выдачи диванов: по умолчанию и предельный
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Кеш ответов /divans*: сбрасывается по NOTIFY о завершённом запуске парсера,
+# ttl - страховка на случай пропущенного уведомления
+response_cache = ResponseCache()
+_listener = None
+_listener_lock = threading.Lock()
+
+def start_cache_listener():
+    """Подписка кеша на завершение запусков парсера (один поток на процесс)"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = ScrapeListener(response_cache)
+            _listener.start()
+    return _listener
+
+def cached_response(view):
+    """
+    Ответ из кеша по пути и параметрам запроса. Представление возвращает
+    (словарь, статус); в кеш попадают только ответы 200.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        start_cache_listener()
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        payload = response_cache.get(key)
+        if payload is not None:
+            response = jsonify(payload)
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        # Поколение - до запроса к базе: ответ, посчитанный по данным до сброса
+        # кеша, после сброса в кеш не попадёт
+        generation = response_cache.generation
+        payload, status = view(*args, **kwargs)
+        if status == 200:
+            response_cache.put(key, payload, generation)
+        response = jsonify(payload)
+        response.status_code = status
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+def json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def encode_cursor(key):
+    """Непрозрачный курсор следующей страницы из ключа последней строки"""
+    values = [str(value) if isinstance(value, Decimal) else json_value(value) for value in key]
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+# Диапазоны типов колонок: значение вне диапазона отклоняется при разборе
+# запроса с понятной ошибкой, а не падает в базе на приведении типа
+PRICE_RANGE = (Decimal('-99999999.99'), Decimal('99999999.99'))  # DECIMAL(10,2)
+INTEGER_RANGE = (-2 ** 31, 2 ** 31 - 1)
+SMALLINT_RANGE = (-2 ** 15, 2 ** 15 - 1)
+
+# Тип и диапазон значения каждого фильтра - по колонке, с которой он сравнивается
+FILTER_TYPES = {
+    'min_price': (Decimal, PRICE_RANGE),
+    'max_price': (Decimal, PRICE_RANGE),
+    'min_discount': (int, INTEGER_RANGE),
+    'min_sleeping_width': (int, SMALLINT_RANGE),
+    'min_sleeping_length': (int, SMALLINT_RANGE),
+    'max_width': (int, SMALLINT_RANGE),
+    'max_length': (int, SMALLINT_RANGE),
+}
+
+def in_range(number, bounds):
+    low, high = bounds
+    return low <= number <= high
+
+def cursor_timestamp(value):
+    return datetime.fromisoformat(value)
+
+def cursor_price(value):
+    number = Decimal(value) if isinstance(value, str) else None
+    if number is None or not number.is_finite() or not in_range(number, PRICE_RANGE):
+        raise ValueError(value)
+    return number
+
+def cursor_id(value):
+    if type(value) is not int or not in_range(value, INTEGER_RANGE):
+        raise ValueError(value)
+    return value
+
+# Разбор значений ключа курсора в типы колонок PAGE_ORDERS
+CURSOR_COLUMNS = {
+    'scraped_at': cursor_timestamp,
+    'price': cursor_price,
+    'id': cursor_id,
+}
+
+def decode_cursor(token, key):
+    """
+    Ключ из курсора в типах колонок key; ValueError, если курсор испорчен
+    или значение не помещается в тип колонки.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Некорректный курсор")
+    if not isinstance(values, list) or len(values) != len(key):
+        raise ValueError("Некорректный курсор")
+    try:
+        return [CURSOR_COLUMNS[column](value) for column, value in zip(key, values)]
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError("Некорректный курсор")
+
+def number_arg(name, converter, default=None, bounds=None):
+    """
+    Числовой параметр запроса; ValueError с понятным текстом, если это не число
+    или оно вне диапазона bounds.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        number = converter(value)
+    except (ValueError, InvalidOperation):
+        raise ValueError(f"Параметр {name} должен быть числом")
+    if isinstance(number, Decimal) and not number.is_finite():
+        raise ValueError(f"Параметр {name} должен быть числом")
+    if bounds is not None and not in_range(number, bounds):
+        raise ValueError(f"Параметр {name}: от {bounds[0]} до {bounds[1]}")
+    return number
+
+def parse_filters():
+    """
+    Фильтры выдачи из параметров запроса. Цены - Decimal, остальное - целые:
+    сравнение с колонкой того же типа идёт по индексу, а с float - нет.
+    """
+    filters = {}
+    for name in DIVAN_FILTERS:
+        converter, bounds = FILTER_TYPES[name]
+        value = number_arg(name, converter, bounds=bounds)
+        if value is not None:
+            filters[name] = value
+    return filters
+
 @app.route('/')
 def home():
     """Главная страница с информацией об API"""
@@ -17,7 +176,10 @@ def home():
             '/': 'Информация об API',
             '/flip': 'Подбросить монетку один раз',
             '/flip/<int:count>': 'Подбросить монетку указанное количество раз',
-            '/stats': 'Статистика подбрасываний'
+            '/stats': 'Статистика подбрасываний',
+            '/divans': 'Диваны постранично: order (recent, price, price_desc), limit, cursor, '
+                       'фильтры ' + ', '.join(DIVAN_FILTERS),
+            '/divans/by-url?url=<url>': 'Диван по ссылке на товар'
         }
     })
 
@@ -65,6 +227,51 @@ def get_stats():
         'timestamp': __import__('datetime').datetime.now().isoformat()
     })
 
+@app.route('/divans')
+@cached_response
+def list_divans():
+    """
+    Диваны постранично с фильтрами по цене, скидке и размерам. Страницы
+    связаны курсором (keyset): next_cursor передаётся в параметр cursor.
+    """
+    order = request.args.get('order', 'recent')
+    if order not in PAGE_ORDERS:
+        return {'error': f"Параметр order: одно из {', '.join(PAGE_ORDERS)}"}, 400
+    try:
+        limit = number_arg('limit', int, DEFAULT_PAGE_SIZE)
+        filters = parse_filters()
+        token = request.args.get('cursor')
+        after = decode_cursor(token, PAGE_ORDERS[order][0]) if token else None
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return {'error': f"Параметр limit: от 1 до {MAX_PAGE_SIZE}"}, 400
+
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            rows, next_key = fetch_divans_page(cursor, order, after, filters, limit)
+
+    return {
+        'items': [{col: json_value(value) for col, value in row.items()} for row in rows],
+        'order': order,
+        'limit': limit,
+        'next_cursor': encode_cursor(next_key) if next_key else None
+    }, 200
+
+@app.route('/divans/by-url')
+@cached_response
+def get_divan_by_url():
+    """Диван по ссылке на товар"""
+    url = request.args.get('url')
+    if not url:
+        return {'error': "Укажите параметр url"}, 400
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            row = fetch_divan_by_url(cursor, url)
+    if row is None:
+        return {'error': 'Диван не найден'}, 404
+    return {col: json_value(value) for col, value in row.items()}, 200
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Эндпоинт не найден'}), 404
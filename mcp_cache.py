@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен: без него тела сжимаются zlib
+    zstandard = None
+
+class McpResponseCache:
+    """
+    Постоянный кеш ответов инструментов MCP в локальном SQLite.
+
+    Ключ - хеш (инструмент, аргументы вызова), то есть URL вместе с параметрами.
+    Тело хранится сжатым zstd (или zlib, если пакет zstandard не установлен;
+    кодек записывается в строку, так что кеш читается при любом наборе пакетов).
+    Запись старше ttl секунд считается устаревшей; при превышении max_bytes
+    вытесняются давно не читанные записи (LRU).
+    """
+
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = path or os.getenv('MCP_CACHE_PATH', 'mcp_cache.sqlite3')
+        self.ttl = ttl if ttl is not None else int(os.getenv('MCP_CACHE_TTL', 24 * 3600))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.getenv('MCP_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS mcp_responses (
+                key TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                url TEXT,
+                codec TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS mcp_responses_last_access ON mcp_responses (last_access)")
+        self.conn.commit()
+
+        if zstandard is not None:
+            self.codec = 'zstd'
+            self._compressor = zstandard.ZstdCompressor(level=10)
+            self._decompressor = zstandard.ZstdDecompressor()
+        else:
+            self.codec = 'zlib'
+
+        # Счётчики
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.stored = 0
+
+        with self.lock:
+            self._purge_expired()
+            self.total_bytes = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM mcp_responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(tool, arguments):
+        """Ключ записи: хеш инструмента и аргументов вызова"""
+        payload = json.dumps([tool, arguments or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _compress(self, data):
+        if self.codec == 'zstd':
+            return self._compressor.compress(data)
+        return zlib.compress(data, 6)
+
+    def _decompress(self, codec, body):
+        if codec == 'zstd':
+            if zstandard is None:
+                return None
+            return self._decompressor.decompress(body)
+        return zlib.decompress(body)
+
+    def _purge_expired(self):
+        if self.ttl <= 0:
+            return
+        cursor = self.conn.execute(
+            "DELETE FROM mcp_responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self.expired += cursor.rowcount
+        self.conn.commit()
+
+    def get(self, tool, arguments):
+        """Текст ответа из кеша или None (нет записи, устарела или не читается)"""
+        key = self.make_key(tool, arguments)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT codec, body, size, created_at FROM mcp_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            codec, body, size, created_at = row
+            text = None
+            if self.ttl <= 0 or now - created_at <= self.ttl:
+                try:
+                    data = self._decompress(codec, body)
+                    text = data.decode('utf-8') if data is not None else None
+                except Exception:
+                    text = None
+
+            if text is None:
+                # Устаревшая или нечитаемая запись удаляется
+                self.conn.execute("DELETE FROM mcp_responses WHERE key = ?", (key,))
+                self.conn.commit()
+                self.total_bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE mcp_responses SET last_access = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            return text
+
+    def put(self, tool, arguments, text):
+        """Сохранение ответа; при превышении бюджета вытесняются старые записи"""
+        key = self.make_key(tool, arguments)
+        body = self._compress(text.encode('utf-8'))
+        now = time.time()
+        with self.lock:
+            previous = self.conn.execute(
+                "SELECT size FROM mcp_responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("""
+                INSERT INTO mcp_responses (key, tool, url, codec, body, size, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    codec = excluded.codec,
+                    body = excluded.body,
+                    size = excluded.size,
+                    created_at = excluded.created_at,
+                    last_access = excluded.last_access
+            """, (key, tool, (arguments or {}).get('url'), self.codec, body, len(body), now, now))
+            self.total_bytes += len(body) - (previous[0] if previous else 0)
+            self.stored += 1
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Вытеснение давно не читанных записей, пока кеш больше бюджета"""
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT key, size FROM mcp_responses ORDER BY last_access LIMIT 64").fetchall()
+            if not rows:
+                self.total_bytes = 0
+                return
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    return
+                self.conn.execute("DELETE FROM mcp_responses WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.evicted += 1
+
+    def format_stats(self):
+        """Строка со статистикой кеша для вывода в лог"""
+        return (f"MCP-кеш ({self.codec}): попаданий {self.hits}, промахов {self.misses}, "
+                f"записано {self.stored}, устарело {self.expired}, вытеснено {self.evicted}, "
+                f"размер {self.total_bytes} байт из {self.max_bytes}")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,231 @@
+import asyncio
+import itertools
+import json
+import os
+import shlex
+import sys
+import threading
+
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {'name': 'divan-scraper', 'version': '1.0'}
+
+# Локальная заглушка с данными mcp_real_data.py - только для бенчмарков и проверок,
+# её команду передают явно; боевой клиент без MCP_SERVER_COMMAND не запускается
+STUB_SERVER_COMMAND = [
+    sys.executable,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mcp_stub_server.py')
+]
+
+class McpError(Exception):
+    """Ошибка, которую вернул MCP сервер (JSON-RPC error или isError в результате)"""
+
+    def __init__(self, message, code=None, data=None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+class McpConfigError(RuntimeError):
+    """Не задана команда запуска MCP сервера"""
+
+def server_command(command=None):
+    """Команда MCP сервера: явная или из MCP_SERVER_COMMAND"""
+    command = command or os.getenv('MCP_SERVER_COMMAND')
+    if not command:
+        raise McpConfigError(
+            "Не задана команда MCP сервера: укажите MCP_SERVER_COMMAND "
+            "(например, 'npx -y webscraping-ai-mcp')"
+        )
+    return shlex.split(command) if isinstance(command, str) else list(command)
+
+class McpStdioClient:
+    """
+    JSON-RPC клиент MCP поверх stdio с одной постоянной сессией.
+
+    Сервер запускается один раз; запросы пишутся в stdin построчно, ответы
+    читаются фоновой задачей и сопоставляются с ожидающими future по id,
+    поэтому любое число tools/call может выполняться одновременно.
+    """
+
+    def __init__(self, command=None, env=None, request_timeout=120):
+        self.argv = server_command(command)
+        self.env = env
+        self.request_timeout = request_timeout
+        self.process = None
+        self.server_info = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader_task = None
+        self._write_lock = asyncio.Lock()
+
+        # Счётчики
+        self.requests_sent = 0
+        self.max_in_flight = 0
+
+    async def start(self):
+        """Запуск сервера и рукопожатие initialize"""
+        self.process = await asyncio.create_subprocess_exec(
+            *self.argv,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env={**os.environ, **(self.env or {})},
+            limit=2 ** 26  # ответы со страницами каталога бывают большими
+        )
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+        result = await self.request('initialize', {
+            'protocolVersion': PROTOCOL_VERSION,
+            'capabilities': {},
+            'clientInfo': CLIENT_INFO
+        })
+        self.server_info = result.get('serverInfo')
+        await self.notify('notifications/initialized')
+        return self
+
+    async def _send(self, message):
+        data = (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+        async with self._write_lock:
+            self.process.stdin.write(data)
+            await self.process.stdin.drain()
+
+    async def _read_loop(self):
+        """Чтение ответов сервера и разбор их по id запросов"""
+        try:
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue  # посторонний вывод сервера
+
+                if 'id' in message and 'method' in message:
+                    # Запрос от сервера (sampling, roots ...) - не поддерживаем
+                    await self._send({
+                        'jsonrpc': '2.0', 'id': message['id'],
+                        'error': {'code': -32601, 'message': 'Method not found'}
+                    })
+                    continue
+
+                future = self._pending.pop(message.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if 'error' in message:
+                    error = message['error']
+                    future.set_exception(McpError(error.get('message'), error.get('code'), error.get('data')))
+                else:
+                    future.set_result(message.get('result') or {})
+        finally:
+            # Сервер завершился - все ожидающие запросы завершаются ошибкой
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(McpError("MCP сервер закрыл соединение"))
+            self._pending.clear()
+
+    async def request(self, method, params=None):
+        """JSON-RPC запрос с ожиданием ответа"""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.requests_sent += 1
+        self.max_in_flight = max(self.max_in_flight, len(self._pending))
+
+        message = {'jsonrpc': '2.0', 'id': request_id, 'method': method}
+        if params is not None:
+            message['params'] = params
+        await self._send(message)
+
+        try:
+            return await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def notify(self, method, params=None):
+        """JSON-RPC уведомление (без ответа)"""
+        message = {'jsonrpc': '2.0', 'method': method}
+        if params is not None:
+            message['params'] = params
+        await self._send(message)
+
+    async def list_tools(self):
+        result = await self.request('tools/list')
+        return result.get('tools', [])
+
+    async def call_tool(self, name, arguments=None):
+        """Вызов инструмента MCP; возвращает result целиком"""
+        result = await self.request('tools/call', {'name': name, 'arguments': arguments or {}})
+        if result.get('isError'):
+            raise McpError(_content_text(result) or f"Инструмент {name} вернул ошибку")
+        return result
+
+    async def call_tool_text(self, name, arguments=None):
+        """Вызов инструмента MCP; возвращает текстовое содержимое ответа"""
+        return _content_text(await self.call_tool(name, arguments))
+
+    async def close(self):
+        if self.process is None:
+            return
+        if self.process.stdin and not self.process.stdin.is_closing():
+            self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), 5)
+        except asyncio.TimeoutError:
+            self.process.kill()
+            await self.process.wait()
+        if self._reader_task:
+            await self._reader_task
+        self.process = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+def _content_text(result):
+    """Склейка текстовых блоков content из результата tools/call"""
+    return '\n'.join(
+        item.get('text', '') for item in result.get('content', [])
+        if item.get('type') == 'text'
+    )
+
+class McpClientSync:
+    """
+    Синхронная обёртка над McpStdioClient для потокового кода.
+
+    Event loop с сессией живёт в фоновом потоке; вызовы из любого числа
+    потоков мультиплексируются в одну сессию.
+    """
+
+    def __init__(self, command=None, env=None, request_timeout=120):
+        # Команду проверяем до запуска потока, чтобы не оставить его висеть
+        command = server_command(command)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='mcp-client', daemon=True)
+        self.thread.start()
+        self.client = self.run(self._create(command, env, request_timeout))
+
+    async def _create(self, command, env, request_timeout):
+        return await McpStdioClient(command, env, request_timeout).start()
+
+    def run(self, coroutine):
+        """Выполнение корутины в цикле событий сессии; блокирует до результата"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def call_tool_text(self, name, arguments=None):
+        return self.run(self.client.call_tool_text(name, arguments))
+
+    async def call_tool_text_async(self, name, arguments=None):
+        """Вызов из любого цикла событий, в том числе из цикла самой сессии"""
+        future = asyncio.run_coroutine_threadsafe(self.client.call_tool_text(name, arguments), self.loop)
+        return await asyncio.wrap_future(future)
+
+    def list_tools(self):
+        return self.run(self.client.list_tools())
+
+    def close(self):
+        if self.loop.is_running():
+            self.run(self.client.close())
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.loop.close()
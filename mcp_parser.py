@@ -0,0 +1,181 @@
+import re
+
+# Скомпилированные паттерны разбора markdown-ответа MCP webscraping.
+# Паттерны применяются через match() к началу одной строки, один раз на строку,
+# и не содержат соседних пересекающихся квантификаторов: время разбора линейно
+# по длине строки даже на длинных строках без совпадения (см. fuzz_mcp_parser.py)
+PRODUCT_LINK_RE = re.compile(r'\[([^\]\n]+)\]\s*\((/product/[^)\s]+)\)')
+DIMENSIONS_PREFIX_RE = re.compile(r'(Размеры|Спальное место)(?: ?\(ДхШхВ\))?:?')
+# Символы значения размеров: цифры, пробелы и разделители DIMENSION_NUMBERS_PATTERN
+DIMENSIONS_CHARS = frozenset('0123456789 xх×*')
+# Числа размеров "205 x 112 x 92": две или три группы до 4 цифр (влезают в SMALLINT);
+# разделитель - латинская или кириллическая "х", "×" или "*". Тот же паттерн
+# у SQL-функции divans_dimension (миграция 10 в divans_migrations.py)
+DIMENSION_NUMBERS_PATTERN = (r'(?<!\d)(\d{1,4})\s*[xх×*]\s*(\d{1,4})(?!\d)'
+                             r'(?:\s*[xх×*]\s*(\d{1,4})(?!\d))?')
+DIMENSION_NUMBERS_RE = re.compile(DIMENSION_NUMBERS_PATTERN)
+
+PRODUCT_KEYWORDS = ('диван', 'кушетка')
+BASE_URL = "https://www.divan.ru"
+
+def _to_number(text):
+    """Число из строки вида "41 150" (пробелы-разделители разрядов) или None"""
+    digits = text.replace(' ', '')
+    return float(digits) if digits.isdigit() else None
+
+def _to_discount(text):
+    """Скидка из строки вида "30" или "30%" или None"""
+    text = text.rstrip('%').rstrip()
+    return int(text) if text.isdigit() and len(text) <= 2 else None
+
+def _is_product_name(name):
+    name_lower = name.lower()
+    return any(keyword in name_lower for keyword in PRODUCT_KEYWORDS)
+
+def _parse_dimensions(line):
+    """
+    Вид и значение размеров из строки "Размеры (ДхШхВ): 205 x 112 x 92 см" (или None).
+    Значение ищется через find('см') и проверку набора символов, а не
+    ленивым квантификатором перед "\\s*см", который квадратичен на длинных пробелах.
+    """
+    match = DIMENSIONS_PREFIX_RE.match(line)
+    if not match:
+        return None
+    rest = line[match.end():]
+    end = rest.find('см')
+    if end < 0:
+        return None
+    value = rest[:end].strip()
+    if not value or not DIMENSIONS_CHARS.issuperset(value):
+        return None
+    return match.group(1), value
+
+def parse_dimensions(value):
+    """Длина, ширина и высота в см из строки "205 x 112 x 92 см" (None вместо неизвестных)"""
+    match = DIMENSION_NUMBERS_RE.search(value) if isinstance(value, str) else None
+    if not match:
+        return None, None, None
+    return tuple(int(number) if number else None for number in match.groups())
+
+def dimension_fields(dimensions, sleeping_dimensions):
+    """
+    Целочисленные колонки размеров товара: разбираются один раз при разборе
+    страницы, чтобы фильтры по размерам шли диапазоном по индексу, а не
+    разбором текста в каждой строке таблицы.
+    """
+    length, width, height = parse_dimensions(dimensions)
+    sleeping_length, sleeping_width, sleeping_height = parse_dimensions(sleeping_dimensions)
+    return {
+        'length': length,
+        'width': width,
+        'height': height,
+        'sleeping_length': sleeping_length,
+        'sleeping_width': sleeping_width,
+        'sleeping_height': sleeping_height
+    }
+
+def _parse_prices(line):
+    """Цена, старая цена и скидка из строки "41 150руб.58 790руб. 30" (или None)"""
+    parts = line.split('руб.')
+    if len(parts) < 2:
+        return None
+    price = _to_number(parts[0].strip())
+    if price is None:
+        return None
+    old_price = _to_number(parts[1].strip()) if len(parts) > 2 else None
+    tail = parts[-1].strip()
+    discount = _to_discount(tail) if tail else None
+    return price, old_price, discount
+
+def iter_mcp_products(text_content, page_number=1):
+    """
+    Однопроходный разбор текста MCP webscraping.
+
+    Строка со ссылкой [Название](/product/...) открывает блок товара; следующие
+    строки (цены, скидка, размеры) дополняют его. Запись отдаётся, когда блок
+    заканчивается: на следующей ссылке на товар, заголовке или конце текста.
+    Товар без цены не отдаётся.
+    """
+    name = None
+    href = None
+    price = old_price = discount = dimensions = sleeping_dimensions = None
+
+    def record():
+        return {
+            'name': name,
+            'price': price,
+            'old_price': old_price,
+            'discount_percent': discount,
+            'dimensions': dimensions,
+            'sleeping_dimensions': sleeping_dimensions,
+            'url': f"{BASE_URL}{href}",
+            'image_url': None,
+            'page_number': page_number,
+            **dimension_fields(dimensions, sleeping_dimensions)
+        }
+
+    for line in text_content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        first = line[0]
+
+        if first == '[':
+            match = PRODUCT_LINK_RE.match(line)
+            if match:
+                if name is not None and price is not None:
+                    yield record()
+                name = match.group(1).strip()
+                href = match.group(2)
+                price = old_price = discount = dimensions = sleeping_dimensions = None
+                if not _is_product_name(name):
+                    name = None
+                    continue
+                # Цены могут идти в той же строке сразу после ссылки
+                rest = line[match.end():]
+                if 'руб.' in rest:
+                    parsed = _parse_prices(rest.strip())
+                    if parsed:
+                        price, old_price, discount = parsed
+                continue
+
+        if first == '#':
+            # Заголовок раздела закрывает текущий блок
+            if name is not None and price is not None:
+                yield record()
+            name = None
+            continue
+
+        if name is None:
+            continue
+
+        if price is None:
+            if 'руб.' in line:
+                parsed = _parse_prices(line)
+                if parsed:
+                    price, old_price, discount = parsed
+        elif first.isdigit():
+            if discount is None:
+                discount = _to_discount(line)
+        elif first == 'Р' or first == 'С':
+            parsed = _parse_dimensions(line)
+            if parsed:
+                kind, value = parsed
+                if kind == 'Размеры':
+                    if dimensions is None:
+                        dimensions = value
+                elif sleeping_dimensions is None:
+                    sleeping_dimensions = value
+
+    if name is not None and price is not None:
+        yield record()
+
+def parse_mcp_text(text_content, page_number=1):
+    """Список товаров из текста MCP webscraping"""
+    return list(iter_mcp_products(text_content, page_number))
+
+def looks_like_catalog(text_content):
+    """Быстрая проверка, что ответ MCP похож на страницу каталога (без lower() всего текста)"""
+    if not text_content or 'руб.' not in text_content:
+        return False
+    return any(word in text_content for word in ('диван', 'Диван', 'кушетка', 'Кушетка'))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка MCP сервера webscraping-ai поверх stdio.
+
+Отдаёт данные mcp_real_data.py через инструмент webscraping_ai_text, чтобы
+проверять клиент и парсер без сети. Запросы обрабатываются параллельно и
+отвечаются по мере готовности, как у настоящего сервера.
+
+    python mcp_stub_server.py --latency 0.05
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp_real_data import get_mcp_data_by_page
+
+TEXT_TOOL = {
+    'name': 'webscraping_ai_text',
+    'description': 'Текст страницы (данные mcp_real_data.py)',
+    'inputSchema': {
+        'type': 'object',
+        'properties': {
+            'url': {'type': 'string'},
+            'text_format': {'type': 'string'},
+            'return_links': {'type': 'boolean'}
+        },
+        'required': ['url']
+    }
+}
+
+write_lock = threading.Lock()
+
+def send(message):
+    data = json.dumps(message, ensure_ascii=False)
+    with write_lock:
+        sys.stdout.write(data + '\n')
+        sys.stdout.flush()
+
+def page_number_from_url(url):
+    if "page-" in url:
+        return int(url.rstrip('/').split("page-")[-1])
+    return 1
+
+def handle(message, latency):
+    """Обработка одного запроса; возвращает result или бросает исключение"""
+    method = message.get('method')
+    params = message.get('params') or {}
+
+    if method == 'initialize':
+        return {
+            'protocolVersion': params.get('protocolVersion', '2024-11-05'),
+            'capabilities': {'tools': {}},
+            'serverInfo': {'name': 'divan-mcp-stub', 'version': '1.0'}
+        }
+    if method == 'ping':
+        return {}
+    if method == 'tools/list':
+        return {'tools': [TEXT_TOOL]}
+    if method == 'tools/call':
+        if params.get('name') != TEXT_TOOL['name']:
+            raise LookupError(f"Unknown tool: {params.get('name')}")
+        url = (params.get('arguments') or {}).get('url', '')
+        if latency:
+            time.sleep(latency)
+        text = get_mcp_data_by_page(page_number_from_url(url))
+        return {'content': [{'type': 'text', 'text': text}], 'isError': False}
+    raise LookupError(f"Method not found: {method}")
+
+def respond(message, latency):
+    try:
+        send({'jsonrpc': '2.0', 'id': message['id'], 'result': handle(message, latency)})
+    except LookupError as e:
+        send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32601, 'message': str(e)}})
+    except Exception as e:
+        send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32603, 'message': str(e)}})
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка MCP сервера webscraping-ai")
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа tools/call, с")
+    parser.add_argument('--workers', type=int, default=64)
+    args = parser.parse_args()
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for line in sys.stdin:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                send({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+                continue
+            if 'id' not in message:
+                continue  # уведомления не требуют ответа
+            executor.submit(respond, message, args.latency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+def parse_retry_after(value):
+    """Значение заголовка Retry-After в секундах (число секунд или HTTP-дата)"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+class _Slot:
+    """Занятый слот лимитера; результат запроса передаётся через record()"""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.recorded = False
+
+    def record(self, status_code, retry_after=None):
+        self.recorded = True
+        self.limiter.record(status_code, time.monotonic() - self.started, retry_after)
+
+class AdaptiveRateLimiter:
+    """
+    Адаптивный лимитер запросов к одному хосту (AIMD).
+
+    Темп ограничивается token bucket, параллельность - окном одновременных запросов.
+    Пока ответы быстрые и успешные, темп и окно растут аддитивно; на 429/5xx,
+    ошибку соединения или всплеск задержки оба делятся пополам. Retry-After
+    блокирует новые запросы до указанного момента.
+    """
+
+    def __init__(self, host, rate=2.0, min_rate=0.2, max_rate=50.0,
+                 concurrency=1.0, max_concurrency=16, rate_step=0.5,
+                 latency_spike_factor=3.0, min_spike_latency=1.0):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.rate_step = rate_step
+        self.latency_spike_factor = latency_spike_factor
+        self.min_spike_latency = min_spike_latency
+
+        self.tokens = 1.0
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.avg_latency = None
+        self.updated_at = time.monotonic()
+        self._lock = threading.Condition()
+
+        # Счётчики
+        self.requests = 0
+        self.backoffs = 0
+        self.waited = 0.0
+
+    def _refill(self, now):
+        burst = max(1.0, self.concurrency)
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _try_acquire(self):
+        """Захват слота под блокировкой; возвращает 0 при успехе или время ожидания"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.in_flight >= int(self.concurrency):
+            # Слот освободится при release(); ждём с разумным потолком
+            return 0.05
+        if self.tokens < 1.0:
+            return (1.0 - self.tokens) / self.rate
+        self.tokens -= 1.0
+        self.in_flight += 1
+        self.requests += 1
+        return 0
+
+    def acquire(self):
+        """Блокирующий захват слота"""
+        started = time.monotonic()
+        with self._lock:
+            while True:
+                wait = self._try_acquire()
+                if not wait:
+                    break
+                self._lock.wait(wait)
+        self.waited += time.monotonic() - started
+
+    async def acquire_async(self):
+        """Захват слота без блокировки event loop"""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                wait = self._try_acquire()
+            if not wait:
+                break
+            await asyncio.sleep(wait)
+        self.waited += time.monotonic() - started
+
+    def release(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._lock.notify_all()
+
+    def record(self, status_code, latency, retry_after=None):
+        """
+        Учёт результата запроса.
+        status_code=None означает ошибку соединения/таймаут.
+        """
+        with self._lock:
+            overloaded = status_code is None or status_code == 429 or status_code >= 500
+            spike = (
+                self.avg_latency is not None
+                and latency > self.min_spike_latency
+                and latency > self.avg_latency * self.latency_spike_factor
+            )
+
+            if overloaded or spike:
+                # Multiplicative decrease
+                self.backoffs += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.concurrency = max(1.0, self.concurrency / 2)
+                self.tokens = min(self.tokens, 0.0)
+            else:
+                # Additive increase: окно растёт примерно на 1 за "раунд" запросов
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+
+            delay = parse_retry_after(retry_after)
+            if delay:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+            if not spike:
+                self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+
+            self._lock.notify_all()
+
+    def slot(self):
+        """Синхронный контекстный менеджер: with limiter.slot() as slot: ..."""
+        return _SyncSlotContext(self)
+
+    def async_slot(self):
+        """Асинхронный контекстный менеджер: async with limiter.async_slot() as slot: ..."""
+        return _AsyncSlotContext(self)
+
+    def format_stats(self):
+        """Строка с текущим состоянием лимитера для вывода в лог"""
+        return (f"Лимитер {self.host}: запросов {self.requests}, темп {self.rate:.1f}/с, "
+                f"параллельность {int(self.concurrency)}, откатов {self.backoffs}, "
+                f"ожидание {self.waited:.1f} с")
+
+class _SyncSlotContext:
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def __enter__(self):
+        self.limiter.acquire()
+        self.slot = _Slot(self.limiter)
+        return self.slot
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.slot.recorded:
+            # Исключение без ответа сервера считается признаком перегрузки
+            self.slot.record(None if exc_type else 200)
+        self.limiter.release()
+        return False
+
+class _AsyncSlotContext:
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    async def __aenter__(self):
+        await self.limiter.acquire_async()
+        self.slot = _Slot(self.limiter)
+        return self.slot
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self.slot.recorded:
+            self.slot.record(None if exc_type else 200)
+        self.limiter.release()
+        return False
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(url, **kwargs):
+    """Общий для всего процесса лимитер хоста, к которому относится URL"""
+    host = urlparse(url).netloc or url
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(host, **kwargs)
+            _limiters[host] = limiter
+        return limiter
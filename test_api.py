@@ -5,7 +5,7 @@
 
 import requests
 import json
-import time
+from rate_limiter import get_limiter
 
 BASE_URL = "http://localhost:5000"
 
@@ -15,7 +15,10 @@ def test_endpoint(endpoint, description):
         print(f"\n🔍 Тестирую: {description}")
         print(f"URL: {BASE_URL}{endpoint}")
         
-        response = requests.get(f"{BASE_URL}{endpoint}", timeout=10)
+        # Темп задаёт адаптивный лимитер вместо фиксированной паузы
+        with get_limiter(BASE_URL).slot() as slot:
+            response = requests.get(f"{BASE_URL}{endpoint}", timeout=10)
+            slot.record(response.status_code, response.headers.get('Retry-After'))
         
         print(f"Статус: {response.status_code}")
         print(f"Ответ: {json.dumps(response.json(), indent=2, ensure_ascii=False)}")
@@ -52,9 +55,6 @@ def main():
             print("✅ Успешно")
         else:
             print("❌ Неудачно")
-        
-        # Небольшая пауза между запросами
-        time.sleep(0.5)
     
     print("\n" + "=" * 60)
     print(f"📊 Результаты тестирования: {success_count}/{total_tests} успешно")
@@ -1,27 +1,28 @@
-import psycopg2
-import pandas as pd
 import os
+from datetime import datetime
 from dotenv import load_dotenv
+from db_pool import close_pools, get_pool
+from divans_db import fetch_discount_histogram, fetch_price_statistics
+from divans_migrations import require_schema
+from divans_export import EXPORT_ALL_COLUMNS, IncrementalCsvExport, export_full_csv
 
 # Загружаем переменные окружения
 load_dotenv()
 
 def connect_to_db():
-    """Подключение к базе данных"""
+    """Подключение к базе данных из общего пула (вернуть через release_db)"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('DB_HOST'),
-            port=int(os.getenv('DB_PORT', 5432)),
-            database=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD')
-        )
+        conn = get_pool().getconn()
         print("✅ Успешно подключились к базе данных PostgreSQL!")
         return conn
     except Exception as e:
         print(f"❌ Ошибка подключения к базе данных: {e}")
         return None
 
+def release_db(conn):
+    """Возврат подключения в пул: следующее действие меню не открывает новое"""
+    get_pool().putconn(conn)
+
 def view_divans_data():
     """Просмотр данных о диванах из базы"""
     conn = connect_to_db()
@@ -29,18 +30,20 @@ def view_divans_data():
         return
     
     try:
+        # Сводку divans_summary создаёт миграция
+        require_schema(conn)
         cursor = conn.cursor()
         
-        # Получаем общее количество записей
-        cursor.execute("SELECT COUNT(*) FROM divans")
-        total_count = cursor.fetchone()[0]
+        # Общее количество и статистика - из сводки, без прохода по таблице
+        stats = fetch_price_statistics(cursor)
+        total_count = stats['total']
         print(f"\n📊 Всего диванов в базе: {total_count}")
         
         if total_count == 0:
             print("❌ В базе нет данных о диванах")
             return
         
-        # Получаем последние 10 записей с актуальными названиями колонок
+        # Последние 10 товаров по scraped_at - времени последнего изменения цены
         cursor.execute("""
             SELECT name, price, old_price, discount_percent, 
                    dimensions, sleeping_dimensions, scraped_at
@@ -49,14 +52,13 @@ def view_divans_data():
             LIMIT 10
         """)
         
-        rows = cursor.fetchall()
-        
-        print(f"\n🔄 Последние {len(rows)} добавленных диванов:")
+        print(f"\n🔄 Последние {cursor.rowcount} диванов с изменённой ценой:")
         print("=" * 120)
         print(f"{'Название':<50} {'Цена':<12} {'Старая цена':<15} {'Скидка':<8} {'Размеры':<20} {'Спальное место':<20}")
         print("=" * 120)
         
-        for row in rows:
+        # Строки печатаются по мере чтения из курсора, без промежуточного списка
+        for row in cursor:
             name, price, old_price, discount, dims, sleep_dims, scraped_at = row
             
             # Обрезаем длинное название
@@ -70,53 +72,17 @@ def view_divans_data():
             print(f"{name_short:<50} {price_str:<12} {old_price_str:<15} {discount_str:<8} {dims:<20} {sleep_dims:<20}")
         
         # Статистика по ценам
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total,
-                AVG(price) as avg_price,
-                MIN(price) as min_price,
-                MAX(price) as max_price,
-                AVG(discount_percent) as avg_discount
-            FROM divans 
-            WHERE price IS NOT NULL
-        """)
-        
-        stats = cursor.fetchone()
-        if stats and stats[0] > 0:
-            total, avg_price, min_price, max_price, avg_discount = stats
+        if stats['avg_price'] is not None:
+            avg_discount = stats['avg_discount']
             
             print(f"\n📈 Статистика по ценам:")
-            print(f"Средняя цена: {avg_price:,.0f}₽")
-            print(f"Минимальная цена: {min_price:,.0f}₽")
-            print(f"Максимальная цена: {max_price:,.0f}₽")
+            print(f"Средняя цена: {stats['avg_price']:,.0f}₽")
+            print(f"Минимальная цена: {stats['min_price']:,.0f}₽")
+            print(f"Максимальная цена: {stats['max_price']:,.0f}₽")
             print(f"Средняя скидка: {avg_discount:.1f}%" if avg_discount else "Средняя скидка: N/A")
         
         # Статистика по скидкам
-        cursor.execute("""
-            SELECT 
-                CASE 
-                    WHEN discount_percent >= 50 THEN '50%+'
-                    WHEN discount_percent >= 30 THEN '30-49%'
-                    WHEN discount_percent >= 20 THEN '20-29%'
-                    WHEN discount_percent >= 10 THEN '10-19%'
-                    WHEN discount_percent > 0 THEN '1-9%'
-                    ELSE 'Без скидки'
-                END as discount_range,
-                COUNT(*) as count
-            FROM divans 
-            GROUP BY discount_range
-            ORDER BY 
-                CASE discount_range
-                    WHEN '50%+' THEN 1
-                    WHEN '30-49%' THEN 2
-                    WHEN '20-29%' THEN 3
-                    WHEN '10-19%' THEN 4
-                    WHEN '1-9%' THEN 5
-                    ELSE 6
-                END
-        """)
-        
-        discount_stats = cursor.fetchall()
+        discount_stats = fetch_discount_histogram(cursor)
         if discount_stats:
             print(f"\n🏷️ Статистика по скидкам:")
             for discount_range, count in discount_stats:
@@ -129,7 +95,7 @@ def view_divans_data():
     
     finally:
         if conn:
-            conn.close()
+            release_db(conn)
 
 def export_to_csv():
     """Экспорт данных в CSV файл"""
@@ -138,27 +104,42 @@ def export_to_csv():
         return
     
     try:
-        # Читаем все данные в DataFrame
-        query = "SELECT * FROM divans ORDER BY scraped_at DESC"
-        df = pd.read_sql_query(query, conn)
+        # Строки идут серверным курсором прямо в файл, без DataFrame
+        filename = f"divans_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        written = export_full_csv(conn, filename)
         
-        if df.empty:
+        if not written:
+            os.remove(filename)
             print("❌ Нет данных для экспорта")
             return
         
-        # Сохраняем в CSV
-        filename = f"divans_export_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        df.to_csv(filename, index=False, encoding='utf-8-sig')
-        
         print(f"✅ Данные экспортированы в файл: {filename}")
-        print(f"📊 Экспортировано записей: {len(df)}")
+        print(f"📊 Экспортировано записей: {written}")
         
     except Exception as e:
         print(f"❌ Ошибка экспорта: {e}")
     
     finally:
         if conn:
-            conn.close()
+            release_db(conn)
+
+def export_new_to_csv(filename="divans_export.csv"):
+    """Дописывание в CSV только новых и изменённых с прошлой выгрузки записей"""
+    conn = connect_to_db()
+    if not conn:
+        return
+    
+    try:
+        written, total = IncrementalCsvExport(filename, columns=EXPORT_ALL_COLUMNS).export(conn)
+        print(f"✅ В файл {filename} дописано записей: {written}")
+        print(f"📊 Всего записей в файле: {total}")
+        
+    except Exception as e:
+        print(f"❌ Ошибка экспорта: {e}")
+    
+    finally:
+        if conn:
+            release_db(conn)
 
 def main():
     """Основная функция"""
@@ -169,9 +150,10 @@ def main():
         print("\n📋 ВЫБЕРИТЕ ДЕЙСТВИЕ:")
         print("1️⃣  Просмотреть данные о диванах (статистика + последние 10)")
         print("2️⃣  Экспортировать все данные в CSV файл")
-        print("3️⃣  Выход из программы")
+        print("3️⃣  Дописать новые записи в divans_export.csv")
+        print("4️⃣  Выход из программы")
         
-        choice = input("\n💬 Введите номер (1, 2 или 3): ").strip()
+        choice = input("\n💬 Введите номер (1, 2, 3 или 4): ").strip()
         
         if choice == "1":
             print("\n" + "="*60)
@@ -182,10 +164,15 @@ def main():
             export_to_csv()
             print("="*60)
         elif choice == "3":
+            print("\n" + "="*60)
+            export_new_to_csv()
+            print("="*60)
+        elif choice == "4":
             print("\n👋 До свидания! Программа завершена.")
+            close_pools()
             break
         else:
-            print("❌ Неверный выбор! Введите 1, 2 или 3.")
+            print("❌ Неверный выбор! Введите 1, 2, 3 или 4.")
 
 if __name__ == "__main__":
     main()